@@ -42,11 +42,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'student.metrics.MetricsMiddleware',
+    'student.replica.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'student.sessions.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,7 +57,8 @@ ROOT_URLCONF = 'sms.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, timing renders for student.metrics.
+        'BACKEND': 'student.metrics.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -127,4 +130,89 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
-LOGIN_URL = 'signin'
\ No newline at end of file
+LOGIN_URL = 'signin'
+
+# Keyset pagination for the list views
+SMS_PAGE_SIZE = 25
+SMS_PAGE_SIZE_CHOICES = (10, 25, 50, 100)
+
+# Route the read-heavy views to their async versions (set by sms/asgi.py)
+SMS_ASYNC_VIEWS = os.environ.get('SMS_ASYNC_VIEWS', '0') == '1'
+
+# SQLite profile. "production" switches to WAL with relaxed fsyncs, memory
+# mapped reads, a 64 MB page cache, a 5 s busy timeout, write transactions
+# that take the lock up front, and connections reused across requests.
+SMS_DB_PROFILE = os.environ.get('SMS_DB_PROFILE', 'development')
+SMS_SQLITE_PRAGMAS = {}
+if SMS_DB_PROFILE == 'production':
+    SMS_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 268435456,
+        'cache_size': -65536,
+        'temp_store': 'MEMORY',
+    }
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    })
+
+# Read replica for the list, export and report views (student/replica.py).
+# Set SMS_REPLICA_PATH to enable it and keep it fresh with
+# `manage.py refresh_replica`, which copies the primary every
+# SMS_REPLICA_INTERVAL seconds.
+SMS_REPLICA_PATH = os.environ.get('SMS_REPLICA_PATH')
+SMS_REPLICA_INTERVAL = int(os.environ.get('SMS_REPLICA_INTERVAL', '30'))
+SMS_REPLICA_MAX_LAG = SMS_REPLICA_INTERVAL * 3
+SMS_REPLICA_VIEWS = (
+    'dashboard', 'student_list', 'course_list', 'instructor_list', 'enrollment_list',
+    'export_data', 'course_analytics', 'course_analytics_json', 'api_list',
+)
+DATABASE_ROUTERS = ['student.replica.ReplicaRouter']
+if SMS_REPLICA_PATH:
+    DATABASES['replica'] = dict(DATABASES['default'], NAME=SMS_REPLICA_PATH, TEST={'MIRROR': 'default'})
+
+# Deleting a course or student (student/purging.py). By default the view
+# purges it in batches of SMS_PURGE_BATCH_SIZE. With SMS_SOFT_DELETE=1 the
+# row and its enrollments are only hidden, and `manage.py purge_deleted`
+# (from cron, or with --every) removes them later.
+SMS_SOFT_DELETE = os.environ.get('SMS_SOFT_DELETE', '0') == '1'
+SMS_PURGE_BATCH_SIZE = 500
+
+# Cold storage for enrollments from closed terms (student/archiving.py).
+# Set SMS_ARCHIVE_PATH to a second SQLite file; it is attached to every
+# connection as "archive" and filled by `manage.py archive_enrollments`.
+SMS_ARCHIVE_PATH = os.environ.get('SMS_ARCHIVE_PATH')
+SMS_ARCHIVE_BATCH_SIZE = 500
+
+# Sessions and the signed-in user (student/sessions.py). "cached_db" reads
+# sessions from the cache and writes them through to the database, "cache"
+# keeps them in the cache only and "db" is Django's default. The user behind
+# a session is cached for SMS_AUTH_CACHE_TIMEOUT seconds (0 turns it off).
+# Both caches are per process by default; point CACHES at a shared backend
+# when running several workers, or a logout only reaches the worker that
+# handled it. With a per-process cache every cached user is checked against
+# a stamp bumped by User saves, so deactivation and permission changes are
+# seen at once. `manage.py clear_expired_sessions` deletes expired session
+# rows in batches.
+SMS_SESSION_MODE = os.environ.get('SMS_SESSION_MODE', 'cached_db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}[SMS_SESSION_MODE]
+SMS_AUTH_CACHE = 'default'
+SMS_AUTH_CACHE_TIMEOUT = 300
+
+# Course catalog cache (student/catalog.py). Entries are keyed by a version
+# that changes whenever a course or its links change, and are always loaded
+# from the primary. The default cache is per process and cannot see another
+# worker's bumps, so with it entries last only SMS_CATALOG_LOCAL_TIMEOUT
+# seconds; point SMS_CATALOG_CACHE at a shared backend (Redis, Memcached)
+# to keep them for SMS_CATALOG_TIMEOUT.
+SMS_CATALOG_CACHE = 'default'
+SMS_CATALOG_LOCAL_SIZE = 64
+SMS_CATALOG_TIMEOUT = 3600
+SMS_CATALOG_LOCAL_TIMEOUT = 10
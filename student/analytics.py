@@ -0,0 +1,141 @@
+from itertools import chain, islice
+
+import numpy as np
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Course, Enrollment
+
+
+PERCENTILES = (10, 25, 75, 90)
+# Ten 10-point buckets; a score of exactly 100 lands in the last one.
+HISTOGRAM_EDGES = np.linspace(0, 100, 11)
+# Stand-in for NULL scores while fetching; scores are validated to 0-100.
+UNGRADED = -1.0
+STAT_NAMES = ('mean', 'std', 'median', 'min', 'max') + tuple(f'p{q}' for q in PERCENTILES)
+
+
+def load_scores(course_ids=None, chunk_size=50000):
+    """
+    Fetches ``(course_id, score)`` for every enrollment as two flat arrays.
+    Scores are cast to REAL in SQL so no Decimal objects are built, and
+    ungraded enrollments come back as NaN.
+    """
+    queryset = Enrollment.objects.all()
+    if course_ids is not None:
+        queryset = queryset.filter(course_id__in=course_ids)
+    score = Coalesce(Cast('score', FloatField()), Value(UNGRADED))
+    rows = queryset.order_by().values_list('course_id', score).iterator(chunk_size=chunk_size)
+
+    parts = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        flat = np.fromiter(chain.from_iterable(chunk), dtype=np.float64, count=2 * len(chunk))
+        parts.append(flat.reshape(-1, 2))
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    pairs = np.concatenate(parts)
+    scores = pairs[:, 1]
+    scores[scores == UNGRADED] = np.nan
+    return pairs[:, 0].astype(np.int64), scores
+
+
+def _group_percentile(sorted_scores, starts, counts, q):
+    """
+    Linear-interpolated percentile ``q`` of every group at once, given the
+    graded scores sorted within each group.
+    """
+    result = np.full(len(counts), np.nan)
+    has = counts > 0
+    position = (counts[has] - 1) * (q / 100.0)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    low_values = sorted_scores[starts[has] + lower]
+    high_values = sorted_scores[starts[has] + upper]
+    result[has] = low_values + (high_values - low_values) * (position - lower)
+    return result
+
+
+def course_statistics(course_ids, scores):
+    """
+    Computes per-course statistics in one vectorized pass. Returns the sorted
+    unique course ids and a dict of equally long arrays.
+    """
+    courses, group = np.unique(course_ids, return_inverse=True)
+    n_groups = len(courses)
+    graded = ~np.isnan(scores)
+
+    enrolled = np.bincount(group, minlength=n_groups)
+    count = np.bincount(group[graded], minlength=n_groups)
+    graded_scores = scores[graded]
+    graded_group = group[graded]
+    total = np.bincount(graded_group, weights=graded_scores, minlength=n_groups)
+    squares = np.bincount(graded_group, weights=graded_scores ** 2, minlength=n_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+        variance = np.where(count > 0, squares / count - mean ** 2, np.nan)
+    std = np.sqrt(np.clip(variance, 0, None))
+
+    # Sort graded scores by (course, score) so each group is a contiguous,
+    # ordered slice and order statistics become index arithmetic.
+    order = np.lexsort((graded_scores, graded_group))
+    sorted_scores = graded_scores[order]
+    starts = np.concatenate(([0], np.cumsum(count)[:-1])).astype(np.int64)
+
+    stats = {
+        'enrolled': enrolled,
+        'graded': count,
+        'ungraded': enrolled - count,
+        'mean': mean,
+        'std': std,
+        'median': _group_percentile(sorted_scores, starts, count, 50),
+        'min': _group_percentile(sorted_scores, starts, count, 0),
+        'max': _group_percentile(sorted_scores, starts, count, 100),
+    }
+    for q in PERCENTILES:
+        stats[f'p{q}'] = _group_percentile(sorted_scores, starts, count, q)
+
+    buckets = np.clip(np.digitize(graded_scores, HISTOGRAM_EDGES[1:-1]), 0, len(HISTOGRAM_EDGES) - 2)
+    bins = len(HISTOGRAM_EDGES) - 1
+    stats['histogram'] = np.bincount(graded_group * bins + buckets, minlength=n_groups * bins).reshape(n_groups, bins)
+    return courses, stats
+
+
+def _number(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def course_report(course_ids=None):
+    """
+    Returns one dict per course with its score statistics, including courses
+    that have no enrollments yet.
+    """
+    catalog = Course.objects.order_by('course_code').values('pk', 'name', 'course_code')
+    if course_ids is not None:
+        catalog = catalog.filter(pk__in=course_ids)
+    ids, scores = load_scores(course_ids)
+    courses, stats = course_statistics(ids, scores)
+    position = {int(course_id): index for index, course_id in enumerate(courses)}
+    labels = [f"{int(low)}-{int(high)}" for low, high in zip(HISTOGRAM_EDGES[:-1], HISTOGRAM_EDGES[1:])]
+
+    report = []
+    for course in catalog:
+        entry = {'id': course['pk'], 'name': course['name'], 'course_code': course['course_code']}
+        index = position.get(course['pk'])
+        if index is None:
+            entry.update(enrolled=0, graded=0, ungraded=0, histogram=dict.fromkeys(labels, 0))
+            entry.update(dict.fromkeys(STAT_NAMES))
+        else:
+            entry.update(
+                enrolled=int(stats['enrolled'][index]),
+                graded=int(stats['graded'][index]),
+                ungraded=int(stats['ungraded'][index]),
+                histogram=dict(zip(labels, (int(n) for n in stats['histogram'][index]))),
+            )
+            for name in STAT_NAMES:
+                entry[name] = _number(stats[name][index])
+        report.append(entry)
+    return report
@@ -0,0 +1,145 @@
+import json
+from functools import wraps
+
+from django.http import HttpResponse, JsonResponse
+
+from . import metadata, search
+from .models import Course, Enrollment, Instructor, Student
+from .pagination import paginate_by_cursor
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+def dumps(data):
+    """
+    Serializes ``data`` with orjson when it is installed, else the stdlib.
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def api_login_required(view):
+    """
+    Like ``login_required`` but answers 401 JSON instead of redirecting.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': "Authentication required."}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class Resource:
+    """
+    Describes how one model is exposed: which fields may be requested, which
+    of them are foreign keys (returned as ids and usable as filters) or
+    many-to-many relations, and how ``q`` filters it.
+    """
+
+    def __init__(self, model, fields, search_kind=None, relations=(), foreign_keys=()):
+        self.model = model
+        self.fields = fields
+        self.search_kind = search_kind
+        self.relations = relations
+        self.foreign_keys = foreign_keys
+
+    def requested_fields(self, request):
+        wanted = request.GET.get('fields')
+        if not wanted:
+            return list(self.fields)
+        names = [name.strip() for name in wanted.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        return ['id'] + [name for name in names if name != 'id']
+
+    def queryset(self, request, fields, include_metadata):
+        columns = [name for name in fields if name not in self.relations]
+        queryset = self.model.objects.only(*columns)
+        prefetch = [name for name in fields if name in self.relations]
+        if include_metadata:
+            prefetch.append('metadata')
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+
+        query = request.GET.get('q')
+        if query and self.search_kind:
+            field = 'course' if self.model is Enrollment else 'pk'
+            queryset = search.filter_queryset(queryset, self.search_kind, query, field=field)
+        for name in self.foreign_keys:
+            value = request.GET.get(name)
+            if value is not None:
+                if not value.isdigit():
+                    raise ValueError(f"'{name}' must be an id.")
+                queryset = queryset.filter(**{f"{name}_id": int(value)})
+        meta_filters = metadata.parse_filters(request.GET)
+        if meta_filters:
+            queryset = metadata.filter_queryset(queryset, meta_filters)
+        return queryset
+
+    def serialize(self, obj, fields, include_metadata):
+        item = {}
+        for name in fields:
+            if name in self.relations:
+                item[name] = [related.pk for related in getattr(obj, name).all()]
+            elif name in self.foreign_keys:
+                item[name] = getattr(obj, f"{name}_id")
+            else:
+                item[name] = _value(getattr(obj, name))
+        if include_metadata:
+            item['metadata'] = [{'key': meta.key, 'value': meta.value} for meta in obj.metadata.all()]
+        return item
+
+
+RESOURCES = {
+    'students': Resource(Student, ('id', 'first_name', 'last_name', 'email', 'dob'), search.STUDENT),
+    'courses': Resource(Course, ('id', 'name', 'course_code', 'description'), search.COURSE),
+    'instructors': Resource(
+        Instructor, ('id', 'first_name', 'last_name', 'email', 'courses'), search.INSTRUCTOR, relations=('courses',),
+    ),
+    'enrollments': Resource(
+        Enrollment, ('id', 'student', 'course', 'score'), search.COURSE, foreign_keys=('student', 'course'),
+    ),
+}
+
+
+@api_login_required
+def resource_list(request, resource):
+    """
+    Returns one cursor-paginated page of ``resource`` as JSON.
+
+    ``fields=a,b`` limits the columns loaded and returned, ``include=metadata``
+    adds the key/value pairs with a single prefetch query, and ``after``/
+    ``before`` move between pages, so each page costs a fixed number of
+    queries. ``meta.<key>=<value>`` filters by metadata as on the list pages.
+    """
+    spec = RESOURCES.get(resource)
+    if spec is None:
+        return JsonResponse({'error': f"Unknown resource '{resource}'."}, status=404)
+    include_metadata = 'metadata' in request.GET.get('include', '').split(',')
+    try:
+        fields = spec.requested_fields(request)
+        queryset = spec.queryset(request, fields, include_metadata)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    page = paginate_by_cursor(request, queryset)
+    data = {
+        'results': [spec.serialize(obj, fields, include_metadata) for obj in page],
+        'next': f"{request.path}?{page.next_query}" if page.has_next else None,
+        'previous': f"{request.path}?{page.previous_query}" if page.has_previous else None,
+    }
+    return HttpResponse(dumps(data), content_type='application/json')
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class StudentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'student'
+
+    def ready(self):
+        from . import archiving, signals, sqlite  # noqa: F401
+        sqlite.install()
+        archiving.install()
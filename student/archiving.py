@@ -0,0 +1,155 @@
+"""
+Cold storage for enrollments from closed terms.
+
+``SMS_ARCHIVE_PATH`` names a second SQLite file, attached to every SQLite
+connection as ``archive`` with ``ATTACH DATABASE``. ``archive_enrollments``
+moves the enrollments picked by metadata filters (on the enrollment or its
+course, e.g. ``meta.term=2021-fall`` or ``meta.ends__lt=2024-01-01``) into
+``archive.student_archivedenrollment`` in bounded batches, so the hot
+enrollment table and its indexes stay small. The enrollment views read the
+archived rows back with ``?archived=1``.
+
+Archived enrollments leave the dashboard counters and student summaries,
+which describe current enrollments; ``ArchivedEnrollment`` keeps their
+scores and metadata.
+"""
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+
+from . import counters, metadata, search, stamps, summaries
+from .models import ArchivedEnrollment, Course, Enrollment
+from .purging import raw_delete
+
+
+SCHEMA = 'archive'
+TABLE = 'student_archivedenrollment'
+# One query parameter per id; stay under SQLite's 999.
+MAX_BATCH_SIZE = 900
+
+CREATE_SQL = (
+    f'CREATE TABLE IF NOT EXISTS {SCHEMA}.{TABLE} ('
+    'id integer NOT NULL PRIMARY KEY, '
+    'student_id bigint NOT NULL, '
+    'course_id bigint NOT NULL, '
+    'score decimal NULL, '
+    "metadata text NOT NULL DEFAULT '', "
+    'archived_at datetime NOT NULL)',
+    f'CREATE INDEX IF NOT EXISTS {SCHEMA}.{TABLE}_student ON {TABLE} (student_id)',
+    f'CREATE INDEX IF NOT EXISTS {SCHEMA}.{TABLE}_course ON {TABLE} (course_id)',
+)
+
+
+def is_configured():
+    return bool(getattr(settings, 'SMS_ARCHIVE_PATH', None))
+
+
+def is_attached(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA database_list')
+        return any(row[1] == SCHEMA for row in cursor.fetchall())
+
+
+def attach(sender=None, connection=None, **kwargs):
+    """
+    Attaches the archive file to a new SQLite connection and creates its
+    table on first use.
+    """
+    if connection.vendor != 'sqlite' or not is_configured():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'ATTACH DATABASE %s AS {SCHEMA}', [settings.SMS_ARCHIVE_PATH])
+        for sql in CREATE_SQL:
+            cursor.execute(sql)
+
+
+def install():
+    connection_created.connect(attach, dispatch_uid='sms_archive_attach')
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None and not is_attached(connection):
+            attach(connection=connection)
+
+
+def candidates(enrollment_filters=None, course_filters=None):
+    """
+    Enrollments matching every enrollment filter and whose course matches
+    every course filter.
+    """
+    enrollments = Enrollment.objects.all()
+    if enrollment_filters:
+        enrollments = metadata.filter_queryset(enrollments, enrollment_filters)
+    if course_filters:
+        courses = metadata.filter_queryset(Course.all_objects.all(), course_filters)
+        enrollments = enrollments.filter(course__in=courses.values('pk'))
+    return enrollments
+
+
+def _metadata_text(ids):
+    through = Enrollment.metadata.through
+    pairs = {}
+    links = (
+        through.objects.filter(enrollment_id__in=ids).order_by('enrollment_id', 'metadata__key', 'metadata_id')
+        .values_list('enrollment_id', 'metadata__key', 'metadata__value')
+    )
+    for enrollment_id, key, value in links:
+        pairs.setdefault(enrollment_id, []).append(f"{key}:{value}")
+    return {enrollment_id: ', '.join(items) for enrollment_id, items in pairs.items()}
+
+
+def archive_batch(enrollments, batch_size):
+    """
+    Moves up to ``batch_size`` of ``enrollments`` into the archive in one
+    transaction and returns the number moved.
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    with transaction.atomic():
+        rows = list(enrollments.order_by('pk').values_list('pk', 'student_id', 'course_id', 'score')[:batch_size])
+        if not rows:
+            return 0
+        ids = [pk for pk, _, _, _ in rows]
+        texts = _metadata_text(ids)
+        # In WAL mode a commit is atomic per file only; ignoring conflicts
+        # lets a rerun finish a batch whose archive half already committed.
+        ArchivedEnrollment.objects.bulk_create([
+            ArchivedEnrollment(pk=pk, student_id=student_id, course_id=course_id, score=score, metadata=texts.get(pk, ''))
+            for pk, student_id, course_id, score in rows
+        ], ignore_conflicts=True)
+        raw_delete(Enrollment.metadata.through.objects.filter(enrollment_id__in=ids))
+        raw_delete(Enrollment.all_objects.filter(pk__in=ids))
+        deltas = {counters.ENROLLMENTS: -len(rows)}
+        for _, _, _, score in rows:
+            for name, delta in counters.enrollment_deltas(score, -1).items():
+                deltas[name] = deltas.get(name, 0) + delta
+        counters.bump(deltas)
+        summaries.refresh({student_id for _, student_id, _, _ in rows})
+        stamps.touch(stamps.ENROLLMENT)
+    return len(rows)
+
+
+def archive(enrollments, batch_size=None, max_batches=None, progress=None):
+    """
+    Moves ``enrollments`` into the archive batch by batch, each batch its own
+    transaction so writers are never blocked for long. Returns the number
+    moved; a run stopped by ``max_batches`` picks up the rest next time.
+    """
+    batch_size = batch_size or settings.SMS_ARCHIVE_BATCH_SIZE
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(enrollments, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if progress is not None:
+            progress(moved)
+    return moved
+
+
+def archived_for(student, query=None):
+    """
+    A student's archived enrollments with their courses, newest first.
+    """
+    archived = ArchivedEnrollment.objects.filter(student=student).select_related('course')
+    if query:
+        archived = search.filter_queryset(archived, search.COURSE, query, field='course')
+    return archived.order_by('-archived_at', '-pk')
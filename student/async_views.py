@@ -0,0 +1,138 @@
+"""
+Async versions of the read-heavy views, routed instead of the sync ones when
+``SMS_ASYNC_VIEWS`` is on (the default under ``sms/asgi.py``). They use the
+async ORM so an ASGI server never has to push them through the
+thread-sensitive sync adapter.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import render
+from django.views.decorators.gzip import gzip_page
+
+from . import archiving, catalog, counters, metadata, search, stamps
+from .models import Enrollment, Instructor, Student, StudentSummary
+from .pagination import PAGE_SIZE_CHOICES, apaginate_by_cursor
+
+
+def async_login_required(view):
+    """
+    ``login_required`` for coroutine views, resolving the user with
+    ``request.auser()``.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), settings.LOGIN_URL)
+        # Templates read request.user; hand them the user already loaded.
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_login_required
+async def dashboard(request):
+    """
+    Renders the dashboard from the precomputed counters.
+    """
+    totals = await counters.asnapshot()
+
+    context = {
+        'total_students': totals[counters.STUDENTS],
+        'total_courses': totals[counters.COURSES],
+        'total_instructors': totals[counters.INSTRUCTORS],
+        'total_enrollments': totals[counters.ENROLLMENTS],
+        'average_score': totals['average_score'],
+    }
+
+    return render(request, 'core/dashboard.html', context)
+
+
+@async_login_required
+@gzip_page
+@stamps.conditional(stamps.STUDENT, stamps.METADATA)
+async def student_list(request):
+    """
+    Displays a page of students with search and metadata filtering.
+    """
+    students = Student.objects.all()
+    query = request.GET.get('q')
+    if query:
+        students = await search.afilter_queryset(students, search.STUDENT, query)
+    meta_filters = metadata.parse_filters(request.GET)
+    if meta_filters:
+        students = metadata.filter_queryset(students, meta_filters)
+
+    page = await apaginate_by_cursor(request, students)
+    return render(request, 'student_app/list_students.html', {
+        'students': page, 'page': page, 'page_size_choices': PAGE_SIZE_CHOICES, 'query': query, 'meta_filters': meta_filters
+    })
+
+
+@async_login_required
+@gzip_page
+@stamps.conditional(stamps.INSTRUCTOR, stamps.COURSE, stamps.METADATA)
+async def instructor_list(request):
+    """
+    Displays a page of instructors with search.
+    """
+    instructors = Instructor.objects.all().prefetch_related('courses', 'metadata')
+    query = request.GET.get('q')
+    if query:
+        instructors = await search.afilter_queryset(instructors, search.INSTRUCTOR, query)
+    meta_filters = metadata.parse_filters(request.GET)
+    if meta_filters:
+        instructors = metadata.filter_queryset(instructors, meta_filters)
+
+    page = await apaginate_by_cursor(request, instructors)
+    return render(request, 'instructor_app/list_instructor.html', {
+        'instructors': page, 'page': page, 'page_size_choices': PAGE_SIZE_CHOICES, 'query': query, 'meta_filters': meta_filters
+    })
+
+
+@async_login_required
+@gzip_page
+@stamps.conditional(stamps.COURSE, stamps.METADATA)
+async def course_list(request):
+    """
+    Displays a page of courses with search.
+    """
+    query = request.GET.get('q')
+    meta_filters = metadata.parse_filters(request.GET)
+    page = await catalog.acourse_page(request)
+    return render(request, "course_app/list_course.html", {
+        "courses": page, 'page': page, 'page_size_choices': PAGE_SIZE_CHOICES, 'query': query, 'meta_filters': meta_filters
+    })
+
+
+@async_login_required
+@gzip_page
+@stamps.conditional(stamps.ENROLLMENT, stamps.STUDENT, stamps.COURSE, stamps.METADATA)
+async def enrollment_list(request, student_pk):
+    """
+    Lists a page of enrollments for a given student.
+    """
+    try:
+        student = await Student.objects.aget(pk=student_pk)
+    except Student.DoesNotExist:
+        raise Http404("No Student matches the given query.")
+    enrollments = Enrollment.objects.filter(student=student).select_related('course').prefetch_related('metadata')
+    query = request.GET.get('q')
+    if query:
+        enrollments = await search.afilter_queryset(enrollments, search.COURSE, query, field='course')
+    meta_filters = metadata.parse_filters(request.GET)
+    if meta_filters:
+        enrollments = metadata.filter_queryset(enrollments, meta_filters)
+
+    page = await apaginate_by_cursor(request, enrollments)
+    summary = await StudentSummary.objects.filter(student=student).afirst()
+    include_archived = archiving.is_configured() and request.GET.get('archived') == '1'
+    archived = [a async for a in archiving.archived_for(student, query)] if include_archived else None
+    return render(request, 'enrollment_app/list_enrollment.html', {
+        'student': student, 'summary': summary,
+        'enrollments': page, 'page': page, 'page_size_choices': PAGE_SIZE_CHOICES, 'query': query, 'meta_filters': meta_filters,
+        'archive_available': archiving.is_configured(), 'include_archived': include_archived, 'archived': archived,
+    })
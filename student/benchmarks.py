@@ -0,0 +1,293 @@
+"""
+Request plans for the view benchmark: how to call every named URL in
+``student.urls`` against a generated data set. Each plan builds one request
+per iteration; any setup it needs (e.g. a spare row to delete) happens before
+the timer starts.
+"""
+import random
+import statistics
+import time
+
+from django.db import connection
+from django.urls import URLPattern, get_resolver, reverse
+
+from .models import Course, Enrollment, Instructor, Student
+
+
+class Context:
+    """
+    Ids sampled from the generated data plus helpers that create throwaway
+    rows, so destructive plans never eat into the measured data set.
+    """
+
+    def __init__(self, user, seed=0):
+        self.user = user
+        self.rng = random.Random(seed)
+        self.student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True)[:1000])
+        self.course_ids = list(Course.objects.order_by('pk').values_list('pk', flat=True)[:1000])
+        self.instructor_ids = list(Instructor.objects.order_by('pk').values_list('pk', flat=True)[:1000])
+        self.enrollments = list(Enrollment.objects.order_by('pk').values_list('pk', 'student_id')[:1000])
+        self.sequence = 0
+
+    def next(self):
+        self.sequence += 1
+        return self.sequence
+
+    def student(self):
+        return self.rng.choice(self.student_ids)
+
+    def course(self):
+        return self.rng.choice(self.course_ids)
+
+    def instructor(self):
+        return self.rng.choice(self.instructor_ids)
+
+    def enrollment(self):
+        return self.rng.choice(self.enrollments)
+
+    def spare_student(self, enrollments=0):
+        student = Student.objects.create(
+            first_name='Spare', last_name='Student', email=f"spare{self.next()}@bench.example.com", dob='2000-01-01',
+        )
+        for course_id in self.rng.sample(self.course_ids, min(enrollments, len(self.course_ids))):
+            Enrollment.objects.create(student=student, course_id=course_id, score=50)
+        return student
+
+    def spare_course(self, enrollments=0):
+        course = Course.objects.create(name='Spare course', course_code=f"SPARE{self.next()}")
+        for student_id in self.rng.sample(self.student_ids, min(enrollments, len(self.student_ids))):
+            Enrollment.objects.create(student_id=student_id, course=course, score=50)
+        return course
+
+
+class Call:
+    __slots__ = ('method', 'path', 'data', 'anonymous')
+
+    def __init__(self, method, path, data=None, anonymous=False):
+        self.method = method
+        self.path = path
+        self.data = data
+        self.anonymous = anonymous
+
+
+def get(name, query='', **kwargs):
+    return lambda ctx: Call('get', reverse(name, kwargs=kwargs) + query)
+
+
+def _edit_student(ctx):
+    student = Student.objects.get(pk=ctx.student())
+    return Call('post', reverse('edit_student', args=[student.pk]), {
+        'first_name': student.first_name, 'last_name': student.last_name,
+        'email': student.email, 'dob': student.dob.isoformat(), 'metadata': 'term:v0, year:v1',
+    })
+
+
+def _edit_course(ctx):
+    course = Course.objects.get(pk=ctx.course())
+    return Call('post', reverse('edit_course', args=[course.pk]), {
+        'name': course.name, 'course_code': course.course_code,
+        'description': course.description or '', 'metadata': 'term:v0',
+    })
+
+
+def _edit_instructor(ctx):
+    instructor = Instructor.objects.get(pk=ctx.instructor())
+    return Call('post', reverse('edit_instructor', args=[instructor.pk]), {
+        'first_name': instructor.first_name, 'last_name': instructor.last_name, 'email': instructor.email,
+        'courses': [ctx.course(), ctx.course()], 'metadata': 'campus:v3',
+    })
+
+
+def _edit_enrollment(ctx):
+    enrollment = Enrollment.objects.get(pk=ctx.enrollment()[0])
+    return Call('post', reverse('edit_enrollment', args=[enrollment.student_id, enrollment.pk]), {
+        'course': enrollment.course_id, 'score': ctx.rng.randrange(0, 101), 'metadata': 'term:v0',
+    })
+
+
+def _delete_enrollment(ctx):
+    student = ctx.spare_student(enrollments=1)
+    enrollment = student.enrollments.get()
+    return Call('post', reverse('delete_enrollment', args=[student.pk, enrollment.pk]))
+
+
+def _bulk_enroll(ctx):
+    # Part of the cohort is enrolled already, so both outcomes are timed.
+    course = ctx.spare_course(enrollments=250)
+    return Call('post', reverse('bulk_enroll'), {
+        'course': course.pk, 'students': '\n'.join(str(pk) for pk in ctx.rng.sample(ctx.student_ids, min(500, len(ctx.student_ids)))),
+    })
+
+
+def _gradebook(ctx):
+    course = ctx.spare_course(enrollments=200)
+    return Call('post', reverse('course_gradebook', args=[course.pk]), {
+        f"score_{pk}": ctx.rng.randrange(0, 101) for pk in course.enrollments.values_list('pk', flat=True)
+    })
+
+
+# (label, url name, request builder). A URL may have several plans, e.g. a
+# GET form and its POST, or a list page with and without a search.
+PLANS = [
+    ('index', 'index', get('index')),
+    ('dashboard', 'dashboard', get('dashboard')),
+    ('student_list', 'student_list', get('student_list')),
+    ('student_list?q', 'student_list', get('student_list', '?q=chen')),
+    ('student_list?meta', 'student_list', get('student_list', '?meta.term=v0&meta.year=v1')),
+    ('student_list?meta-range', 'student_list', get('student_list', '?meta.year__gte=2020&meta.year__lt=2030')),
+    ('add_student', 'add_student', get('add_student')),
+    ('add_student:post', 'add_student', lambda ctx: Call('post', reverse('add_student'), {
+        'first_name': 'Bench', 'last_name': 'Student', 'email': f"bench{ctx.next()}@bench.example.com",
+        'dob': '2001-02-03', 'metadata': 'term:v0, year:v1',
+    })),
+    ('edit_student', 'edit_student', lambda ctx: Call('get', reverse('edit_student', args=[ctx.student()]))),
+    ('edit_student:post', 'edit_student', _edit_student),
+    ('delete_student:post', 'delete_student', lambda ctx: Call(
+        'post', reverse('delete_student', args=[ctx.spare_student(enrollments=5).pk]),
+    )),
+    ('course_list', 'course_list', get('course_list')),
+    ('course_list?q', 'course_list', get('course_list', '?q=bio')),
+    ('course_list?meta', 'course_list', get('course_list', '?meta.term=v*')),
+    ('add_course', 'add_course', get('add_course')),
+    ('add_course:post', 'add_course', lambda ctx: Call('post', reverse('add_course'), {
+        'name': 'Bench course', 'course_code': f"BENCH{ctx.next()}", 'description': '', 'metadata': 'term:v0',
+    })),
+    ('edit_course', 'edit_course', lambda ctx: Call('get', reverse('edit_course', args=[ctx.course()]))),
+    ('edit_course:post', 'edit_course', _edit_course),
+    ('delete_course:post', 'delete_course', lambda ctx: Call(
+        'post', reverse('delete_course', args=[ctx.spare_course(enrollments=20).pk]),
+    )),
+    ('course_analytics', 'course_analytics', get('course_analytics')),
+    ('course_gradebook', 'course_gradebook', lambda ctx: Call('get', reverse('course_gradebook', args=[ctx.course()]))),
+    ('course_gradebook:post', 'course_gradebook', _gradebook),
+    ('course_analytics_json', 'course_analytics_json', get('course_analytics_json')),
+    ('course_typeahead?code', 'course_typeahead', get('course_typeahead', '?q=C0001')),
+    ('course_typeahead?name', 'course_typeahead', get('course_typeahead', '?q=bio')),
+    ('instructor_list', 'instructor_list', get('instructor_list')),
+    ('instructor_list?q', 'instructor_list', get('instructor_list', '?q=adams')),
+    ('instructor_list?meta', 'instructor_list', get('instructor_list', '?meta.campus=v3')),
+    ('add_instructor', 'add_instructor', get('add_instructor')),
+    ('add_instructor:post', 'add_instructor', lambda ctx: Call('post', reverse('add_instructor'), {
+        'first_name': 'Bench', 'last_name': 'Instructor', 'email': f"instructor{ctx.next()}@bench.example.com",
+        'courses': [ctx.course(), ctx.course()], 'metadata': 'campus:v3',
+    })),
+    ('edit_instructor', 'edit_instructor', lambda ctx: Call('get', reverse('edit_instructor', args=[ctx.instructor()]))),
+    ('edit_instructor:post', 'edit_instructor', _edit_instructor),
+    ('delete_instructor:post', 'delete_instructor', lambda ctx: Call(
+        'post', reverse('delete_instructor', args=[Instructor.objects.create(
+            first_name='Spare', last_name='Instructor', email=f"spare{ctx.next()}@bench.example.com",
+        ).pk]),
+    )),
+    ('enrollment_list', 'enrollment_list', lambda ctx: Call('get', reverse('enrollment_list', args=[ctx.student()]))),
+    ('enrollment_list?meta', 'enrollment_list', lambda ctx: Call(
+        'get', reverse('enrollment_list', args=[ctx.student()]) + '?meta.term=v0',
+    )),
+    ('add_enrollment', 'add_enrollment', lambda ctx: Call('get', reverse('add_enrollment', args=[ctx.student()]))),
+    ('add_enrollment:post', 'add_enrollment', lambda ctx: Call(
+        'post', reverse('add_enrollment', args=[ctx.spare_student().pk]), {'course': ctx.course(), 'score': 75},
+    )),
+    ('edit_enrollment', 'edit_enrollment', lambda ctx: Call(
+        'get', reverse('edit_enrollment', args=list(reversed(ctx.enrollment()))),
+    )),
+    ('edit_enrollment:post', 'edit_enrollment', _edit_enrollment),
+    ('delete_enrollment:post', 'delete_enrollment', _delete_enrollment),
+    ('bulk_enroll', 'bulk_enroll', lambda ctx: Call('get', reverse('bulk_enroll') + f"?course={ctx.course()}")),
+    ('bulk_enroll:post', 'bulk_enroll', _bulk_enroll),
+    ('export_data:courses', 'export_data', get('export_data', kind='courses')),
+    ('export_data:students', 'export_data', get('export_data', kind='students')),
+    ('export_data:enrollments', 'export_data', lambda ctx: Call(
+        'get', reverse('export_data', args=['enrollments']) + f"?student={ctx.student()}",
+    )),
+    ('api_list:students', 'api_list', get('api_list', '?include=metadata', resource='students')),
+    ('api_list:enrollments', 'api_list', get('api_list', resource='enrollments')),
+    ('api_list:students?meta', 'api_list', get('api_list', '?meta.term=v0', resource='students')),
+    ('metrics', 'metrics', get('metrics')),
+    ('register', 'register', lambda ctx: Call('get', reverse('register'), anonymous=True)),
+    ('signin', 'signin', lambda ctx: Call('get', reverse('signin'), anonymous=True)),
+    ('signout', 'signout', lambda ctx: Call('get', reverse('signout'), anonymous=True)),
+]
+
+
+def url_names(urlconf='student.urls'):
+    """
+    Every named URL in ``urlconf``, so new views without a plan get noticed.
+    """
+    return [p.name for p in get_resolver(urlconf).url_patterns if isinstance(p, URLPattern) and p.name]
+
+
+def unplanned(urlconf='student.urls'):
+    planned = {name for _, name, _ in PLANS}
+    return [name for name in url_names(urlconf) if name not in planned]
+
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(q / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure(client, anonymous_client, ctx, build, repeat=20, warmup=2):
+    """
+    Issues ``warmup + repeat`` requests built by ``build`` and returns the
+    latency percentiles (ms), query counts and response statuses of the
+    measured ones. Streaming bodies are consumed inside the timer.
+    """
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries[-1] += 1
+        return execute(sql, params, many, context)
+
+    latencies, statuses = [], set()
+    for iteration in range(warmup + repeat):
+        call = build(ctx)
+        target = anonymous_client if call.anonymous else client
+        queries.append(0)
+        # Not connection.execute_wrapper(): it pops the last wrapper, which
+        # is the metrics hook if the connection was opened mid-request.
+        connection.execute_wrappers.append(count)
+        try:
+            started = time.perf_counter()
+            response = getattr(target, call.method)(call.path, call.data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        finally:
+            connection.execute_wrappers.remove(count)
+        if iteration >= warmup:
+            latencies.append(elapsed * 1000)
+            statuses.add(response.status_code)
+
+    measured = queries[warmup:]
+    latencies.sort()
+    return {
+        'requests': repeat,
+        'statuses': sorted(statuses),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'queries_min': min(measured),
+        'queries_max': max(measured),
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Yields ``(scale, label, message)`` for every plan that got slower by more
+    than ``threshold`` at p50 or now issues more queries than ``baseline``.
+    """
+    for scale, results in current.get('results', {}).items():
+        before = baseline.get('results', {}).get(scale, {})
+        for label, result in results.items():
+            old = before.get(label)
+            if old is None:
+                continue
+            if result['queries_max'] > old['queries_max']:
+                yield scale, label, f"queries {old['queries_max']} -> {result['queries_max']}"
+            if old['p50_ms'] and result['p50_ms'] > old['p50_ms'] * (1 + threshold):
+                yield scale, label, f"p50 {old['p50_ms']}ms -> {result['p50_ms']}ms"
@@ -0,0 +1,278 @@
+"""
+Versioned read-through cache for the course catalog.
+
+Every entry is keyed by the catalog version kept in the shared cache
+(``settings.SMS_CATALOG_CACHE``). Course saves and deletes, and changes to
+course links, bump the version once their transaction commits, so stale
+entries are simply never looked up again. A small per-process LRU sits in
+front of the shared cache so a hit costs no unpickling.
+
+Loaders always read the primary, even in views routed to the replica: a
+replica row cached under the current version would outlive the refresh
+that corrects it. A per-process cache (``LocMemCache``) never sees another
+worker's bump, so there entries live only ``SMS_CATALOG_LOCAL_TIMEOUT``
+seconds and the LRU is skipped.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.functions import Lower
+
+from . import metadata, search
+from .models import Course
+from .pagination import CursorPage, apaginate_by_cursor, get_page_size, paginate_by_cursor
+
+
+VERSION_KEY = 'sms:catalog:version'
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX = 25
+
+
+class LRU:
+    """
+    Thread-safe mapping that keeps at most ``size`` entries, evicting the
+    least recently used one.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self.entries[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = LRU(getattr(settings, 'SMS_CATALOG_LOCAL_SIZE', 64))
+_MISSING = object()
+
+
+def _cache():
+    return caches[getattr(settings, 'SMS_CATALOG_CACHE', 'default')]
+
+
+def is_shared():
+    """False for a per-process cache, which only sees this worker's bumps."""
+    return not isinstance(_cache(), LocMemCache)
+
+
+def _timeout():
+    timeout = getattr(settings, 'SMS_CATALOG_TIMEOUT', 3600)
+    if is_shared():
+        return timeout
+    return min(timeout, getattr(settings, 'SMS_CATALOG_LOCAL_TIMEOUT', 10))
+
+
+def _courses():
+    # The primary, never the replica; see the module docstring.
+    return Course.objects.using(DEFAULT_DB_ALIAS)
+
+
+def version():
+    """
+    Current catalog version. A missing key (first use, or evicted) starts
+    from the clock so it can never repeat an earlier version.
+    """
+    cache = _cache()
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+async def aversion():
+    cache = _cache()
+    current = await cache.aget(VERSION_KEY)
+    if current is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), None)
+        current = await cache.aget(VERSION_KEY)
+    return current
+
+
+def bump():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def bump_on_commit():
+    """
+    Bumps once the current transaction commits, so no reader can cache the
+    old rows under the new version.
+    """
+    transaction.on_commit(bump)
+
+
+def _shared_key(current, variant):
+    digest = hashlib.md5(repr(variant).encode()).hexdigest()
+    return f"sms:catalog:{current}:{digest}"
+
+
+def cached(variant, loader):
+    """
+    Returns ``loader()`` cached under ``variant`` (a tuple) for the current
+    catalog version, checking the local LRU, then the shared cache.
+    """
+    current = version()
+    shared = is_shared()
+    local_key = (current, variant)
+    value = _local.get(local_key, _MISSING) if shared else _MISSING
+    if value is not _MISSING:
+        return value
+
+    cache = _cache()
+    value = cache.get(_shared_key(current, variant), _MISSING)
+    if value is _MISSING:
+        value = loader()
+        cache.set(_shared_key(current, variant), value, _timeout())
+    if shared:
+        _local.set(local_key, value)
+    return value
+
+
+async def acached(variant, aloader):
+    """
+    Async counterpart of :func:`cached`; ``aloader`` is a coroutine function.
+    """
+    current = await aversion()
+    shared = is_shared()
+    local_key = (current, variant)
+    value = _local.get(local_key, _MISSING) if shared else _MISSING
+    if value is not _MISSING:
+        return value
+
+    cache = _cache()
+    value = await cache.aget(_shared_key(current, variant), _MISSING)
+    if value is _MISSING:
+        value = await aloader()
+        await cache.aset(_shared_key(current, variant), value, _timeout())
+    if shared:
+        _local.set(local_key, value)
+    return value
+
+
+def _suggest(query, limit):
+    found = {}
+
+    def collect(rows):
+        for row in rows:
+            if len(found) < limit:
+                found.setdefault(row['pk'], row)
+
+    fields = ('pk', 'name', 'course_code')
+    low, high = search.prefix_bounds(query.upper())
+    collect(_courses().filter(course_code__gte=low, course_code__lt=high).order_by('course_code').values(*fields)[:limit])
+    if len(found) < limit:
+        low, high = search.prefix_bounds(query.lower())
+        collect(
+            _courses().alias(name_key=Lower('name'))
+            .filter(name_key__gte=low, name_key__lt=high)
+            .order_by('name_key', 'pk').values(*fields)[:limit]
+        )
+    if len(found) < limit:
+        # Words later in the name, e.g. "bio" for "Intro to Biology".
+        ids = [pk for pk in search.search(search.COURSE, query, limit + len(found)) if pk not in found]
+        if ids:
+            rows = {row['pk']: row for row in _courses().filter(pk__in=ids).values(*fields)}
+            collect(rows[pk] for pk in ids if pk in rows)
+    return [{'id': row['pk'], 'code': row['course_code'], 'name': row['name']} for row in found.values()]
+
+
+def suggest(query, limit=TYPEAHEAD_LIMIT):
+    """
+    Up to ``limit`` courses for the typeahead: code prefix matches first,
+    then name prefix matches, then other name words.
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+    limit = max(1, min(limit, TYPEAHEAD_MAX))
+    return cached(('suggest', query.lower(), limit), lambda: _suggest(query, limit))
+
+
+def selected_courses(values):
+    """
+    Looks up submitted course ids in one query. Returns the matching courses
+    in submission order and the values that matched no course.
+    """
+    ids, unknown = [], []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            unknown.append(str(value))
+    by_id = Course.objects.only('pk', 'name', 'course_code').in_bulk(set(ids)) if ids else {}
+    courses = []
+    for pk in dict.fromkeys(ids):
+        if pk in by_id:
+            courses.append(by_id[pk])
+        else:
+            unknown.append(str(pk))
+    return courses, unknown
+
+
+def _course_page_variant(request):
+    page_size = get_page_size(request)
+    query = request.GET.get('q') or ''
+    meta_filters = metadata.parse_filters(request.GET)
+    variant = (
+        'course_page', query, request.GET.get('after'), request.GET.get('before'), page_size,
+        tuple(sorted((f.key, f.lookup, f.value) for f in meta_filters)),
+    )
+    queryset = _courses()
+    if query:
+        queryset = search.filter_queryset(queryset, search.COURSE, query)
+    if meta_filters:
+        queryset = metadata.filter_queryset(queryset, meta_filters)
+    return variant, queryset, page_size
+
+
+def course_page(request):
+    """
+    The course list page for the request's search and cursor parameters.
+    """
+    variant, queryset, page_size = _course_page_variant(request)
+
+    def load():
+        page = paginate_by_cursor(request, queryset, page_size)
+        return page.object_list, page.next_cursor, page.prev_cursor
+
+    rows, next_cursor, prev_cursor = cached(variant, load)
+    return CursorPage(rows, page_size, next_cursor, prev_cursor, request.GET)
+
+
+async def acourse_page(request):
+    await search.ais_available()
+    variant, queryset, page_size = _course_page_variant(request)
+
+    async def load():
+        page = await apaginate_by_cursor(request, queryset, page_size)
+        return page.object_list, page.next_cursor, page.prev_cursor
+
+    rows, next_cursor, prev_cursor = await acached(variant, load)
+    return CursorPage(rows, page_size, next_cursor, prev_cursor, request.GET)
@@ -0,0 +1,251 @@
+"""
+Incremental compaction of the ``Metadata`` table.
+
+Two phases, each in short batches with one transaction per batch so no
+write lock is held for long:
+
+1. Duplicates: rows sharing a ``(key, value)`` are merged into the oldest
+   one by repointing the four through tables, dropping links that would
+   then repeat, and deleting the extra rows.
+2. Orphans: rows that no through table references any more are deleted.
+
+Progress is saved in a ``JobCheckpoint`` after every batch, so a run that
+is interrupted or hits its time limit resumes where it stopped.
+"""
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Case, Exists, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from . import catalog, stamps
+from .models import Course, JobCheckpoint, Metadata
+from .purging import raw_delete
+
+
+CHECKPOINT = 'metadata_compaction'
+DEDUPE = 'dedupe'
+ORPHANS = 'orphans'
+DONE = 'done'
+MAX_BATCH_SIZE = 300
+
+
+class CompactionReport:
+    def __init__(self):
+        self.batches = 0
+        self.duplicates_merged = 0
+        self.links_repointed = 0
+        self.links_dropped = 0
+        self.orphans_deleted = 0
+        self.bytes_reclaimed = 0
+        self.finished = False
+
+    @property
+    def rows_deleted(self):
+        return self.duplicates_merged + self.orphans_deleted
+
+
+def links():
+    """
+    ``(through model, owner column, owner model)`` for each model that has
+    metadata.
+    """
+    result = []
+    for relation in Metadata._meta.related_objects:
+        if relation.many_to_many:
+            field = relation.remote_field
+            result.append((field.remote_field.through, f"{field.m2m_field_name()}_id", relation.related_model))
+    return result
+
+
+def _payload_bytes(queryset):
+    return queryset.aggregate(size=Sum(Length('key') + Length('value')))['size'] or 0
+
+
+def _touch_links(changed):
+    names = {stamps.METADATA} | {stamps.MODEL_STAMPS[owner] for owner in changed}
+    stamps.touch(*names)
+    if Course in changed:
+        catalog.bump_on_commit()
+
+
+def _groups(position, scan_size):
+    """
+    The next ``(key, value, [pks])`` groups in index order from ``position``
+    (inclusive), and whether the scan reached the end of the table.
+    """
+    rows = Metadata.objects.order_by('key', 'value', 'pk')
+    if position.get('key') is not None:
+        # ``key >= k`` is the index range; the OR only filters within it.
+        rows = rows.filter(Q(key__gte=position['key']), Q(key__gt=position['key']) | Q(value__gte=position['value']))
+    rows = list(rows.values_list('pk', 'key', 'value')[:scan_size])
+    groups = []
+    for pk, key, value in rows:
+        if groups and groups[-1][0] == key and groups[-1][1] == value:
+            groups[-1][2].append(pk)
+        else:
+            groups.append((key, value, [pk]))
+    return groups, len(rows) < scan_size
+
+
+def merge(groups, report):
+    """
+    Merges each group's rows into its first (oldest) row.
+    """
+    targets = {pk: pks[0] for _, _, pks in groups for pk in pks[1:]}
+    if not targets:
+        return
+    changed = set()
+    for through, owner, owner_model in links():
+        # An owner linked to two rows of the same group keeps only the
+        # link to the lowest id, so repointing cannot break uniqueness.
+        repeated = through.objects.filter(metadata_id__in=targets).filter(Exists(
+            through.objects.filter(**{
+                owner: OuterRef(owner),
+                'metadata__key': OuterRef('metadata__key'),
+                'metadata__value': OuterRef('metadata__value'),
+                'metadata_id__lt': OuterRef('metadata_id'),
+            })
+        ))
+        dropped = raw_delete(repeated)
+        repointed = through.objects.filter(metadata_id__in=targets).update(metadata_id=Case(
+            *[When(metadata_id=duplicate, then=Value(keep)) for duplicate, keep in targets.items()],
+        ))
+        report.links_dropped += dropped
+        report.links_repointed += repointed
+        if dropped or repointed:
+            changed.add(owner_model)
+    duplicates = Metadata.objects.filter(pk__in=targets)
+    report.bytes_reclaimed += _payload_bytes(duplicates)
+    report.duplicates_merged += raw_delete(duplicates)
+    _touch_links(changed)
+
+
+def orphans(after, scan_size, min_age):
+    """
+    Metadata rows after pk ``after`` (within the next ``scan_size`` ids)
+    that nothing links to and that are older than ``min_age``, so a pair
+    created a moment ago is not removed before its link is written.
+    """
+    upper = Metadata.objects.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[scan_size - 1:scan_size]
+    upper = list(upper)
+    queryset = Metadata.objects.filter(pk__gt=after, created_at__lt=timezone.now() - min_age)
+    if upper:
+        queryset = queryset.filter(pk__lte=upper[0])
+    for through, _, _ in links():
+        queryset = queryset.filter(~Exists(through.objects.filter(metadata_id=OuterRef('pk'))))
+    return queryset, (upper[0] if upper else None)
+
+
+def _take(groups, limit):
+    """
+    The duplicate groups to merge in one batch, holding at most ``limit``
+    extra rows, and whether every group in ``groups`` fits. A single group
+    larger than ``limit`` is cut so that a batch always makes progress.
+    """
+    taken, rows = [], 0
+    for key, value, pks in groups:
+        if len(pks) < 2:
+            continue
+        if rows + len(pks) - 1 > limit:
+            if not taken:
+                taken.append((key, value, pks[:limit + 1]))
+            return taken, False
+        taken.append((key, value, pks))
+        rows += len(pks) - 1
+    return taken, True
+
+
+def _dedupe_batch(position, batch_size, scan_size, report):
+    groups, at_end = _groups(position, scan_size)
+    # Unless the scan hit the end, its last group may continue past it. A
+    # scan holding a single group is that group's head and merged as is.
+    complete = groups if at_end or len(groups) == 1 else groups[:-1]
+    taken, all_taken = _take(complete, batch_size)
+    merge(taken, report)
+    if not all_taken:
+        key, value, _ = taken[-1]
+    elif at_end:
+        return {'phase': ORPHANS, 'after': 0}
+    else:
+        key, value, _ = groups[-1]
+    return {'phase': DEDUPE, 'key': key, 'value': value}
+
+
+def _orphan_batch(position, batch_size, scan_size, min_age, report):
+    queryset, upper = orphans(position['after'], scan_size, min_age)
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+    if ids:
+        # Deleting through the same filter re-checks the link tables inside
+        # the DELETE, so a row linked since the scan survives.
+        doomed = queryset.filter(pk__in=ids)
+        report.bytes_reclaimed += _payload_bytes(doomed)
+        report.orphans_deleted += raw_delete(doomed)
+        stamps.touch(stamps.METADATA)
+    if len(ids) == batch_size:
+        return {'phase': ORPHANS, 'after': ids[-1]}
+    if upper is None:
+        return {'phase': DONE}
+    return {'phase': ORPHANS, 'after': upper}
+
+
+def load_checkpoint(restart=False):
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    if restart or checkpoint.position.get('phase') in (None, DONE):
+        checkpoint.position = {'phase': DEDUPE}
+    return checkpoint
+
+
+def compact(batch_size=200, scan_size=5000, min_age=None, time_limit=None, max_batches=None, pause=0.0,
+            restart=False, progress=None):
+    """
+    Runs (or resumes) the compaction until it finishes, ``time_limit``
+    seconds pass or ``max_batches`` batches are done, and returns a
+    ``CompactionReport``. ``pause`` sleeps between batches to leave room
+    for other writers.
+    """
+    # Each merged row costs three query parameters; stay under SQLite's 999.
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    scan_size = max(2, scan_size)
+    min_age = min_age if min_age is not None else timedelta(hours=1)
+    report = CompactionReport()
+    checkpoint = load_checkpoint(restart)
+    position = checkpoint.position
+    started = time.monotonic()
+
+    while position['phase'] != DONE:
+        if max_batches is not None and report.batches >= max_batches:
+            break
+        if time_limit is not None and time.monotonic() - started >= time_limit:
+            break
+        with transaction.atomic():
+            if position['phase'] == DEDUPE:
+                position = _dedupe_batch(position, batch_size, scan_size, report)
+            else:
+                position = _orphan_batch(position, batch_size, scan_size, min_age, report)
+            checkpoint.position = position
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        report.batches += 1
+        if progress is not None:
+            progress(report, position)
+        if pause and position['phase'] != DONE:
+            time.sleep(pause)
+
+    report.finished = position['phase'] == DONE
+    return report
+
+
+def freelist_bytes():
+    """
+    Bytes in SQLite's free pages, reusable by new rows; ``VACUUM`` returns
+    them to the filesystem.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA freelist_count')
+        pages = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        return pages * cursor.fetchone()[0]
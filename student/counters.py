@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+from django.db.models import Case, Count, F, Sum, Value, When
+
+from .models import Counter, Course, Enrollment, Instructor, Student
+
+
+STUDENTS = 'students'
+COURSES = 'courses'
+INSTRUCTORS = 'instructors'
+ENROLLMENTS = 'enrollments'
+GRADED_ENROLLMENTS = 'graded_enrollments'
+# Sum of all scores in hundredths, so it fits an integer column exactly.
+SCORE_SUM = 'score_sum'
+
+NAMES = (STUDENTS, COURSES, INSTRUCTORS, ENROLLMENTS, GRADED_ENROLLMENTS, SCORE_SUM)
+
+MODEL_COUNTERS = {
+    Student: STUDENTS,
+    Course: COURSES,
+    Instructor: INSTRUCTORS,
+    Enrollment: ENROLLMENTS,
+}
+
+
+def score_units(score):
+    return 0 if score is None else int(round(Decimal(str(score)) * 100))
+
+
+def bump(deltas):
+    """
+    Applies ``{name: delta}`` to the counters in a single UPDATE.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = Counter.objects.filter(name__in=deltas).update(
+        value=F('value') + Case(*[When(name=name, then=Value(delta)) for name, delta in deltas.items()], default=Value(0))
+    )
+    if updated < len(deltas):
+        # A counter row is missing: rebuild everything from the tables.
+        reconcile()
+
+
+def enrollment_deltas(score, sign=1):
+    """
+    Counter changes for adding (``sign=1``) or removing (``sign=-1``) one
+    enrollment's score.
+    """
+    if score is None:
+        return {}
+    return {GRADED_ENROLLMENTS: sign, SCORE_SUM: sign * score_units(score)}
+
+
+def record_created(model, instances):
+    """
+    Counts rows inserted without ``post_save``, e.g. by ``bulk_create``.
+    """
+    instances = list(instances)
+    name = MODEL_COUNTERS.get(model)
+    if name is None or not instances:
+        return
+    deltas = {name: len(instances)}
+    if model is Enrollment:
+        deltas[GRADED_ENROLLMENTS] = sum(1 for enrollment in instances if enrollment.score is not None)
+        deltas[SCORE_SUM] = sum(score_units(enrollment.score) for enrollment in instances)
+    bump(deltas)
+
+
+def compute():
+    """
+    Recomputes every counter from the model tables.
+    """
+    enrollments = Enrollment.objects.aggregate(total=Count('pk'), graded=Count('score'), score_sum=Sum('score'))
+    return {
+        STUDENTS: Student.objects.count(),
+        COURSES: Course.objects.count(),
+        INSTRUCTORS: Instructor.objects.count(),
+        ENROLLMENTS: enrollments['total'],
+        GRADED_ENROLLMENTS: enrollments['graded'],
+        SCORE_SUM: score_units(enrollments['score_sum']),
+    }
+
+
+def reconcile():
+    """
+    Overwrites the stored counters with freshly computed values and returns
+    ``{name: (stored, actual)}`` for the ones that had drifted.
+    """
+    actual = compute()
+    stored = dict(Counter.objects.values_list('name', 'value'))
+    drift = {}
+    for name, value in actual.items():
+        if stored.get(name) != value:
+            drift[name] = (stored.get(name), value)
+            Counter.objects.update_or_create(name=name, defaults={'value': value})
+    return drift
+
+
+def _with_average(values):
+    graded = values[GRADED_ENROLLMENTS]
+    values['average_score'] = round(values[SCORE_SUM] / 100 / graded, 2) if graded else None
+    return values
+
+
+def snapshot():
+    """
+    Returns the dashboard figures from the counter table in one query.
+    """
+    values = dict.fromkeys(NAMES, 0)
+    values.update(Counter.objects.filter(name__in=NAMES).values_list('name', 'value'))
+    return _with_average(values)
+
+
+async def asnapshot():
+    """
+    Async counterpart of :func:`snapshot`.
+    """
+    values = dict.fromkeys(NAMES, 0)
+    async for name, value in Counter.objects.filter(name__in=NAMES).values_list('name', 'value'):
+        values[name] = value
+    return _with_average(values)
@@ -0,0 +1,133 @@
+"""
+Deterministic synthetic data for benchmarks and local load testing.
+"""
+import datetime
+import random
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import catalog, counters, search, stamps, summaries
+from .importing import chunked
+from .models import Course, Enrollment, Instructor, Metadata, Student
+
+
+SCALES = {
+    '1k': {'students': 200, 'courses': 20, 'instructors': 10, 'enrollments': 1000},
+    '100k': {'students': 10000, 'courses': 500, 'instructors': 200, 'enrollments': 100000},
+    '1m': {'students': 100000, 'courses': 2000, 'instructors': 500, 'enrollments': 1000000},
+}
+
+FIRST_NAMES = ('Ava', 'Ben', 'Chloe', 'David', 'Emma', 'Farah', 'George', 'Hana', 'Ivan', 'Julia', 'Kiran', 'Liam')
+LAST_NAMES = ('Adams', 'Brown', 'Chen', 'Dahal', 'Evans', 'Garcia', 'Khan', 'Lopez', 'Maharjan', 'Nguyen', 'Shrestha')
+SUBJECTS = ('Algebra', 'Biology', 'Chemistry', 'Databases', 'Economics', 'French', 'Geometry', 'History', 'Physics')
+METADATA_KEYS = ('term', 'year', 'status', 'campus', 'advisor', 'track')
+
+
+def course_weights(count, skew):
+    """
+    Zipf-like popularity weights: ``skew=0`` spreads enrollments evenly, while
+    larger values concentrate them in a few huge courses.
+    """
+    return [1.0 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def generate(students=200, courses=20, instructors=10, enrollments=1000, metadata=50,
+             metadata_per_row=2, skew=0.0, seed=0, batch_size=5000):
+    """
+    Inserts a reproducible data set: the same arguments always produce the
+    same rows. Enrollments are capped at ``students * courses`` since each
+    pair can only appear once. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    enrollments = min(enrollments, students * courses)
+
+    with transaction.atomic():
+        metadata_rows = Metadata.objects.bulk_create([
+            Metadata(key=METADATA_KEYS[i % len(METADATA_KEYS)], value=f"v{i}") for i in range(metadata)
+        ])
+        metadata_ids = [meta.pk for meta in metadata_rows]
+
+        course_rows = Course.objects.bulk_create([
+            Course(
+                name=f"{SUBJECTS[i % len(SUBJECTS)]} {i // len(SUBJECTS) + 1}",
+                course_code=f"C{i:06d}",
+                description=f"Synthetic course {i}",
+            )
+            for i in range(courses)
+        ], batch_size=batch_size)
+        course_ids = [course.pk for course in course_rows]
+
+        epoch = datetime.date(1995, 1, 1)
+        student_ids = []
+        for start in range(0, students, batch_size):
+            rows = Student.objects.bulk_create([
+                Student(
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    email=f"student{i}@example.com",
+                    dob=epoch + datetime.timedelta(days=rng.randrange(3650)),
+                )
+                for i in range(start, min(start + batch_size, students))
+            ])
+            student_ids.extend(student.pk for student in rows)
+
+        instructor_rows = Instructor.objects.bulk_create([
+            Instructor(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), email=f"instructor{i}@example.com")
+            for i in range(instructors)
+        ])
+        Instructor.courses.through.objects.bulk_create([
+            Instructor.courses.through(instructor_id=instructor.pk, course_id=course_id)
+            for instructor in instructor_rows
+            for course_id in rng.sample(course_ids, min(3, len(course_ids)))
+        ], ignore_conflicts=True)
+
+        weights = course_weights(len(course_ids), skew)
+        pairs = set()
+        while len(pairs) < enrollments:
+            needed = enrollments - len(pairs)
+            picked_students = rng.choices(student_ids, k=needed)
+            picked_courses = rng.choices(course_ids, weights=weights, k=needed)
+            pairs.update(zip(picked_students, picked_courses))
+        pairs = sorted(pairs)[:enrollments]
+
+        for chunk in chunked(pairs, batch_size):
+            Enrollment.objects.bulk_create([
+                Enrollment(
+                    student_id=student_id,
+                    course_id=course_id,
+                    score=None if rng.random() < 0.1 else Decimal(rng.randrange(0, 10001)) / 100,
+                )
+                for student_id, course_id in chunk
+            ])
+
+        if metadata_ids and metadata_per_row:
+            for model, fk, ids in (
+                (Student, 'student_id', student_ids),
+                (Course, 'course_id', course_ids),
+                (Instructor, 'instructor_id', [instructor.pk for instructor in instructor_rows]),
+            ):
+                through = model.metadata.through
+                for chunk in chunked(ids, batch_size):
+                    through.objects.bulk_create([
+                        through(**{fk: owner_id, 'metadata_id': meta_id})
+                        for owner_id in chunk
+                        for meta_id in rng.sample(metadata_ids, min(metadata_per_row, len(metadata_ids)))
+                    ])
+
+    # bulk_create skips signals, so bring the derived tables up to date.
+    if search.is_available():
+        search.rebuild()
+    counters.reconcile()
+    catalog.bump()
+    stamps.touch(*stamps.NAMES)
+    for chunk in chunked(student_ids, batch_size):
+        summaries.refresh(chunk)
+
+    return {
+        'students': students,
+        'courses': courses,
+        'instructors': instructors,
+        'enrollments': len(pairs),
+        'metadata': metadata,
+    }
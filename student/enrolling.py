@@ -0,0 +1,117 @@
+"""
+Cohort enrollment: puts a set of students into one course with a single
+conflict-tolerant INSERT per batch. The ``(student, course)`` unique
+constraint skips students who are already enrolled, so nothing is checked
+row by row.
+"""
+import re
+
+from django.db import transaction
+
+from . import counters, search, stamps, summaries
+from .models import Enrollment, Student
+
+
+BATCH_SIZE = 1000
+MAX_STUDENTS = 20000
+
+_separator_re = re.compile(r'[\s,;]+')
+
+
+class CohortResult:
+    def __init__(self):
+        self.created = 0
+        self.existing = 0
+
+    @property
+    def total(self):
+        return self.created + self.existing
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def parse_references(text):
+    """
+    Splits pasted text or an uploaded file into student ids and emails.
+    Returns ``(ids, emails, invalid)``; a first line that holds neither
+    (a CSV header) is skipped.
+    """
+    ids, emails, invalid = [], [], []
+    for number, line in enumerate(text.splitlines()):
+        tokens = [token.strip('"\'') for token in _separator_re.split(line) if token.strip('"\'')]
+        parsed = 0
+        bad = []
+        for token in tokens:
+            if token.isdigit():
+                ids.append(int(token))
+                parsed += 1
+            elif '@' in token:
+                emails.append(token)
+                parsed += 1
+            else:
+                bad.append(token)
+        if number or parsed:
+            invalid.extend(bad)
+    return ids, emails, invalid
+
+
+def resolve_students(ids=(), emails=(), query=None):
+    """
+    Student primary keys for the given ids, emails and search query, in
+    batched lookups. Returns ``(student_ids, unknown)`` where ``unknown``
+    lists the ids and emails that matched no student.
+    """
+    found = {}
+    unknown = []
+
+    ids = list(dict.fromkeys(ids))
+    for chunk in _chunks(ids, BATCH_SIZE):
+        existing = set(Student.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+        for pk in chunk:
+            if pk in existing:
+                found[pk] = None
+            else:
+                unknown.append(str(pk))
+
+    emails = list(dict.fromkeys(emails))
+    for chunk in _chunks(emails, BATCH_SIZE):
+        by_email = dict(Student.objects.filter(email__in=chunk).values_list('email', 'pk'))
+        for email in chunk:
+            if email in by_email:
+                found[by_email[email]] = None
+            else:
+                unknown.append(email)
+
+    if query:
+        matches = search.filter_queryset(Student.objects.all(), search.STUDENT, query)
+        found.update(dict.fromkeys(matches.values_list('pk', flat=True)[:MAX_STUDENTS + 1]))
+
+    return list(found), unknown
+
+
+def enroll(course, student_ids, batch_size=BATCH_SIZE):
+    """
+    Enrolls ``student_ids`` (existing students) in ``course``. Each batch is
+    one transaction: count, INSERT ... ON CONFLICT DO NOTHING, count again,
+    then the bookkeeping ``bulk_create`` skips (counters, summaries, stamps).
+    """
+    result = CohortResult()
+    for batch in _chunks(list(dict.fromkeys(student_ids)), batch_size):
+        with transaction.atomic():
+            enrolled = Enrollment.objects.filter(course=course, student_id__in=batch)
+            before = enrolled.count()
+            Enrollment.objects.bulk_create(
+                [Enrollment(student_id=student_id, course=course) for student_id in batch],
+                ignore_conflicts=True,
+            )
+            created = enrolled.count() - before
+            if created:
+                counters.bump({counters.ENROLLMENTS: created})
+                summaries.refresh(batch)
+                stamps.touch(stamps.ENROLLMENT)
+        result.created += created
+        result.existing += len(batch) - created
+    return result
@@ -0,0 +1,162 @@
+import csv
+import json
+from collections import defaultdict
+
+from . import metadata, search
+from .importing import chunked
+from .models import Course, Enrollment, Instructor, Metadata, Student
+
+
+META_PREFIX = 'meta.'
+
+
+def _student_row(student):
+    return {
+        'id': student.pk,
+        'first_name': student.first_name,
+        'last_name': student.last_name,
+        'email': student.email,
+        'dob': student.dob.isoformat() if student.dob else '',
+    }
+
+
+def _course_row(course):
+    return {
+        'id': course.pk,
+        'name': course.name,
+        'course_code': course.course_code,
+        'description': course.description,
+    }
+
+
+def _instructor_row(instructor):
+    return {
+        'id': instructor.pk,
+        'first_name': instructor.first_name,
+        'last_name': instructor.last_name,
+        'email': instructor.email,
+    }
+
+
+def _enrollment_row(enrollment):
+    return {
+        'id': enrollment.pk,
+        'student_email': enrollment.student.email,
+        'course_code': enrollment.course.course_code,
+        'score': '' if enrollment.score is None else str(enrollment.score),
+    }
+
+
+EXPORTS = {
+    'students': (Student, 'student_id', ['id', 'first_name', 'last_name', 'email', 'dob'], _student_row),
+    'courses': (Course, 'course_id', ['id', 'name', 'course_code', 'description'], _course_row),
+    'instructors': (Instructor, 'instructor_id', ['id', 'first_name', 'last_name', 'email', 'courses'], _instructor_row),
+    'enrollments': (Enrollment, 'enrollment_id', ['id', 'student_email', 'course_code', 'score'], _enrollment_row),
+}
+
+
+SEARCH_KINDS = {
+    'students': search.STUDENT,
+    'courses': search.COURSE,
+    'instructors': search.INSTRUCTOR,
+}
+
+
+def export_queryset(kind, query=None, student_pk=None, meta_filters=None):
+    """
+    Returns the queryset to export, filtered the same way as the list views:
+    by the ``q`` search and by ``meta_filters`` (see ``metadata.parse_filters``).
+    """
+    model = EXPORTS[kind][0]
+    if kind == 'enrollments':
+        queryset = Enrollment.objects.select_related('student', 'course').only(
+            'pk', 'score', 'student__email', 'course__course_code'
+        )
+        if student_pk is not None:
+            queryset = queryset.filter(student_id=student_pk)
+        if query:
+            queryset = search.filter_queryset(queryset, search.COURSE, query, field='course')
+    else:
+        queryset = model.objects.all()
+        if query:
+            queryset = search.filter_queryset(queryset, SEARCH_KINDS[kind], query)
+    if meta_filters:
+        queryset = metadata.filter_queryset(queryset, meta_filters)
+    return queryset
+
+
+def metadata_columns(kind, queryset):
+    """
+    Lists the ``meta.<key>`` columns present on the exported rows, in one
+    query against the metadata through table.
+    """
+    model, fk, _, _ = EXPORTS[kind]
+    through = model.metadata.through
+    keys = (
+        Metadata.objects.filter(pk__in=through.objects.filter(**{f"{fk}__in": queryset.values('pk')}).values('metadata_id'))
+        .values_list('key', flat=True).distinct().order_by('key')
+    )
+    return [META_PREFIX + key for key in keys]
+
+
+def export_rows(kind, queryset, chunk_size=2000):
+    """
+    Yields one flat dict per row. Rows are read with ``iterator()`` and their
+    metadata (and instructor courses) fetched once per chunk, so memory stays
+    flat whatever the table size.
+    """
+    model, fk, _, to_row = EXPORTS[kind]
+    through = model.metadata.through
+    for chunk in chunked(queryset.order_by('pk').iterator(chunk_size=chunk_size), chunk_size):
+        ids = [obj.pk for obj in chunk]
+        metadata = defaultdict(lambda: defaultdict(list))
+        for owner_id, key, value in through.objects.filter(**{f"{fk}__in": ids}).values_list(
+            fk, 'metadata__key', 'metadata__value'
+        ):
+            metadata[owner_id][key].append(value)
+
+        courses = defaultdict(list)
+        if kind == 'instructors':
+            for instructor_id, code in Instructor.courses.through.objects.filter(instructor_id__in=ids).values_list(
+                'instructor_id', 'course__course_code'
+            ):
+                courses[instructor_id].append(code)
+
+        for obj in chunk:
+            row = to_row(obj)
+            if kind == 'instructors':
+                row['courses'] = ';'.join(sorted(courses[obj.pk]))
+            for key, values in metadata[obj.pk].items():
+                row[META_PREFIX + key] = '; '.join(values)
+            yield row
+
+
+class Echo:
+    """File-like object that hands back what is written, for streaming csv."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(columns, rows):
+    writer = csv.DictWriter(Echo(), fieldnames=columns, extrasaction='ignore')
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def iter_export(kind, fmt='csv', query=None, student_pk=None, chunk_size=2000, meta_filters=None):
+    """
+    Yields the encoded export of ``kind`` line by line.
+    """
+    queryset = export_queryset(kind, query, student_pk, meta_filters)
+    rows = export_rows(kind, queryset, chunk_size)
+    if fmt == 'jsonl':
+        return iter_jsonl(rows)
+    columns = EXPORTS[kind][2] + metadata_columns(kind, queryset)
+    return iter_csv(columns, rows)
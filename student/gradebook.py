@@ -0,0 +1,93 @@
+"""
+Per-course gradebook: loads a course's roster in one joined query and saves
+every changed score with one ``bulk_update``.
+"""
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import counters, stamps, summaries
+from .models import Enrollment
+
+
+FIELD_PREFIX = 'score_'
+
+
+def roster(course):
+    """
+    The course's enrollments with their students, sorted by student name.
+    Sorting here keeps the query on the ``course_id`` index.
+    """
+    enrollments = list(
+        Enrollment.objects.filter(course=course).select_related('student')
+        .only('pk', 'score', 'student_id', 'student__first_name', 'student__last_name', 'student__email')
+    )
+    enrollments.sort(key=lambda e: (e.student.last_name.lower(), e.student.first_name.lower(), e.pk))
+    return enrollments
+
+
+def submitted_scores(data):
+    """
+    ``{enrollment_pk: raw_value}`` from a POST: the ``scores`` JSON field the
+    page script sends, or one ``score_<pk>`` field per row without it.
+    """
+    raw = {}
+    if data.get('scores'):
+        try:
+            values = json.loads(data['scores'])
+        except ValueError:
+            raise ValidationError("The submitted scores could not be read.")
+        if not isinstance(values, dict):
+            raise ValidationError("The submitted scores could not be read.")
+        items = values.items()
+    else:
+        items = ((name[len(FIELD_PREFIX):], value) for name, value in data.items() if name.startswith(FIELD_PREFIX))
+    for key, value in items:
+        try:
+            raw[int(key)] = '' if value is None else str(value).strip()
+        except ValueError:
+            continue
+    return raw
+
+
+def validate(enrollments, raw):
+    """
+    Cleans every submitted score with the model field's validators in one
+    pass. Returns ``(changes, errors)``: ``(enrollment, new_score)`` pairs for
+    the scores that differ, and ``{enrollment_pk: message}``.
+    """
+    field = Enrollment._meta.get_field('score')
+    changes, errors = [], {}
+    for enrollment in enrollments:
+        if enrollment.pk not in raw:
+            continue
+        try:
+            score = field.clean(raw[enrollment.pk] or None, enrollment)
+        except ValidationError as e:
+            errors[enrollment.pk] = '; '.join(e.messages)
+            continue
+        if score != enrollment.score:
+            changes.append((enrollment, score))
+    return changes, errors
+
+
+def save(changes):
+    """
+    Writes ``changes`` with one ``bulk_update`` and applies what the skipped
+    ``post_save`` handlers would have: counters, summaries and the stamp.
+    """
+    if not changes:
+        return
+    deltas = {}
+    for enrollment, score in changes:
+        for name, delta in counters.enrollment_deltas(enrollment.score, -1).items():
+            deltas[name] = deltas.get(name, 0) + delta
+        for name, delta in counters.enrollment_deltas(score).items():
+            deltas[name] = deltas.get(name, 0) + delta
+        enrollment.score = score
+    with transaction.atomic():
+        Enrollment.objects.bulk_update([enrollment for enrollment, _ in changes], ['score'])
+        counters.bump(deltas)
+        summaries.refresh({enrollment.student_id for enrollment, _ in changes})
+        stamps.touch(stamps.ENROLLMENT)
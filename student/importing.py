@@ -0,0 +1,302 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import catalog, counters, search, stamps, summaries
+from .metadata import parse_metadata, resolve_pairs
+from .models import Course, Enrollment, Instructor, Student
+
+
+def read_rows(path, fmt=None):
+    """
+    Streams ``(line_number, row_dict)`` tuples from a CSV or JSONL file
+    without loading it into memory.
+    """
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if fmt == 'jsonl':
+            for number, line in enumerate(handle, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = {'__error__': f"Invalid JSON: {e}"}
+                if not isinstance(row, dict):
+                    row = {'__error__': _not_an_object(row)}
+                yield number, row
+        else:
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def _not_an_object(row):
+    return f"Expected a JSON object, got {type(row).__name__}: {json.dumps(row, default=str)[:100]}"
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text(row, name):
+    value = row.get(name)
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _student_email(row):
+    return _text(row, 'student_email') or _text(row, 'email')
+
+
+def _error_message(error):
+    if isinstance(error, ValidationError) and hasattr(error, 'message_dict'):
+        return '; '.join(
+            f"{field.replace('_', ' ').capitalize()}: {message}"
+            for field, messages in error.message_dict.items()
+            for message in messages
+        )
+    if isinstance(error, ValidationError):
+        return '; '.join(error.messages)
+    return str(error)
+
+
+class Importer:
+    """
+    Validates rows in chunks and writes each chunk with ``bulk_create`` in its
+    own transaction. Subclasses turn a row into an unsaved instance and may
+    link extra many-to-many rows once the chunk has primary keys.
+    """
+    model = None
+    metadata_fk = None
+    clean_exclude = ()
+
+    def __init__(self, batch_size=5000, error_writer=None):
+        self.batch_size = batch_size
+        self.error_writer = error_writer
+        self.metadata_cache = {}
+        self.created = 0
+        self.rejected = 0
+
+    def prepare(self):
+        """Loads the lookup maps needed before the first chunk."""
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def validate(self, instance):
+        instance.full_clean(validate_unique=False, validate_constraints=False, exclude=self.clean_exclude)
+
+    def accept(self, instance):
+        """Records a validated instance in the lookup maps."""
+
+    def after_create(self, instances, rows):
+        """Hook to link related rows once ``instances`` have primary keys."""
+
+    def reject(self, number, row, message):
+        self.rejected += 1
+        if self.error_writer is not None:
+            self.error_writer.writerow([self.model._meta.model_name, number, message, json.dumps(row, default=str)])
+
+    def run(self, rows):
+        self.prepare()
+        for chunk in chunked(rows, self.batch_size):
+            self.import_chunk(chunk)
+        return self.created, self.rejected
+
+    def import_chunk(self, chunk):
+        instances, accepted = [], []
+        for number, row in chunk:
+            try:
+                if not isinstance(row, dict):
+                    raise ValidationError(_not_an_object(row))
+                if '__error__' in row:
+                    raise ValidationError(row['__error__'])
+                instance = self.build(row)
+                self.validate(instance)
+            except (ValidationError, ValueError, TypeError) as e:
+                self.reject(number, row, _error_message(e))
+                continue
+            self.accept(instance)
+            instances.append(instance)
+            accepted.append(row)
+
+        if not instances:
+            return
+        with transaction.atomic():
+            self.model.objects.bulk_create(instances, batch_size=self.batch_size)
+            counters.record_created(self.model, instances)
+            stamps.touch(stamps.MODEL_STAMPS[self.model])
+            self.link_metadata(instances, accepted)
+            self.after_create(instances, accepted)
+        self.created += len(instances)
+
+    def link_metadata(self, instances, rows):
+        parsed = [parse_metadata(_text(row, 'metadata')) for row in rows]
+        pairs = {pair for row_pairs in parsed for pair in row_pairs}
+        if not pairs:
+            return
+        resolve_pairs(pairs, cache=self.metadata_cache)
+        through = self.model.metadata.through
+        links = [
+            through(**{self.metadata_fk: instance.pk, 'metadata_id': self.metadata_cache[pair]})
+            for instance, row_pairs in zip(instances, parsed)
+            for pair in row_pairs
+        ]
+        through.objects.bulk_create(links, batch_size=self.batch_size)
+
+
+class StudentImporter(Importer):
+    model = Student
+    metadata_fk = 'student_id'
+
+    def prepare(self):
+        # Rows waiting to be purged still hold their email.
+        self.emails = set(Student.all_objects.values_list('email', flat=True).iterator(chunk_size=self.batch_size))
+
+    def build(self, row):
+        email = _text(row, 'email')
+        if email in self.emails:
+            raise ValidationError({'email': ["A student with this email already exists."]})
+        return Student(
+            first_name=_text(row, 'first_name'),
+            last_name=_text(row, 'last_name'),
+            email=email,
+            dob=_text(row, 'dob') or None,
+        )
+
+    def accept(self, instance):
+        self.emails.add(instance.email)
+
+    def after_create(self, instances, rows):
+        search.index_many(instances)
+
+
+class CourseImporter(Importer):
+    model = Course
+    metadata_fk = 'course_id'
+
+    def prepare(self):
+        self.codes = set(Course.all_objects.values_list('course_code', flat=True))
+
+    def build(self, row):
+        code = _text(row, 'course_code').upper()
+        if code in self.codes:
+            raise ValidationError({'course_code': ["A course with this code already exists."]})
+        return Course(name=_text(row, 'name'), course_code=code, description=_text(row, 'description'))
+
+    def accept(self, instance):
+        self.codes.add(instance.course_code)
+
+    def after_create(self, instances, rows):
+        search.index_many(instances)
+        catalog.bump_on_commit()
+
+
+class InstructorImporter(Importer):
+    model = Instructor
+    metadata_fk = 'instructor_id'
+
+    def prepare(self):
+        self.emails = set(Instructor.objects.values_list('email', flat=True))
+        self.course_ids = dict(Course.objects.values_list('course_code', 'pk'))
+
+    def build(self, row):
+        email = _text(row, 'email')
+        if email in self.emails:
+            raise ValidationError({'email': ["An instructor with this email already exists."]})
+        codes = [code.upper() for code in _text(row, 'courses').replace(';', ' ').replace(',', ' ').split()]
+        unknown = [code for code in codes if code not in self.course_ids]
+        if unknown:
+            raise ValidationError({'courses': [f"Unknown course code(s): {', '.join(unknown)}"]})
+        instructor = Instructor(first_name=_text(row, 'first_name'), last_name=_text(row, 'last_name'), email=email)
+        instructor._course_ids = {self.course_ids[code] for code in codes}
+        return instructor
+
+    def accept(self, instance):
+        self.emails.add(instance.email)
+
+    def after_create(self, instances, rows):
+        through = Instructor.courses.through
+        through.objects.bulk_create(
+            [through(instructor_id=instructor.pk, course_id=course_id)
+             for instructor in instances for course_id in instructor._course_ids],
+            batch_size=self.batch_size,
+        )
+        search.index_many(
+            Instructor.objects.filter(pk__in=[instructor.pk for instructor in instances]).prefetch_related('courses')
+        )
+        catalog.bump_on_commit()
+
+
+class EnrollmentImporter(Importer):
+    model = Enrollment
+    metadata_fk = 'enrollment_id'
+    clean_exclude = ('student', 'course')
+
+    def prepare(self):
+        self.student_ids = dict(Student.objects.values_list('email', 'pk').iterator(chunk_size=self.batch_size))
+        self.course_ids = dict(Course.objects.values_list('course_code', 'pk'))
+
+    def build(self, row):
+        email = _student_email(row)
+        code = _text(row, 'course_code').upper()
+        errors = {}
+        if email not in self.student_ids:
+            errors['student'] = [f"No student with email '{email}'."]
+        if code not in self.course_ids:
+            errors['course'] = [f"No course with code '{code}'."]
+        if errors:
+            raise ValidationError(errors)
+        score = _text(row, 'score')
+        return Enrollment(student_id=self.student_ids[email], course_id=self.course_ids[code], score=score or None)
+
+    def import_chunk(self, chunk):
+        # Drop pairs that already exist, or repeat within the chunk, before
+        # validation so the unique constraint never aborts a batch.
+        self.existing = set(
+            Enrollment.all_objects.filter(
+                student_id__in={self.student_ids.get(_student_email(row)) for _, row in chunk if isinstance(row, dict)},
+            ).values_list('student_id', 'course_id')
+        )
+        super().import_chunk(chunk)
+
+    def validate(self, instance):
+        pair = (instance.student_id, instance.course_id)
+        if pair in self.existing:
+            raise ValidationError("This student is already enrolled in the selected course.")
+        super().validate(instance)
+
+    def accept(self, instance):
+        self.existing.add((instance.student_id, instance.course_id))
+
+    def after_create(self, instances, rows):
+        summaries.refresh({enrollment.student_id for enrollment in instances})
+
+
+IMPORTERS = {
+    'students': StudentImporter,
+    'courses': CourseImporter,
+    'instructors': InstructorImporter,
+    'enrollments': EnrollmentImporter,
+}
+
+
+def open_error_report(path):
+    """
+    Opens the rejected-rows CSV and returns ``(handle, writer)``.
+    """
+    handle = open(path, 'w', newline='', encoding='utf-8')
+    writer = csv.writer(handle)
+    writer.writerow(['model', 'line', 'error', 'row'])
+    return handle, writer
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from student import archiving, metadata
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves enrollments from closed terms into the archive database (SMS_ARCHIVE_PATH) "
+        "in short batched transactions. Select them by enrollment or course metadata, "
+        "e.g. --enrollment meta.term=2021-fall or --course meta.ends__lt=2024-01-01."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enrollment', action='append', default=[], metavar='FILTER',
+                            help="Enrollment metadata filter, meta.<key>=<value>; repeat to combine.")
+        parser.add_argument('--course', action='append', default=[], metavar='FILTER',
+                            help="Course metadata filter, meta.<key>=<value>; repeat to combine.")
+        parser.add_argument('--batch-size', type=int,
+                            help=f"Enrollments moved per transaction (at most {archiving.MAX_BATCH_SIZE}).")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches; run again to continue.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the matching enrollments.")
+
+    def handle(self, *args, **options):
+        if not archiving.is_configured():
+            raise CommandError("No archive configured; set SMS_ARCHIVE_PATH.")
+        enrollment_filters = metadata.parse_conditions(options['enrollment'])
+        course_filters = metadata.parse_conditions(options['course'])
+        if len(enrollment_filters) < len(options['enrollment']) or len(course_filters) < len(options['course']):
+            raise CommandError("Filters look like meta.<key>=<value>, meta.<key>__lt=<value>, ...")
+        if not enrollment_filters and not course_filters:
+            raise CommandError("Give at least one --enrollment or --course filter.")
+
+        enrollments = archiving.candidates(enrollment_filters, course_filters)
+        if options['dry_run']:
+            self.stdout.write(f"{enrollments.count()} enrollment(s) would be archived.")
+            return
+
+        def progress(moved):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{moved} archived")
+
+        moved = archiving.archive(enrollments, options['batch_size'], options['max_batches'], progress)
+        remaining = enrollments.exists()
+        message = f"Archived {moved} enrollment(s)."
+        if remaining:
+            self.stdout.write(self.style.WARNING(f"{message} More match; run again to continue."))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
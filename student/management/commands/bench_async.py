@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+
+DEFAULT_URLS = ('dashboard', 'student_list', 'course_list', 'instructor_list')
+HEADERS = {'host': 'localhost'}
+
+
+def _summary(mode, url, latencies, elapsed, failures):
+    latencies = sorted(latencies)
+    return {
+        'mode': mode,
+        'url': url,
+        'requests': len(latencies),
+        'failures': failures,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures requests per second of the read-heavy views through the WSGI handler "
+        "(sync views, thread pool) or the ASGI handler (async views, event loop). "
+        "Use --compare to run both modes in separate processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="Existing user to log in as.")
+        parser.add_argument('--url', action='append', help="Path to request (default: dashboard and list views).")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per URL.")
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--compare', action='store_true', help="Run the WSGI and ASGI modes one after the other.")
+        parser.add_argument('--json', action='store_true', help="Print one JSON object per result.")
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(options)
+
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['username']}'.")
+        urls = options['url'] or [reverse(name) for name in DEFAULT_URLS]
+
+        for url in urls:
+            if settings.SMS_ASYNC_VIEWS:
+                result = asyncio.run(self.run_asgi(user, url, options['requests'], options['concurrency']))
+            else:
+                result = self.run_wsgi(user, url, options['requests'], options['concurrency'])
+            self.report(result, options['json'])
+
+    def run_wsgi(self, user, url, total, concurrency):
+        def worker(count):
+            client = Client(headers=HEADERS)
+            client.force_login(user)
+            latencies, failures = [], 0
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.get(url)
+                latencies.append(time.perf_counter() - started)
+                failures += response.status_code != 200
+            return latencies, failures
+
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(worker, [share for share in shares if share]))
+        elapsed = time.perf_counter() - started
+        latencies = [latency for result in results for latency in result[0]]
+        return _summary('wsgi', url, latencies, elapsed, sum(result[1] for result in results))
+
+    async def run_asgi(self, user, url, total, concurrency):
+        client = AsyncClient(headers=HEADERS)
+        await client.aforce_login(user)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, failures = [], 0
+
+        async def one():
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - started)
+                failures += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        return _summary('asgi', url, latencies, elapsed, failures)
+
+    def compare(self, options):
+        argv = [sys.executable, sys.argv[0], 'bench_async', '--json',
+                '--username', options['username'],
+                '--requests', str(options['requests']), '--concurrency', str(options['concurrency'])]
+        for url in options['url'] or []:
+            argv += ['--url', url]
+        for flag in ('0', '1'):
+            env = dict(os.environ, SMS_ASYNC_VIEWS=flag)
+            output = subprocess.run(argv, env=env, check=True, capture_output=True, text=True).stdout
+            for line in output.splitlines():
+                self.report(json.loads(line), options['json'])
+
+    def report(self, result, as_json):
+        if as_json:
+            self.stdout.write(json.dumps(result))
+            return
+        self.stdout.write(
+            f"{result['mode']:4} {result['url']:<30} {result['rps']:>8} req/s  "
+            f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  failures {result['failures']}"
+        )
@@ -0,0 +1,157 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+from student import counters, datagen, sqlite
+from student.metadata import set_metadata
+from student.models import Enrollment, Student
+
+
+def _read(rng, student_ids):
+    """
+    What the dashboard, student list and enrollment list read per request.
+    """
+    counters.snapshot()
+    list(Student.objects.order_by('pk')[:26])
+    student_id = rng.choice(student_ids)
+    list(Enrollment.objects.filter(student_id=student_id).select_related('course').order_by('pk')[:26])
+
+
+def _write(rng, enrollment_ids, sequence):
+    """
+    An enrollment score edit or a new student with metadata, as the edit and
+    add views do.
+    """
+    if rng.random() < 0.7:
+        enrollment = Enrollment.objects.get(pk=rng.choice(enrollment_ids))
+        enrollment.score = rng.randrange(0, 101)
+        enrollment.save()
+    else:
+        with transaction.atomic():
+            student = Student.objects.create(
+                first_name='Load', last_name='Test', email=f"load{sequence}@example.com", dob='2000-01-01',
+            )
+            set_metadata(student, 'term:v0, year:v1')
+
+
+def _summary(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'operations': len(latencies),
+        'errors': errors,
+        'ops_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        'p95_ms': round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 2) if latencies else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Mixed read/write load test against a file-backed copy of generated data, using one "
+        "connection per thread and Django's request-boundary connection handling. Reports "
+        "throughput, latency and 'database is locked' errors for the current SMS_DB_PROFILE; "
+        "--compare runs the development and production profiles one after the other."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(datagen.SCALES), default='1k')
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--compare', action='store_true', help="Run both profiles in separate processes.")
+        parser.add_argument('--json', action='store_true', help="Print the result as JSON.")
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(options)
+
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'load.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                datagen.generate(seed=options['seed'], **datagen.SCALES[options['scale']])
+                result = self.run_load(options)
+                result['pragmas'] = sqlite.current_pragmas(connection)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.report(result, options['json'])
+
+    def run_load(self, options):
+        student_ids = list(Student.objects.values_list('pk', flat=True))
+        enrollment_ids = list(Enrollment.objects.values_list('pk', flat=True))
+        connection.close()
+
+        stop = time.perf_counter() + options['seconds']
+        sequence = iter(range(10 ** 9))
+        lock = threading.Lock()
+
+        def worker(kind, seed):
+            rng = random.Random(seed)
+            latencies, errors = [], 0
+            while time.perf_counter() < stop:
+                # Mirror a request: connections are recycled at its boundaries.
+                close_old_connections()
+                started = time.perf_counter()
+                try:
+                    if kind == 'read':
+                        _read(rng, student_ids)
+                    else:
+                        with lock:
+                            number = next(sequence)
+                        _write(rng, enrollment_ids, number)
+                except OperationalError:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+                finally:
+                    close_old_connections()
+            connection.close()
+            return kind, latencies, errors
+
+        jobs = [('read', i) for i in range(options['readers'])]
+        jobs += [('write', options['readers'] + i) for i in range(options['writers'])]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(lambda job: worker(*job), jobs))
+        elapsed = time.perf_counter() - started
+
+        summary = {'profile': settings.SMS_DB_PROFILE, 'conn_max_age': connection.settings_dict['CONN_MAX_AGE']}
+        for kind in ('read', 'write'):
+            latencies = [value for k, values, _ in results if k == kind for value in values]
+            errors = sum(e for k, _, e in results if k == kind)
+            summary[kind] = _summary(latencies, errors, elapsed)
+        return summary
+
+    def compare(self, options):
+        argv = [sys.executable, sys.argv[0], 'bench_db_load', '--json',
+                '--scale', options['scale'], '--readers', str(options['readers']),
+                '--writers', str(options['writers']), '--seconds', str(options['seconds']),
+                '--seed', str(options['seed'])]
+        for profile in ('development', 'production'):
+            env = dict(os.environ, SMS_DB_PROFILE=profile)
+            output = subprocess.run(argv, env=env, check=True, capture_output=True, text=True).stdout
+            self.report(json.loads(output.splitlines()[-1]), options['json'])
+
+    def report(self, result, as_json):
+        if as_json:
+            self.stdout.write(json.dumps(result))
+            return
+        self.stdout.write(f"{result['profile']} (pragmas {result['pragmas']}, CONN_MAX_AGE {result['conn_max_age']})")
+        for kind in ('read', 'write'):
+            stats = result[kind]
+            self.stdout.write(
+                f"  {kind:5} {stats['ops_per_second']:>8} ops/s  p50 {stats['p50_ms']} ms  "
+                f"p95 {stats['p95_ms']} ms  errors {stats['errors']}"
+            )
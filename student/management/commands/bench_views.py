@@ -0,0 +1,112 @@
+import json
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from student import benchmarks, datagen
+
+
+HEADERS = {'host': 'localhost'}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every URL in student/urls.py against a freshly generated test database "
+        "at one or more data scales, recording latency percentiles and query counts. "
+        "Results are written as JSON so runs from different commits can be compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='append', choices=sorted(datagen.SCALES), help="Repeatable (default: 1k).")
+        parser.add_argument('--repeat', type=int, default=20, help="Measured requests per plan.")
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--skew', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', action='append', help="Run only plans whose label starts with this.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Baseline JSON to check for regressions.")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Allowed p50 slowdown (fraction).")
+
+    def handle(self, *args, **options):
+        missing = benchmarks.unplanned()
+        if missing:
+            raise CommandError(f"No benchmark plan for: {', '.join(missing)}")
+        plans = [
+            plan for plan in benchmarks.PLANS
+            if not options['only'] or any(plan[0].startswith(prefix) for prefix in options['only'])
+        ]
+
+        report = {
+            'meta': {
+                'revision': _git_revision(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'async_views': settings.SMS_ASYNC_VIEWS,
+                'repeat': options['repeat'],
+                'skew': options['skew'],
+                'seed': options['seed'],
+            },
+            'results': {},
+        }
+        for scale in options['scale'] or ['1k']:
+            report['results'][scale] = self.run_scale(scale, plans, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = list(benchmarks.compare(baseline, report, options['threshold']))
+            for scale, label, message in regressions:
+                self.stdout.write(self.style.ERROR(f"[{scale}] {label}: {message}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def run_scale(self, scale, plans, options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            started = time.perf_counter()
+            sizes = datagen.generate(skew=options['skew'], seed=options['seed'], **datagen.SCALES[scale])
+            self.stdout.write(f"[{scale}] generated {sizes} in {time.perf_counter() - started:.1f}s")
+
+            user = User.objects.create_superuser('bench', 'bench@example.com', 'bench')
+            client = Client(headers=HEADERS)
+            client.force_login(user)
+            anonymous = Client(headers=HEADERS)
+            ctx = benchmarks.Context(user, seed=options['seed'])
+
+            results = {}
+            for label, _, build in plans:
+                # Purge inline so the delete plans time the whole cascade.
+                with override_settings(SMS_SOFT_DELETE=False):
+                    result = benchmarks.measure(client, anonymous, ctx, build, options['repeat'], options['warmup'])
+                results[label] = result
+                self.stdout.write(
+                    f"[{scale}] {label:<26} p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+                    f"p99 {result['p99_ms']:>9.2f}ms  queries {result['queries_min']}-{result['queries_max']}  "
+                    f"status {result['statuses']}"
+                )
+            return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
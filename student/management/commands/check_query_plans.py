@@ -0,0 +1,82 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from student import benchmarks, datagen, queryplan
+
+
+HEADERS = {'host': 'localhost'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs every benchmark plan once against a generated test database, explains each SQL "
+        "statement with EXPLAIN QUERY PLAN and fails on full scans of large tables or temp "
+        "B-trees that are not allow-listed. Also suggests indexes for enrollments, metadata "
+        "and the many-to-many through tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(datagen.SCALES), default='1k')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', action='append', help="Check only plans whose label starts with this.")
+        parser.add_argument('--show-allowed', action='store_true', help="Also list allow-listed findings.")
+        parser.add_argument('--json', action='store_true', help="Print the findings as JSON.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("EXPLAIN QUERY PLAN checks need SQLite.")
+        plans = [
+            plan for plan in benchmarks.PLANS
+            if not options['only'] or any(plan[0].startswith(prefix) for prefix in options['only'])
+        ]
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            datagen.generate(seed=options['seed'], **datagen.SCALES[options['scale']])
+            user = User.objects.create_superuser('planner', 'planner@example.com', 'planner')
+            client = Client(headers=HEADERS)
+            client.force_login(user)
+            ctx = benchmarks.Context(user, seed=options['seed'])
+            # Purge inline so the delete plans explain the whole cascade.
+            with override_settings(SMS_SOFT_DELETE=False):
+                findings = queryplan.check(client, Client(headers=HEADERS), ctx, plans)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        failures = [f for f in findings if not f.allowed]
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'findings': [f.as_dict() for f in findings],
+                'suggestions': queryplan.suggestions(findings),
+            }, indent=2))
+        else:
+            self.report(findings, options['show_allowed'])
+
+        if failures:
+            raise CommandError(f"{len(failures)} statement(s) scan a large table or sort in a temp B-tree.")
+        # Keep stdout parseable in JSON mode.
+        output = self.stderr if options['json'] else self.stdout
+        output.write(self.style.SUCCESS(f"Checked {len(plans)} plans: no unexpected scans."))
+
+    def report(self, findings, show_allowed):
+        for finding in findings:
+            if finding.allowed and not show_allowed:
+                continue
+            style = self.style.WARNING if finding.allowed else self.style.ERROR
+            self.stdout.write(style(f"{finding.label}: {finding.issue} on {finding.table} ({finding.detail})"))
+            self.stdout.write(f"    {finding.sql[:300]}")
+            if finding.allowed:
+                prefix = 'note' if finding.issue == 'PARTIAL INDEX' else 'allowed'
+                self.stdout.write(f"    {prefix}: {finding.allowed}")
+            if finding.suggestion:
+                self.stdout.write(f"    suggestion: {finding.suggestion}")
+
+        suggested = queryplan.suggestions(findings)
+        if suggested:
+            self.stdout.write("\nSuggested indexes:")
+            for sql, labels in suggested.items():
+                self.stdout.write(f"  {sql}  -- {', '.join(labels)}")
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from student import sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired session rows in short batched transactions, "
+        "once or every --every seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=sessions.CLEAR_BATCH_SIZE, help="Rows deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches.")
+        parser.add_argument('--every', type=float, help="Repeat every this many seconds instead of exiting.")
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = sessions.clear_expired(options['batch_size'], options['pause'])
+            self.stdout.write(f"Deleted {deleted} expired session(s).")
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from student import compaction
+from student.models import Metadata
+
+
+def _size(count):
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return f"{count:.0f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Merges duplicate metadata pairs and deletes unreferenced ones in short batches. "
+        "Progress is checkpointed, so an interrupted or time-limited run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help=f"Rows merged or deleted per transaction (at most {compaction.MAX_BATCH_SIZE}).")
+        parser.add_argument('--scan-size', type=int, default=5000, help="Rows examined per batch.")
+        parser.add_argument('--min-age', type=int, default=60,
+                            help="Only delete orphans created at least this many minutes ago.")
+        parser.add_argument('--time-limit', type=float, help="Stop after this many seconds.")
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches.")
+        parser.add_argument('--restart', action='store_true', help="Ignore the saved checkpoint and start over.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count duplicates and orphans.")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.dry_run()
+            return
+
+        def progress(report, position):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"batch {report.batches}: {report.duplicates_merged} merged, "
+                    f"{report.orphans_deleted} orphans deleted, at {position}"
+                )
+
+        report = compaction.compact(
+            batch_size=options['batch_size'],
+            scan_size=options['scan_size'],
+            min_age=timedelta(minutes=options['min_age']),
+            time_limit=options['time_limit'],
+            max_batches=options['max_batches'],
+            pause=options['pause'],
+            restart=options['restart'],
+            progress=progress,
+        )
+
+        self.stdout.write(
+            f"Merged {report.duplicates_merged} duplicate pair(s) "
+            f"({report.links_repointed} link(s) repointed, {report.links_dropped} repeated link(s) dropped) "
+            f"and deleted {report.orphans_deleted} orphan(s) in {report.batches} batch(es)."
+        )
+        self.stdout.write(f"Reclaimed {report.rows_deleted} row(s), about {_size(report.bytes_reclaimed)} of key/value data.")
+        free = compaction.freelist_bytes()
+        if free:
+            self.stdout.write(f"The database has {_size(free)} of free pages; VACUUM returns them to the filesystem.")
+        if report.finished:
+            self.stdout.write(self.style.SUCCESS("Compaction finished."))
+        else:
+            position = compaction.load_checkpoint().position
+            self.stdout.write(self.style.WARNING(f"Stopped at {position}; run again to resume."))
+
+    def dry_run(self):
+        total = Metadata.objects.count()
+        pairs = Metadata.objects.values('key', 'value').distinct().count()
+        orphans = Metadata.objects.all()
+        for through, _, _ in compaction.links():
+            orphans = orphans.filter(~Exists(through.objects.filter(metadata_id=OuterRef('pk'))))
+        self.stdout.write(
+            f"{total} metadata row(s): {total - pairs} duplicate(s) of {pairs} distinct pair(s), "
+            f"{orphans.count()} unreferenced."
+        )
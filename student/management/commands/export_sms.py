@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from student.exporting import EXPORTS, iter_export
+from student.metadata import parse_conditions
+
+
+class Command(BaseCommand):
+    help = "Streams students, courses, instructors or enrollments to CSV or JSONL with metadata flattened into columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', metavar='PATH', help="Write to a file instead of stdout.")
+        parser.add_argument('--q', help="Search filter, as on the list pages.")
+        parser.add_argument('--meta', action='append', default=[], metavar='FILTER',
+                            help="Metadata filter, meta.<key>=<value>; repeat to combine.")
+        parser.add_argument('--student', type=int, help="Only export enrollments of this student.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lines = iter_export(
+            options['kind'], options['format'], query=options['q'],
+            student_pk=options['student'], chunk_size=options['chunk_size'],
+            meta_filters=parse_conditions(options['meta']),
+        )
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as handle:
+                handle.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
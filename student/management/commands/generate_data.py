@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from student import datagen
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with deterministic synthetic students, courses, instructors, "
+        "enrollments and metadata. The same options always produce the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(datagen.SCALES), help="Preset sizes; explicit counts override it.")
+        parser.add_argument('--students', type=int)
+        parser.add_argument('--courses', type=int)
+        parser.add_argument('--instructors', type=int)
+        parser.add_argument('--enrollments', type=int)
+        parser.add_argument('--metadata', type=int, default=50, help="Distinct metadata pairs.")
+        parser.add_argument('--skew', type=float, default=0.0, help="Zipf exponent for course popularity (0 = uniform).")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = dict(datagen.SCALES[options['scale'] or '1k'])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+        if min(sizes.values()) < 1:
+            raise CommandError("All counts must be positive.")
+
+        created = datagen.generate(
+            metadata=options['metadata'], skew=options['skew'], seed=options['seed'],
+            batch_size=options['batch_size'], **sizes,
+        )
+        self.stdout.write(self.style.SUCCESS(", ".join(f"{count} {name}" for name, count in created.items())))
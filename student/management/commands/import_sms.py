@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from student.importing import IMPORTERS, open_error_report, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk imports students, courses, instructors and enrollments from CSV or JSONL files. "
+        "Files are processed in dependency order so enrollments can refer to students and "
+        "courses from the same run."
+    )
+
+    def add_arguments(self, parser):
+        for kind in IMPORTERS:
+            parser.add_argument(f'--{kind}', metavar='PATH', help=f"File of {kind} to import.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file extension).")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows validated and inserted per transaction.")
+        parser.add_argument('--errors', metavar='PATH', default='import_errors.csv', help="Where to write rejected rows.")
+
+    def handle(self, *args, **options):
+        jobs = [(kind, options[kind]) for kind in IMPORTERS if options[kind]]
+        if not jobs:
+            raise CommandError("Give at least one of --students, --courses, --instructors or --enrollments.")
+
+        handle, writer = open_error_report(options['errors'])
+        total_rejected = 0
+        try:
+            for kind, path in jobs:
+                started = time.monotonic()
+                importer = IMPORTERS[kind](batch_size=options['batch_size'], error_writer=writer)
+                created, rejected = importer.run(read_rows(path, options['format']))
+                total_rejected += rejected
+                self.stdout.write(self.style.SUCCESS(
+                    f"{kind}: {created} imported, {rejected} rejected in {time.monotonic() - started:.1f}s."
+                ))
+        finally:
+            handle.close()
+
+        if total_rejected:
+            self.stdout.write(self.style.WARNING(f"Rejected rows were written to {options['errors']}."))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from student import purging
+
+
+class Command(BaseCommand):
+    help = (
+        "Purges soft-deleted courses and students with their enrollments and links, "
+        "in short batched transactions. Run it from cron, or keep it running with --every."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=purging.BATCH_SIZE,
+                            help=f"Enrollments deleted per transaction (at most {purging.MAX_BATCH_SIZE}).")
+        parser.add_argument('--every', type=float, help="Keep running, looking for deleted rows every this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            self.report(purging.purge_pending(options['batch_size']), quiet=options['every'] is not None)
+            if options['every'] is None:
+                return
+            time.sleep(options['every'])
+
+    def report(self, purged, quiet):
+        if not purged:
+            if not quiet:
+                self.stdout.write(self.style.SUCCESS("Nothing waiting to be purged."))
+            return
+        for model, count in purged.items():
+            self.stdout.write(self.style.SUCCESS(f"Purged {count} {model._meta.verbose_name_plural}."))
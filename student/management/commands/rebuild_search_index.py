@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from student import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the FTS5 search index for students, courses and instructors."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', action='append', choices=[search.STUDENT, search.COURSE, search.INSTRUCTOR],
+            help="Only rebuild the given kind (can be repeated).",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stderr.write("The search index requires SQLite with FTS5.")
+            return
+        counts = search.rebuild(options['kind'], batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"Indexed {count} {kind} document(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from student import counters
+
+
+class Command(BaseCommand):
+    help = "Recomputes the dashboard counters from the tables and repairs any drift."
+
+    def handle(self, *args, **options):
+        drift = counters.reconcile()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("All counters are up to date."))
+            return
+        for name, (stored, actual) in drift.items():
+            self.stdout.write(self.style.WARNING(f"{name}: {stored} -> {actual}"))
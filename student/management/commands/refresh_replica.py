@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from student import replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary database into the read replica with SQLite's online backup API, "
+        "every SMS_REPLICA_INTERVAL seconds (or once with --once)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Refresh once and exit.")
+        parser.add_argument('--interval', type=float, help="Seconds between refreshes (default: SMS_REPLICA_INTERVAL).")
+
+    def handle(self, *args, **options):
+        if not replica.is_configured():
+            raise CommandError("No replica configured; set SMS_REPLICA_PATH.")
+        interval = options['interval'] or settings.SMS_REPLICA_INTERVAL
+        while True:
+            elapsed = replica.refresh()
+            self.stdout.write(f"Replica refreshed in {elapsed:.2f}s")
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - elapsed))
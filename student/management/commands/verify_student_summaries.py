@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from student import summaries
+from student.importing import chunked
+from student.models import Student, StudentSummary
+
+
+class Command(BaseCommand):
+    help = "Recomputes student summaries in bulk and reports (or repairs with --repair) any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Overwrite drifted summaries with the recomputed values.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = drifted = 0
+        student_ids = Student.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+        for batch in chunked(student_ids, batch_size):
+            checked += len(batch)
+            wrong = summaries.find_drift(batch)
+            drifted += len(wrong)
+            for summary in wrong[:10]:
+                self.stdout.write(self.style.WARNING(
+                    f"Student {summary.student_id}: expected {summary.enrollment_count} enrollment(s), "
+                    f"{summary.graded_count} graded, mean {summary.mean_score}."
+                ))
+            if wrong and options['repair']:
+                StudentSummary.objects.bulk_create(
+                    wrong, update_conflicts=True, unique_fields=['student'], update_fields=summaries.UPDATE_FIELDS,
+                )
+
+        action = "repaired" if options['repair'] else "found"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} student(s), {action} {drifted} drifted summary(ies)."))
@@ -0,0 +1,182 @@
+from django.db.models import Q
+from django.http import QueryDict
+
+from . import search, stamps
+from .models import Metadata, parse_date, parse_number
+
+
+FILTER_PREFIX = 'meta.'
+RANGE_LOOKUPS = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+def parse_metadata(metadata_str):
+    """
+    Parses a ``key:value, key:value`` string into a list of unique
+    ``(key, value)`` pairs, keeping their order. Entries without a colon are
+    ignored.
+    """
+    pairs = []
+    seen = set()
+    for pair in (metadata_str or '').split(','):
+        pair = pair.strip()
+        if ':' not in pair:
+            continue
+        key, value = pair.split(':', 1)
+        item = (key.strip(), value.strip())
+        if item not in seen:
+            seen.add(item)
+            pairs.append(item)
+    return pairs
+
+
+def resolve_pairs(pairs, cache=None):
+    """
+    Returns a ``{(key, value): metadata_id}`` map for ``pairs``, loading the
+    existing rows in one query and creating the missing ones with a single
+    ``bulk_create``. ``cache`` is an optional map shared across calls, e.g. by
+    a bulk import, to skip pairs already resolved.
+    """
+    resolved = cache if cache is not None else {}
+    wanted = {pair for pair in pairs if pair not in resolved}
+    if not wanted:
+        return resolved
+
+    keys = {key for key, _ in wanted}
+    values = {value for _, value in wanted}
+    for meta_id, key, value in (
+        Metadata.objects.filter(key__in=keys, value__in=values)
+        .order_by('pk').values_list('pk', 'key', 'value')
+    ):
+        if (key, value) in wanted:
+            resolved.setdefault((key, value), meta_id)
+
+    missing = [Metadata(key=key, value=value) for key, value in wanted if (key, value) not in resolved]
+    for meta in missing:
+        meta.fill_typed_values()
+    if missing:
+        for meta in Metadata.objects.bulk_create(missing):
+            resolved[(meta.key, meta.value)] = meta.pk
+        stamps.touch(stamps.METADATA)
+    return resolved
+
+
+def set_metadata(instance, metadata_str):
+    """
+    Makes ``instance.metadata`` match the pairs in ``metadata_str``. Only the
+    difference with the current links is written, so saving an unchanged
+    form touches nothing and the query count does not grow with the number
+    of pairs.
+    """
+    wanted = set(resolve_pairs(parse_metadata(metadata_str)).values())
+    current = set(instance.metadata.values_list('pk', flat=True))
+    to_remove = current - wanted
+    to_add = wanted - current
+    if to_remove:
+        instance.metadata.remove(*to_remove)
+    if to_add:
+        instance.metadata.add(*to_add)
+
+
+def format_metadata(instance):
+    """
+    Renders the metadata of ``instance`` back into ``key:value, key:value``
+    form for the edit pages.
+    """
+    return ', '.join(f"{meta.key}:{meta.value}" for meta in instance.metadata.order_by('key', 'pk'))
+
+
+class MetaFilter:
+    """
+    One ``meta.<key>=<value>`` condition. ``lookup`` is ``exact``,
+    ``prefix`` (a value ending in ``*``) or a range from a ``__gt``,
+    ``__gte``, ``__lt`` or ``__lte`` suffix on the key.
+    """
+
+    def __init__(self, param, key, lookup, value):
+        self.param = param
+        self.key = key
+        self.lookup = lookup
+        self.value = value
+
+    @property
+    def raw_value(self):
+        return f"{self.value}*" if self.lookup == 'prefix' else self.value
+
+    @property
+    def label(self):
+        if self.lookup in RANGE_LOOKUPS:
+            return f"{self.key} {RANGE_LOOKUPS[self.lookup]} {self.value}"
+        return f"{self.key}={self.raw_value}"
+
+    def condition(self):
+        """The Q object selecting the matching ``Metadata`` rows."""
+        if self.lookup == 'exact':
+            return Q(key=self.key, value=self.value)
+        if self.lookup == 'prefix':
+            if not self.value:
+                return Q(key=self.key)
+            low, high = search.prefix_bounds(self.value)
+            return Q(key=self.key, value__gte=low, value__lt=high)
+        number = parse_number(self.value)
+        if number is not None:
+            return Q(key=self.key, **{f"value_number__{self.lookup}": number})
+        date = parse_date(self.value)
+        if date is not None:
+            return Q(key=self.key, **{f"value_date__{self.lookup}": date})
+        return Q(key=self.key, **{f"value__{self.lookup}": self.value})
+
+
+def parse_filters(params):
+    """
+    Reads the ``meta.*`` parameters of a query dict. Repeated parameters,
+    like several keys, are ANDed.
+    """
+    filters = []
+    for param in params:
+        if not param.startswith(FILTER_PREFIX):
+            continue
+        key, lookup = param[len(FILTER_PREFIX):], None
+        base, _, suffix = key.rpartition('__')
+        if base and suffix in RANGE_LOOKUPS:
+            key, lookup = base, suffix
+        if not key:
+            continue
+        for value in params.getlist(param):
+            value = value.strip()
+            if lookup:
+                filters.append(MetaFilter(param, key, lookup, value))
+            elif value.endswith('*'):
+                filters.append(MetaFilter(param, key, 'prefix', value[:-1]))
+            else:
+                filters.append(MetaFilter(param, key, 'exact', value))
+    return filters
+
+
+def parse_conditions(conditions):
+    """
+    Filters from ``meta.<key>=<value>`` strings given on the command line,
+    the syntax of the list pages' ``?meta.`` parameters.
+    """
+    params = QueryDict(mutable=True)
+    for condition in conditions or []:
+        name, _, value = condition.partition('=')
+        if not name.startswith(FILTER_PREFIX):
+            name = FILTER_PREFIX + name
+        params.appendlist(name, value)
+    return parse_filters(params)
+
+
+def filter_queryset(queryset, filters):
+    """
+    Restricts ``queryset`` to rows linked to metadata matching every filter.
+    Each filter is a semi-join, ``pk IN (SELECT owner FROM <through> WHERE
+    metadata_id IN (SELECT id FROM metadata WHERE ...))``, driven from the
+    metadata indexes, so rows never multiply and no DISTINCT is needed.
+    """
+    relation = queryset.model._meta.get_field('metadata')
+    through = relation.remote_field.through
+    owner = f"{relation.m2m_field_name()}_id"
+    for meta_filter in filters:
+        matching = Metadata.objects.filter(meta_filter.condition()).values('pk')
+        queryset = queryset.filter(pk__in=through.objects.filter(metadata_id__in=matching).values(owner))
+    return queryset
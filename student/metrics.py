@@ -0,0 +1,242 @@
+"""
+Per-view request metrics: query count, SQL time, template render time,
+response size and total latency, kept in fixed-bucket in-process histograms
+and exposed in Prometheus text format.
+
+SQL is timed by an execute wrapper on every connection. Template time is
+recorded by :class:`DjangoTemplates`, which the ``TEMPLATES`` setting names
+as its backend; with Django's own backend that metric simply stays at zero.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+
+_current = ContextVar('sms_request_stats', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    'request_duration_seconds': ("Total time spent in the view and middleware.", DURATION_BUCKETS),
+    'request_queries': ("SQL queries issued per request.", QUERY_BUCKETS),
+    'request_sql_seconds': ("Time spent executing SQL per request.", DURATION_BUCKETS),
+    'request_template_seconds': ("Time spent rendering templates per request.", DURATION_BUCKETS),
+    'response_bytes': ("Size of non-streaming response bodies.", SIZE_BUCKETS),
+}
+
+
+class RequestStats:
+    __slots__ = ('queries', 'sql_time', 'template_time', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with a fixed memory footprint.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, view, values):
+        with self.lock:
+            for name, value in values.items():
+                key = (name, view)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(METRICS[name][1])
+                histogram.observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        """
+        Returns every histogram in Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            items = sorted(self.histograms.items())
+            snapshot = [(name, view, list(h.buckets), list(h.counts), h.total) for (name, view), h in items]
+        seen = set()
+        for name, view, buckets, counts, total in snapshot:
+            metric = f"sms_{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# HELP {metric} {METRICS[name][0]}")
+                lines.append(f"# TYPE {metric} histogram")
+            running = 0
+            for bound, count in zip(buckets, counts):
+                running += count
+                lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {running}')
+            running += counts[-1]
+            lines.append(f'{metric}_bucket{{view="{view}",le="+Inf"}} {running}')
+            lines.append(f'{metric}_sum{{view="{view}"}} {total}')
+            lines.append(f'{metric}_count{{view="{view}"}} {running}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def _install_query_wrapper(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class Template(django_backend.Template):
+    """
+    A Django template whose rendering counts toward the request's template
+    time.
+    """
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        # A template rendered while another renders (e.g. by a template tag)
+        # is part of the outer one's time.
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    Django's template backend returning timed templates. Use it as the
+    ``BACKEND`` of a ``TEMPLATES`` entry.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def install():
+    """
+    Hooks SQL execution on every connection. The hook is a no-op outside a
+    request tracked by the middleware; calling this again does nothing.
+    """
+    connection_created.connect(_install_query_wrapper, dispatch_uid='sms_metrics_queries')
+    for connection in connections.all(initialized_only=True):
+        _install_query_wrapper(connection)
+
+
+def uninstall():
+    """Removes the SQL hook from every connection, e.g. in tests."""
+    connection_created.disconnect(dispatch_uid='sms_metrics_queries')
+    for connection in connections.all(initialized_only=True):
+        if _record_query in connection.execute_wrappers:
+            connection.execute_wrappers.remove(_record_query)
+
+
+class MetricsMiddleware:
+    """
+    Records per-URL-name metrics for every request. Works for sync and async
+    views: the stats live in a context variable, which follows the request
+    into the threads the async ORM runs queries on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, stats, started)
+        return response
+
+    def _start(self):
+        stats = RequestStats()
+        return stats, _current.set(stats), time.perf_counter()
+
+    def _finish(self, request, response, stats, started):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        values = {
+            'request_duration_seconds': time.perf_counter() - started,
+            'request_queries': stats.queries,
+            'request_sql_seconds': stats.sql_time,
+            'request_template_seconds': stats.template_time,
+        }
+        if not response.streaming:
+            values['response_bytes'] = len(response.content)
+        registry.observe(view, values)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, restricted to staff users.
+    """
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden("Staff only.")
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
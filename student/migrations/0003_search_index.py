@@ -0,0 +1,55 @@
+from django.db import migrations
+
+
+TABLE = 'student_search_index'
+
+
+def _has_fts5(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_index(apps, schema_editor):
+    # Without FTS5 the search filters fall back to LIKE.
+    if not _has_fts5(schema_editor):
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, title, body, "
+        "tokenize = 'unicode61', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {TABLE} (kind, object_id, title, body) "
+        "SELECT 'student', id, first_name || ' ' || last_name, email FROM student_student"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {TABLE} (kind, object_id, title, body) "
+        "SELECT 'course', id, name || ' ' || course_code, description FROM student_course"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {TABLE} (kind, object_id, title, body) "
+        "SELECT 'instructor', i.id, i.first_name || ' ' || i.last_name, "
+        "i.email || ' ' || COALESCE((SELECT group_concat(c.name, ' ') FROM student_instructor_courses ic "
+        "JOIN student_course c ON c.id = ic.course_id WHERE ic.instructor_id = i.id), '') "
+        "FROM student_instructor i"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0002_alter_course_course_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:09
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def seed_counters(apps, schema_editor):
+    Counter = apps.get_model('student', 'Counter')
+    Enrollment = apps.get_model('student', 'Enrollment')
+    enrollments = Enrollment.objects.aggregate(total=Count('pk'), graded=Count('score'), score_sum=Sum('score'))
+    values = {
+        'students': apps.get_model('student', 'Student').objects.count(),
+        'courses': apps.get_model('student', 'Course').objects.count(),
+        'instructors': apps.get_model('student', 'Instructor').objects.count(),
+        'enrollments': enrollments['total'],
+        'graded_enrollments': enrollments['graded'],
+        'score_sum': int(round((enrollments['score_sum'] or 0) * 100)),
+    }
+    Counter.objects.bulk_create([Counter(name=name, value=value) for name, value in values.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:12
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def seed_summaries(apps, schema_editor):
+    Enrollment = apps.get_model('student', 'Enrollment')
+    StudentSummary = apps.get_model('student', 'StudentSummary')
+    rows = (
+        Enrollment.objects.order_by().values('student_id')
+        .annotate(total=Count('pk'), graded=Count('score'), score_sum=Sum('score'))
+    )
+    StudentSummary.objects.bulk_create([
+        StudentSummary(
+            student_id=row['student_id'],
+            enrollment_count=row['total'],
+            graded_count=row['graded'],
+            score_sum=row['score_sum'] or 0,
+            mean_score=(row['score_sum'] / row['graded']).quantize(Decimal('0.01')) if row['graded'] else None,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0004_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='student.student')),
+                ('enrollment_count', models.PositiveIntegerField(default=0)),
+                ('graded_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('mean_score', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_stamps(apps, schema_editor):
+    TableStamp = apps.get_model('student', 'TableStamp')
+    names = ('student', 'course', 'instructor', 'enrollment', 'metadata')
+    TableStamp.objects.bulk_create([TableStamp(name=name, version=1) for name in names])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0005_studentsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableStamp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(seed_stamps, migrations.RunPython.noop),
+    ]
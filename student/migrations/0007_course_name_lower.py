@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:31
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0006_tablestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='student_course_name_lower'),
+        ),
+    ]
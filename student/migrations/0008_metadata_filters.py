@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:37
+
+import datetime
+import re
+
+from django.db import migrations, models
+
+
+# Copies of student.models.parse_number and parse_date as of this
+# migration, so later changes to the models cannot change what it does.
+NUMBER_RE = re.compile(r'^-?\d+(\.\d+)?$')
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def parse_number(value):
+    value = (value or '').strip()
+    return float(value) if NUMBER_RE.match(value) else None
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    if not DATE_RE.match(value):
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def fill_typed_values(apps, schema_editor):
+    Metadata = apps.get_model('student', 'Metadata')
+    last_pk = 0
+    while True:
+        rows = list(Metadata.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'value')[:5000])
+        if not rows:
+            return
+        last_pk = rows[-1].pk
+        typed = []
+        for meta in rows:
+            meta.value_number = parse_number(meta.value)
+            meta.value_date = parse_date(meta.value)
+            if meta.value_number is not None or meta.value_date is not None:
+                typed.append(meta)
+        Metadata.objects.bulk_update(typed, ['value_number', 'value_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0007_course_name_lower'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metadata',
+            name='value_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='metadata',
+            name='value_number',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='metadata',
+            name='key',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='metadata',
+            index=models.Index(fields=['key', 'value'], name='student_meta_key_value'),
+        ),
+        migrations.AddIndex(
+            model_name='metadata',
+            index=models.Index(condition=models.Q(('value_number__isnull', False)), fields=['key', 'value_number'], name='student_meta_key_number'),
+        ),
+        migrations.AddIndex(
+            model_name='metadata',
+            index=models.Index(condition=models.Q(('value_date__isnull', False)), fields=['key', 'value_date'], name='student_meta_key_date'),
+        ),
+        migrations.RunPython(fill_typed_values, migrations.RunPython.noop),
+    ]
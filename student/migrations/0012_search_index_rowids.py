@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+TABLE = 'student_search_index'
+COLUMNS = "kind UNINDEXED, object_id UNINDEXED, title, body, tokenize = 'unicode61', prefix = '2 3'"
+# rowid = pk * 4 + kind code (student 1, course 2, instructor 3).
+ENCODED = "object_id * 4 + CASE kind WHEN 'student' THEN 1 WHEN 'course' THEN 2 ELSE 3 END"
+
+
+def _has_fts5(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def _copy(schema_editor, rowid):
+    if not _has_fts5(schema_editor):
+        return
+    schema_editor.execute(f"CREATE VIRTUAL TABLE {TABLE}_new USING fts5({COLUMNS})")
+    schema_editor.execute(
+        f"INSERT INTO {TABLE}_new (rowid, kind, object_id, title, body) "
+        f"SELECT {rowid}, kind, object_id, title, body FROM {TABLE}"
+    )
+    schema_editor.execute(f"DROP TABLE {TABLE}")
+    schema_editor.execute(f"ALTER TABLE {TABLE}_new RENAME TO {TABLE}")
+
+
+def encode_rowids(apps, schema_editor):
+    _copy(schema_editor, ENCODED)
+
+
+def plain_rowids(apps, schema_editor):
+    _copy(schema_editor, 'NULL')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0011_archivedenrollment'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_rowids, plain_rowids),
+    ]
@@ -1,19 +1,82 @@
 
+import datetime
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 
 
+class LiveManager(models.Manager):
+    """
+    With ``SMS_SOFT_DELETE``, rows that are not soft-deleted: deleted rows
+    stay hidden behind this manager until ``student.purging`` removes them,
+    while ``all_objects`` still sees them. Without it nothing is ever
+    marked, so no filter is added; run ``purge_deleted`` before turning the
+    setting off, or rows still waiting for it show up again.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if settings.SMS_SOFT_DELETE:
+            queryset = queryset.filter(deleted_at__isnull=True)
+        return queryset
+
+
+def validate_unique_with_deleted(instance, exclude=None):
+    """
+    Checks the instance's unique fields against soft-deleted rows, which
+    keep their values until purged. ``validate_unique`` only sees the rows
+    behind the default manager, which hides them only with ``SMS_SOFT_DELETE``.
+    """
+    if not settings.SMS_SOFT_DELETE:
+        return
+    model = type(instance)
+    errors = {}
+    for field in model._meta.local_fields:
+        if not field.unique or field.primary_key or (exclude and field.name in exclude):
+            continue
+        value = getattr(instance, field.attname)
+        if value is None:
+            continue
+        deleted = model.all_objects.filter(deleted_at__isnull=False, **{field.name: value})
+        if instance.pk is not None:
+            deleted = deleted.exclude(pk=instance.pk)
+        if deleted.exists():
+            errors[field.name] = [instance.unique_error_message(model, (field.name,))]
+    if errors:
+        raise ValidationError(errors)
+
+
 class Student(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     dob = models.DateField()
     metadata = models.ManyToManyField("Metadata", related_name="students", blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["deleted_at"], name="student_student_deleted",
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
+
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+        validate_unique_with_deleted(self, exclude)
     
 
 
@@ -27,6 +90,20 @@ class Course(models.Model):
     course_code = models.CharField(max_length=20, unique=True, validators=[course_code_validator])
     description = models.TextField(blank=True)
     metadata = models.ManyToManyField("Metadata", related_name="courses", blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Lets the course typeahead seek name prefixes case-insensitively.
+            models.Index(Lower("name"), name="student_course_name_lower"),
+            models.Index(
+                fields=["deleted_at"], name="student_course_deleted",
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name}-{self.course_code} "
@@ -34,6 +111,10 @@ class Course(models.Model):
     def clean(self):
         self.course_code = self.course_code.upper()
 
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+        validate_unique_with_deleted(self, exclude)
+
 
 class Instructor(models.Model):
     first_name = models.CharField(max_length=100)
@@ -46,6 +127,25 @@ class Instructor(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
+class LiveEnrollmentManager(models.Manager):
+    """
+    With ``SMS_SOFT_DELETE``, enrollments whose student and course are both
+    live. A soft-deleted student or course hides its enrollments from
+    analytics, gradebooks, summaries and exports until it is purged;
+    ``all_objects`` still sees them. Without it this is a plain manager.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if settings.SMS_SOFT_DELETE:
+            queryset = (
+                queryset
+                .exclude(student__in=Student.all_objects.filter(deleted_at__isnull=False).values('pk'))
+                .exclude(course__in=Course.all_objects.filter(deleted_at__isnull=False).values('pk'))
+            )
+        return queryset
+
+
 class Enrollment(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="enrollments")
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="enrollments")
@@ -56,6 +156,9 @@ class Enrollment(models.Model):
     )
     metadata = models.ManyToManyField("Metadata", related_name="enrollments", blank=True)
 
+    objects = LiveEnrollmentManager()
+    all_objects = models.Manager()
+
     class Meta:
         unique_together = ("student", "course")
         indexes = [
@@ -65,12 +168,148 @@ class Enrollment(models.Model):
     def __str__(self):
         return f"{self.student} in {self.course}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored student and score, so saving an edit can adjust the
+        # counters and summaries without reading the row again.
+        loaded = dict(zip(field_names, values))
+        if 'student_id' in loaded and 'score' in loaded:
+            instance._stored = {'student_id': loaded['student_id'], 'score': loaded['score']}
+        return instance
+
+
+class ArchivedEnrollment(models.Model):
+    """
+    An enrollment from a closed term, moved by ``archive_enrollments`` into
+    the archive database (``SMS_ARCHIVE_PATH``, attached as ``archive``).
+    It keeps its original id; its metadata is kept as ``key:value`` text.
+    """
+    student = models.ForeignKey(
+        Student, on_delete=models.DO_NOTHING, db_constraint=False, related_name="archived_enrollments",
+    )
+    course = models.ForeignKey(
+        Course, on_delete=models.DO_NOTHING, db_constraint=False, related_name="archived_enrollments",
+    )
+    score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    metadata = models.TextField(blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        managed = False
+        # The table lives in the attached database; see student/archiving.py.
+        db_table = '"archive"."student_archivedenrollment"'
+
+    def __str__(self):
+        return f"{self.student_id} in {self.course_id} (archived)"
+
+
+
+_number_re = re.compile(r'^-?\d+(\.\d+)?$')
+_date_re = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def parse_number(value):
+    """The number ``value`` spells, e.g. ``"3.5"``, or None."""
+    value = (value or '').strip()
+    return float(value) if _number_re.match(value) else None
+
+
+def parse_date(value):
+    """The ISO date ``value`` spells, e.g. ``"2025-09-01"``, or None."""
+    value = (value or '').strip()
+    if not _date_re.match(value):
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+
 
 class Metadata(models.Model):
-    key = models.CharField(max_length=100, db_index=True)
+    key = models.CharField(max_length=100)
     value = models.TextField()
+    # Typed copies of ``value`` so metadata range filters can use an index.
+    value_number = models.FloatField(null=True, blank=True, editable=False)
+    value_date = models.DateField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["key", "value"], name="student_meta_key_value"),
+            models.Index(
+                fields=["key", "value_number"], name="student_meta_key_number",
+                condition=models.Q(value_number__isnull=False),
+            ),
+            models.Index(
+                fields=["key", "value_date"], name="student_meta_key_date",
+                condition=models.Q(value_date__isnull=False),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.key}={self.value}"
+
+    def fill_typed_values(self):
+        self.value_number = parse_number(self.value)
+        self.value_date = parse_date(self.value)
+
+    def save(self, *args, **kwargs):
+        self.fill_typed_values()
+        super().save(*args, **kwargs)
+
+
+class Counter(models.Model):
+    """
+    Precomputed totals shown on the dashboard, kept up to date by signals
+    and repaired with the ``reconcile_counters`` command.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class StudentSummary(models.Model):
+    """
+    Per-student enrollment totals, updated incrementally when enrollments
+    change and checked with the ``verify_student_summaries`` command.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    enrollment_count = models.PositiveIntegerField(default=0)
+    graded_count = models.PositiveIntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    mean_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary of {self.student_id}"
+
+
+class TableStamp(models.Model):
+    """
+    Change stamp per table, bumped on every write and used to answer
+    conditional GETs on the list pages without reading the tables.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name}@{self.version}"
+
+
+class JobCheckpoint(models.Model):
+    """
+    Where a batched maintenance job stopped, so an interrupted or
+    time-limited run resumes from there instead of starting over.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    position = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.http import QueryDict
+
+
+DEFAULT_PAGE_SIZE = getattr(settings, 'SMS_PAGE_SIZE', 25)
+PAGE_SIZE_CHOICES = getattr(settings, 'SMS_PAGE_SIZE_CHOICES', (10, 25, 50, 100))
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CursorPage:
+    """
+    One page of a keyset-paginated queryset, with the cursors needed to build
+    the next/previous links.
+    """
+
+    def __init__(self, object_list, page_size, next_cursor=None, prev_cursor=None, params=None):
+        self.object_list = object_list
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.params = params if params is not None else QueryDict()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def _query_string(self, **cursor):
+        params = self.params.copy()
+        for key in ('after', 'before'):
+            params.pop(key, None)
+        params.update(cursor)
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        if self.next_cursor is None:
+            return ''
+        return self._query_string(after=self.next_cursor)
+
+    @property
+    def previous_query(self):
+        if self.prev_cursor is None:
+            return ''
+        return self._query_string(before=self.prev_cursor)
+
+
+def get_page_size(request):
+    """
+    Returns the requested page size if it is one of the allowed choices.
+    """
+    size = _parse_int(request.GET.get('page_size'))
+    if size in PAGE_SIZE_CHOICES:
+        return size
+    return DEFAULT_PAGE_SIZE
+
+
+def _cursor_query(request, queryset, page_size):
+    """
+    Returns the sliced queryset for the requested page, fetching one extra
+    row to know whether another page follows, plus the parsed cursors.
+    """
+    after = _parse_int(request.GET.get('after'))
+    before = _parse_int(request.GET.get('before'))
+    if before is not None:
+        return queryset.filter(pk__lt=before).order_by('-pk')[:page_size + 1], after, before
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    return queryset.order_by('pk')[:page_size + 1], after, before
+
+
+def _earlier_rows(queryset, rows, after):
+    """
+    The query that tells whether a forward page has rows before its first
+    one. An ``after`` cursor alone does not prove it: the rows it skipped
+    may have been deleted since. None when there is nothing to check.
+    """
+    if after is None or not rows:
+        return None
+    return queryset.filter(pk__lt=rows[0].pk)
+
+
+def _build_page(request, rows, page_size, before, has_earlier):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before is not None:
+        rows.reverse()
+        next_cursor = rows[-1].pk if rows else None
+        prev_cursor = rows[0].pk if rows and has_more else None
+    else:
+        next_cursor = rows[-1].pk if rows and has_more else None
+        prev_cursor = rows[0].pk if has_earlier else None
+    return CursorPage(rows, page_size, next_cursor, prev_cursor, request.GET)
+
+
+def paginate_by_cursor(request, queryset, page_size=None):
+    """
+    Slices ``queryset`` on its primary key using the ``after``/``before``
+    cursors from the query string instead of OFFSET, so every page costs the
+    same no matter how deep it is. All other GET parameters (``q``,
+    ``page_size``...) are kept in the generated links.
+    """
+    page_size = page_size or get_page_size(request)
+    sliced, after, before = _cursor_query(request, queryset, page_size)
+    rows = list(sliced)
+    earlier = _earlier_rows(queryset, rows, after)
+    return _build_page(request, rows, page_size, before, earlier is not None and earlier.exists())
+
+
+async def apaginate_by_cursor(request, queryset, page_size=None):
+    """
+    Async counterpart of :func:`paginate_by_cursor` for async views.
+    """
+    page_size = page_size or get_page_size(request)
+    sliced, after, before = _cursor_query(request, queryset, page_size)
+    rows = [obj async for obj in sliced]
+    earlier = _earlier_rows(queryset, rows, after)
+    return _build_page(request, rows, page_size, before, earlier is not None and await earlier.aexists())
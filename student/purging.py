@@ -0,0 +1,208 @@
+"""
+Set-based, batched deletes of courses and students.
+
+``Model.delete()`` loads every enrollment and metadata link of the row into
+Python and deletes them in one long write transaction. Here the cascade is
+removed a batch of enrollments at a time with a few DELETE statements, each
+batch in its own short transaction, so other writers get the lock between
+batches. Counters, summaries, stamps, the search index and the catalog
+version are updated per batch, since raw deletes send no signals.
+
+With ``SMS_SOFT_DELETE`` (off by default) the view only marks the row
+(``deleted_at``), which hides it and its enrollments behind the models'
+default managers at once. ``manage.py purge_deleted`` removes marked rows
+later, from cron or in a loop with ``--every``.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from . import catalog, counters, search, stamps, summaries
+from .models import ArchivedEnrollment, Course, Enrollment, Instructor, Student, StudentSummary
+
+
+BATCH_SIZE = 500
+# One query parameter per id; stay under SQLite's 999.
+MAX_BATCH_SIZE = 900
+
+
+def raw_delete(queryset):
+    """
+    Deletes the rows of ``queryset`` with one DELETE statement. Unlike
+    ``QuerySet.delete()`` this neither loads the rows nor sends per-row
+    signals; callers apply their effects once per batch instead.
+    """
+    model = queryset.model
+    sql, params = queryset.values('pk').query.sql_with_params()
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({sql})", params)
+        return cursor.rowcount
+
+
+def _delete_enrollment_batch(enrollments, batch_size, skip_summary=None):
+    """
+    Deletes up to ``batch_size`` of ``enrollments`` and their metadata links
+    and applies what the skipped ``post_delete`` handlers would have. Returns
+    the number deleted.
+    """
+    rows = list(
+        enrollments.order_by()
+        .values_list('pk', 'student_id', 'score', 'student__deleted_at', 'course__deleted_at')[:batch_size]
+    )
+    if not rows:
+        return 0
+    ids = [row[0] for row in rows]
+    raw_delete(Enrollment.metadata.through.objects.filter(enrollment_id__in=ids))
+    deleted = raw_delete(Enrollment.all_objects.filter(pk__in=ids))
+    # Enrollments of a soft-deleted owner left the counters when it was hidden.
+    live = [
+        score for _, _, score, student_deleted, course_deleted in rows
+        if student_deleted is None and course_deleted is None
+    ]
+    deltas = {counters.ENROLLMENTS: -len(live)}
+    for score in live:
+        for name, delta in counters.enrollment_deltas(score, -1).items():
+            deltas[name] = deltas.get(name, 0) + delta
+    counters.bump(deltas)
+    summaries.refresh({row[1] for row in rows if row[1] != skip_summary})
+    stamps.touch(stamps.ENROLLMENT)
+    return deleted
+
+
+def _drain(enrollments, batch_size, skip_summary=None):
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            count = _delete_enrollment_batch(enrollments, batch_size, skip_summary)
+        if not count:
+            return deleted
+        deleted += count
+
+
+def _drain_archived(column, pk, batch_size):
+    """Deletes the row's enrollments from the archive database, if any."""
+    archived = ArchivedEnrollment.objects.filter(**{column: pk})
+    while True:
+        with transaction.atomic():
+            if not raw_delete(ArchivedEnrollment.objects.filter(pk__in=archived.values('pk')[:batch_size])):
+                return
+
+
+def _remove_course(pk, hidden):
+    links = Instructor.courses.through.objects.filter(course_id=pk)
+    instructor_ids = list(links.values_list('instructor_id', flat=True))
+    raw_delete(links)
+    raw_delete(Course.metadata.through.objects.filter(course_id=pk))
+    raw_delete(Course.all_objects.filter(pk=pk))
+    if not hidden:
+        counters.bump({counters.COURSES: -1})
+        search.remove_object(search.COURSE, pk)
+    # Instructor documents embed their course names.
+    search.index_many(Instructor.objects.filter(pk__in=instructor_ids).prefetch_related('courses'))
+    stamps.touch(stamps.COURSE, *([stamps.INSTRUCTOR] if instructor_ids else []))
+    catalog.bump_on_commit()
+
+
+def _remove_student(pk, hidden):
+    raw_delete(StudentSummary.objects.filter(student_id=pk))
+    raw_delete(Student.metadata.through.objects.filter(student_id=pk))
+    raw_delete(Student.all_objects.filter(pk=pk))
+    if not hidden:
+        counters.bump({counters.STUDENTS: -1})
+        search.remove_object(search.STUDENT, pk)
+    stamps.touch(stamps.STUDENT)
+
+
+PURGES = {
+    Course: ('course_id', _remove_course),
+    Student: ('student_id', _remove_student),
+}
+
+
+def purge(model, pk, batch_size=BATCH_SIZE):
+    """
+    Deletes a course or student with its enrollments and links. Returns the
+    number of enrollments deleted, or None if the row no longer exists.
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    column, remove = PURGES[model]
+    enrollments = Enrollment.all_objects.filter(**{column: pk})
+    skip_summary = pk if model is Student else None
+    deleted = 0
+    while True:
+        deleted += _drain(enrollments, batch_size, skip_summary)
+        if settings.SMS_ARCHIVE_PATH:
+            _drain_archived(column, pk, batch_size)
+        with transaction.atomic():
+            row = model.all_objects.filter(pk=pk).values('deleted_at').first()
+            if row is None:
+                return None
+            # An enrollment added since the last batch goes in another round.
+            if enrollments.exists():
+                continue
+            remove(pk, hidden=row['deleted_at'] is not None)
+            return deleted
+
+
+def soft_delete(instance):
+    """
+    Hides a course or student at once: it and its enrollments leave the
+    default managers, the dashboard counters, the student summaries and the
+    search index. ``purge_pending`` removes the rows later.
+    """
+    model = type(instance)
+    column = PURGES[model][0]
+    with transaction.atomic():
+        enrollments = Enrollment.objects.filter(**{column: instance.pk})
+        hiding = enrollments.order_by().aggregate(total=Count('pk'), graded=Count('score'), score_sum=Sum('score'))
+        student_ids = list(enrollments.values_list('student_id', flat=True)) if model is Course else []
+        hidden = model.all_objects.filter(pk=instance.pk, deleted_at__isnull=True).update(deleted_at=timezone.now())
+        if not hidden:
+            return
+        counters.bump({
+            counters.MODEL_COUNTERS[model]: -1,
+            counters.ENROLLMENTS: -hiding['total'],
+            counters.GRADED_ENROLLMENTS: -hiding['graded'],
+            counters.SCORE_SUM: -counters.score_units(hiding['score_sum']),
+        })
+        search.remove_object(search.kind_for(model), instance.pk)
+        names = [stamps.MODEL_STAMPS[model], stamps.ENROLLMENT]
+        if model is Course:
+            for start in range(0, len(student_ids), MAX_BATCH_SIZE):
+                summaries.refresh(student_ids[start:start + MAX_BATCH_SIZE])
+            instructors = Instructor.objects.filter(courses=instance.pk).prefetch_related('courses')
+            search.index_many(instructors)
+            names.append(stamps.INSTRUCTOR)
+            catalog.bump_on_commit()
+        stamps.touch(*names)
+
+
+def delete(instance):
+    """
+    Deletes a course or student the way ``SMS_SOFT_DELETE`` asks: hidden now
+    and purged later by ``manage.py purge_deleted``, or purged in batches
+    before returning.
+    """
+    if settings.SMS_SOFT_DELETE:
+        soft_delete(instance)
+    else:
+        purge(type(instance), instance.pk, settings.SMS_PURGE_BATCH_SIZE)
+
+
+def pending():
+    """``(model, pk)`` for every soft-deleted row still waiting to be purged."""
+    for model in PURGES:
+        for pk in model.all_objects.filter(deleted_at__isnull=False).order_by('deleted_at').values_list('pk', flat=True):
+            yield model, pk
+
+
+def purge_pending(batch_size=BATCH_SIZE):
+    """Purges every soft-deleted row and returns ``{model: rows purged}``."""
+    purged = {}
+    for model, pk in list(pending()):
+        if purge(model, pk, batch_size) is not None:
+            purged[model] = purged.get(model, 0) + 1
+    return purged
@@ -0,0 +1,357 @@
+"""
+Query-plan guard: captures every statement a view issues, runs SQLite's
+``EXPLAIN QUERY PLAN`` on it and reports full scans of large tables, temp
+B-trees that are not allow-listed, and index suggestions.
+"""
+import re
+from fnmatch import fnmatch
+
+from django.apps import apps
+from django.db import connection
+
+from . import search
+
+
+def large_tables():
+    """
+    Tables that grow with the data set. Counter is a fixed handful of rows.
+    """
+    tables = {'auth_user', 'django_session', search.TABLE}
+    for model in apps.get_app_config('student').get_models(include_auto_created=True):
+        if model._meta.model_name != 'counter':
+            tables.add(model._meta.db_table)
+    return tables
+
+
+def advised_tables():
+    """
+    Tables the index advisor looks at: enrollments, metadata and every
+    many-to-many through table.
+    """
+    tables = {'student_enrollment', 'student_metadata'}
+    for model in apps.get_app_config('student').get_models(include_auto_created=True):
+        if model._meta.auto_created:
+            tables.add(model._meta.db_table)
+    return tables
+
+
+# (plan label pattern, table, issue) -> why it is acceptable. ``issue`` is
+# 'SCAN' or the temp B-tree purpose ('ORDER BY', 'GROUP BY', 'DISTINCT').
+ALLOWED = {
+    ('course_analytics*', 'student_enrollment', 'SCAN'): "Analytics aggregate every enrollment by design.",
+    ('course_analytics*', 'student_course', 'SCAN'): "The report lists the whole catalog.",
+    ('export_data:*', '*', 'SCAN'): "Exports stream whole tables in chunks.",
+    ('export_data:*', 'student_metadata', 'DISTINCT'): "Distinct metadata keys for the export header.",
+    ('*', 'student_metadata', 'ORDER BY'): "Sorts the few pairs attached to one object.",
+}
+
+SKIPPED_PREFIXES = ('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT', 'PRAGMA')
+
+_ALIAS = re.compile(r'"(\w+)"\s+(?:AS\s+)?([A-Z]\d+)\b')
+_COLUMN = re.compile(r'(?:"(\w+)"|\b([A-Z]\d+))\."(\w+)"\s*(=|IN\b|>=|<=|>|<|LIKE\b)', re.IGNORECASE)
+_ORDER_BY = re.compile(r'ORDER BY (.+?)(?: LIMIT | OFFSET |\)|$)', re.IGNORECASE)
+_ORDER_COLUMN = re.compile(r'(?:"(\w+)"|\b([A-Z]\d+))\."(\w+)"')
+_SUBQUERY = re.compile(r'\(\s*SELECT\b', re.IGNORECASE)
+_INDEX_USE = re.compile(r'USING (?:COVERING )?INDEX (\w+) \(([^)]*)\)')
+_SEEK = re.compile(r'\s*(\w+)\s*(=|>=|<=|>|<)')
+_SCAN = re.compile(r'^SCAN (\w+)(.*)$')
+_SEARCH = re.compile(r'^SEARCH (\w+)(.*)$')
+
+
+class Statement:
+    __slots__ = ('sql', 'params')
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+
+
+class Finding:
+    """
+    One problem in one statement: ``issue`` is 'SCAN', a temp B-tree purpose,
+    or 'PARTIAL INDEX' for advisor-only notes.
+    """
+    __slots__ = ('label', 'table', 'issue', 'detail', 'sql', 'allowed', 'suggestion')
+
+    def __init__(self, label, table, issue, detail, sql, allowed=None, suggestion=None):
+        self.label = label
+        self.table = table
+        self.issue = issue
+        self.detail = detail
+        self.sql = sql
+        self.allowed = allowed
+        self.suggestion = suggestion
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def capture(client, anonymous_client, ctx, build):
+    """
+    Issues one request built by ``build`` and returns the statements it ran.
+    """
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(SKIPPED_PREFIXES):
+            statements.append(Statement(sql, params[0] if many and params else params))
+        return execute(sql, params, many, context)
+
+    call = build(ctx)
+    target = anonymous_client if call.anonymous else client
+    connection.execute_wrappers.append(record)
+    try:
+        response = getattr(target, call.method)(call.path, call.data)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    finally:
+        connection.execute_wrappers.remove(record)
+    return statements
+
+
+def explain(statement):
+    """
+    Returns the ``detail`` column of ``EXPLAIN QUERY PLAN`` for a statement.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement.sql, statement.params)
+        return [row[3] for row in cursor.fetchall()]
+
+
+def scopes(sql):
+    """
+    The text of each SELECT in ``sql``, outermost first, with its nested
+    subqueries cut out. Django reuses aliases such as ``U0`` in sibling
+    subqueries, so an alias only means something within its own scope.
+    """
+    found, stack, opened = [], [(0, [])], []
+    position = 0
+    while position < len(sql):
+        char = sql[position]
+        if char == '(' and _SUBQUERY.match(sql, position):
+            stack.append((position, []))
+            opened.append(True)
+        elif char == '(':
+            stack[-1][1].append(char)
+            opened.append(False)
+        elif char == ')' and opened and opened.pop():
+            start, text = stack.pop()
+            found.append((start, ''.join(text)))
+        else:
+            stack[-1][1].append(char)
+        position += 1
+    while stack:
+        start, text = stack.pop()
+        found.append((start, ''.join(text)))
+    return [text for _, text in sorted(found)]
+
+
+def _aliases(scope):
+    return {alias: table for table, alias in _ALIAS.findall(scope)}
+
+
+def index_table(index, cache):
+    """The table an index belongs to, or None."""
+    key = ('index', index)
+    if key not in cache:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tbl_name FROM sqlite_master WHERE type = 'index' AND name = %s", [index])
+            row = cursor.fetchone()
+        cache[key] = row[0] if row else None
+    return cache[key]
+
+
+class PlanNames:
+    """
+    Resolves the table names and aliases in ``EXPLAIN QUERY PLAN`` lines.
+    An alias defined in several scopes is told apart by the index the line
+    uses, else by order: the plan lists subqueries in the order they appear.
+    """
+
+    def __init__(self, sql, cache):
+        self.scoped = [_aliases(scope) for scope in scopes(sql)]
+        self.cache = cache
+        self.seen = {}
+
+    def table(self, name, rest):
+        candidates = [aliases[name] for aliases in self.scoped if name in aliases]
+        if not candidates:
+            return name
+        occurrence = self.seen.get(name, 0)
+        self.seen[name] = occurrence + 1
+        used = _INDEX_USE.search(rest)
+        if used and index_table(used.group(1), self.cache) in candidates:
+            return index_table(used.group(1), self.cache)
+        return candidates[min(occurrence, len(candidates) - 1)]
+
+
+def filtered_columns(sql, params, table):
+    """
+    Columns of ``table`` compared in ``sql``, in order of appearance, and
+    whether any of them is a LIKE with a leading wildcard.
+    """
+    columns, leading_wildcard = [], False
+    wildcards = [p for p in (params or ()) if isinstance(p, str) and p.startswith('%')]
+    for scope in scopes(sql):
+        aliases = _aliases(scope)
+        for quoted, alias, column, operator in _COLUMN.findall(scope):
+            if (quoted or aliases.get(alias)) != table:
+                continue
+            if operator.upper() == 'LIKE' and wildcards:
+                leading_wildcard = True
+                continue
+            if column not in columns:
+                columns.append(column)
+    return columns, leading_wildcard
+
+
+def ordered_columns(sql, table):
+    columns = []
+    for scope in scopes(sql):
+        aliases = _aliases(scope)
+        match = _ORDER_BY.search(scope)
+        if match:
+            columns.extend(
+                column for quoted, alias, column in _ORDER_COLUMN.findall(match.group(1))
+                if (quoted or aliases.get(alias)) == table and column not in columns
+            )
+    return columns
+
+
+def existing_indexes(table, cache):
+    """
+    Column lists of every index on ``table``, including the rowid.
+    """
+    if table not in cache:
+        indexes = [('id',)]
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA index_list("{table}")')
+            names = [row[1] for row in cursor.fetchall()]
+            for name in names:
+                cursor.execute(f'PRAGMA index_info("{name}")')
+                indexes.append(tuple(row[2] for row in cursor.fetchall()))
+        cache[table] = indexes
+    return cache[table]
+
+
+def suggest_index(table, columns, cache):
+    """
+    A ``CREATE INDEX`` for ``columns`` unless an existing index already
+    starts with them. Returns None when nothing would help.
+    """
+    # Every SQLite index already ends in the rowid.
+    wanted = tuple(dict.fromkeys(column for column in columns if column != 'id'))
+    if not wanted:
+        return None
+    for index in existing_indexes(table, cache):
+        if index[:len(wanted)] == wanted:
+            return None
+    name = f"{table}_{'_'.join(wanted)}_idx"
+    return f'CREATE INDEX "{name}" ON "{table}" ({", ".join(wanted)});'
+
+
+def _main_table(sql):
+    match = re.search(r'\b(?:FROM|UPDATE|INTO)\s+"?(\w+)"?', sql, re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def _is_allowed(label, table, issue):
+    for (pattern, allowed_table, allowed_issue), reason in ALLOWED.items():
+        if allowed_issue == issue and fnmatch(label, pattern) and allowed_table in ('*', table):
+            return reason
+    return None
+
+
+def analyze(label, statement, large, advised, cache):
+    """
+    Returns the findings for one statement.
+    """
+    findings = []
+    plan = explain(statement)
+    sql = statement.sql
+    names = PlanNames(sql, cache)
+    bounded = re.search(r'\bLIMIT\b', sql, re.IGNORECASE) and not any('TEMP B-TREE' in line for line in plan)
+
+    for line in plan:
+        scan = _SCAN.match(line)
+        if scan:
+            name, rest = scan.groups()
+            table = names.table(name, rest)
+            if table not in large:
+                continue
+            # FTS5 answers MATCH through its own index ("INDEX 0:M...") and
+            # seeks rowid equality ("INDEX 0:=").
+            if 'VIRTUAL TABLE' in rest and (':M' in rest or ':=' in rest):
+                continue
+            # A rowid-ordered scan under LIMIT stops after one page.
+            if bounded and 'VIRTUAL TABLE' not in rest and not filtered_columns(sql, statement.params, table)[0]:
+                continue
+            columns, wildcard = filtered_columns(sql, statement.params, table)
+            suggestion = None
+            if wildcard:
+                suggestion = "Leading-wildcard LIKE cannot use a B-tree index; query the search index instead."
+            elif table in advised:
+                suggestion = suggest_index(table, columns or ordered_columns(sql, table), cache)
+            findings.append(Finding(label, table, 'SCAN', line, sql, _is_allowed(label, table, 'SCAN'), suggestion))
+            continue
+
+        if line.startswith('USE TEMP B-TREE FOR '):
+            purpose = line[len('USE TEMP B-TREE FOR '):]
+            purpose = 'ORDER BY' if purpose.endswith('ORDER BY') else purpose
+            table = _main_table(sql)
+            suggestion = None
+            if purpose == 'ORDER BY' and table in advised:
+                filtered = filtered_columns(sql, statement.params, table)[0]
+                suggestion = suggest_index(table, filtered + ordered_columns(sql, table), cache)
+            findings.append(Finding(label, table, purpose, line, sql, _is_allowed(label, table, purpose), suggestion))
+            continue
+
+        search_match = _SEARCH.match(line)
+        if search_match:
+            name, rest = search_match.groups()
+            table = names.table(name, rest)
+            used = _INDEX_USE.search(rest)
+            if table not in advised or not used:
+                continue
+            seeks = [match.groups() for match in map(_SEEK.match, used.group(2).split(' AND ')) if match]
+            # The rowid is the primary key: an equality seek reads one row.
+            if ('rowid', '=') in seeks:
+                continue
+            used_columns = [column for column, _ in seeks if column != 'rowid']
+            columns = filtered_columns(sql, statement.params, table)[0]
+            extra = [column for column in columns if column not in used_columns and column != 'id']
+            if extra:
+                suggestion = suggest_index(table, used_columns + extra, cache)
+                if suggestion:
+                    findings.append(Finding(
+                        label, table, 'PARTIAL INDEX', line, sql,
+                        "Advisory: the index narrows the search, the rest is filtered row by row.", suggestion,
+                    ))
+    return findings
+
+
+def check(client, anonymous_client, ctx, plans):
+    """
+    Runs every plan once and returns all findings, allowed ones included.
+    """
+    large, advised, cache = large_tables(), advised_tables(), {}
+    findings = []
+    for label, _, build in plans:
+        seen = set()
+        for statement in capture(client, anonymous_client, ctx, build):
+            if statement.sql in seen:
+                continue
+            seen.add(statement.sql)
+            findings.extend(analyze(label, statement, large, advised, cache))
+    return findings
+
+
+def suggestions(findings):
+    """
+    Distinct index suggestions with the plans that would benefit.
+    """
+    result = {}
+    for finding in findings:
+        if finding.suggestion and finding.suggestion.startswith('CREATE INDEX'):
+            result.setdefault(finding.suggestion, set()).add(finding.label)
+    return {sql: sorted(labels) for sql, labels in sorted(result.items())}
@@ -0,0 +1,212 @@
+"""
+Read-replica routing. Read-only views (``settings.SMS_REPLICA_VIEWS``) read
+the student tables from the ``replica`` alias, a local SQLite copy of the
+primary refreshed with the online backup API by ``manage.py refresh_replica``.
+
+A request that writes sets a short-lived cookie that keeps the browser on
+the primary, so users always see their own changes. A replica that is
+missing or older than ``SMS_REPLICA_MAX_LAG`` seconds is skipped. The body
+of a streaming response (``export_data``) is read with the request's
+routing too.
+
+Rows read from the replica live only as long as the response built from
+them. Anything kept beyond the request (the course catalog cache, cached
+auth users) is loaded from the primary, with ``.using('default')`` or
+inside :func:`primary`, since a replica row cached under a current version
+would outlive the refresh that corrects it.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+REPLICA = 'replica'
+STICKY_COOKIE = 'sms_primary_until'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = ContextVar('sms_routing_state', default=None)
+
+
+class RoutingState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+
+@contextmanager
+def primary():
+    """
+    Reads the primary inside the block even in a replica-routed request,
+    e.g. while loading something that is about to be cached.
+    """
+    state = _state.get()
+    if state is None or not state.replica:
+        yield
+        return
+    state.replica = False
+    try:
+        yield
+    finally:
+        state.replica = True
+
+
+def is_configured():
+    return REPLICA in settings.DATABASES
+
+
+def replica_age():
+    """
+    Seconds since the last refresh, or None when there is no replica yet.
+    """
+    if not is_configured():
+        return None
+    try:
+        return time.time() - os.stat(settings.DATABASES[REPLICA]['NAME']).st_mtime
+    except OSError:
+        return None
+
+
+def is_fresh():
+    age = replica_age()
+    return age is not None and age <= settings.SMS_REPLICA_MAX_LAG
+
+
+def refresh(source_alias='default', replica_alias=REPLICA):
+    """
+    Copies the primary into the replica file in one consistent step. In WAL
+    mode this holds only a read lock on the primary, so writers carry on.
+    """
+    source = connections[source_alias]
+    source.ensure_connection()
+    path = settings.DATABASES[replica_alias]['NAME']
+    started = time.perf_counter()
+    destination = sqlite3.connect(path)
+    try:
+        source.connection.backup(destination)
+    finally:
+        destination.close()
+    # Stamp the file: with WAL the main file's mtime can lag the contents.
+    os.utime(path)
+    return time.perf_counter() - started
+
+
+class ReplicaRouter:
+    """
+    Sends student-app reads to the replica while a request marked by
+    ReplicaMiddleware is running; auth and sessions always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.replica and model._meta.app_label == 'student':
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a byte-for-byte copy; never migrate it directly.
+        return False if db == REPLICA else None
+
+
+def _stream(content, state):
+    """
+    Yields ``content`` with ``state`` set while each chunk is produced, since
+    the server iterates a streaming body after the middleware has returned.
+    """
+    content = iter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = next(content)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+async def _astream(content, state):
+    content = aiter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = await anext(content)
+        except StopAsyncIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(request, response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if (
+            state is not None
+            and request.method in SAFE_METHODS
+            and request.resolver_match.url_name in settings.SMS_REPLICA_VIEWS
+            and not self._pinned(request)
+            and is_fresh()
+        ):
+            state.replica = True
+
+    def _pinned(self, request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _finish(self, request, response, state):
+        if state.replica and response.streaming:
+            if response.is_async:
+                response.streaming_content = _astream(response.streaming_content, state)
+            else:
+                response.streaming_content = _stream(response.streaming_content, state)
+        if state.wrote and is_configured():
+            sticky = settings.SMS_REPLICA_MAX_LAG
+            response.set_cookie(STICKY_COOKIE, str(time.time() + sticky), max_age=sticky, httponly=True, samesite='Lax')
+        return response
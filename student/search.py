@@ -0,0 +1,225 @@
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Course, Instructor, Student
+
+
+TABLE = 'student_search_index'
+
+STUDENT = 'student'
+COURSE = 'course'
+INSTRUCTOR = 'instructor'
+
+# LIKE based filters used when the database has no FTS5 support.
+FALLBACK_FIELDS = {
+    STUDENT: ('first_name', 'last_name', 'email'),
+    COURSE: ('name', 'course_code', 'description'),
+    INSTRUCTOR: ('first_name', 'last_name', 'email', 'courses__name'),
+}
+
+# A document's rowid encodes its kind and primary key, so replacing or
+# removing one seeks the rowid instead of scanning the UNINDEXED columns.
+KIND_CODES = {STUDENT: 1, COURSE: 2, INSTRUCTOR: 3}
+KIND_SLOTS = 4
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "kind UNINDEXED, object_id UNINDEXED, title, body, "
+    "tokenize = 'unicode61', prefix = '2 3')"
+)
+DROP_SQL = f"DROP TABLE IF EXISTS {TABLE}"
+INSERT_SQL = f"INSERT INTO {TABLE} (rowid, kind, object_id, title, body) VALUES (%s, %s, %s, %s, %s)"
+DELETE_SQL = f"DELETE FROM {TABLE} WHERE rowid = %s"
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+_fts5 = {}
+
+
+def is_available(using=None):
+    """
+    Whether the database is SQLite built with FTS5; without it the filters
+    fall back to LIKE. Checked once per database alias.
+    """
+    using = using or connection
+    if using.vendor != 'sqlite':
+        return False
+    if using.alias not in _fts5:
+        with using.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            _fts5[using.alias] = bool(cursor.fetchone()[0])
+    return _fts5[using.alias]
+
+
+async def ais_available():
+    """
+    :func:`is_available` for async code. The first check in a process runs a
+    query, so it goes through a thread.
+    """
+    if DEFAULT_DB_ALIAS not in _fts5:
+        await sync_to_async(is_available)()
+    return _fts5[DEFAULT_DB_ALIAS]
+
+
+def doc_rowid(kind, pk):
+    return pk * KIND_SLOTS + KIND_CODES[kind]
+
+
+def build_match(query):
+    """
+    Turns free text into an FTS5 expression where every word is a quoted
+    prefix term, so ``jo smi`` matches "John Smith" and user input can never
+    inject FTS operators.
+    """
+    tokens = _token_re.findall(query or '')
+    return ' AND '.join('"%s"*' % token.replace('"', '""') for token in tokens)
+
+
+def prefix_bounds(prefix):
+    """
+    ``(low, high)`` such that ``low <= value < high`` holds exactly for the
+    values starting with ``prefix``; unlike LIKE, an index can seek it.
+    An empty prefix matches everything and has no upper bound (None).
+    """
+    if not prefix:
+        return prefix, None
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _document(kind, obj):
+    if kind == STUDENT:
+        return f"{obj.first_name} {obj.last_name}", obj.email
+    if kind == COURSE:
+        return f"{obj.name} {obj.course_code}", obj.description or ''
+    course_names = ' '.join(course.name for course in obj.courses.all())
+    return f"{obj.first_name} {obj.last_name}", f"{obj.email} {course_names}"
+
+
+def kind_for(model):
+    return {Student: STUDENT, Course: COURSE, Instructor: INSTRUCTOR}.get(model)
+
+
+def kind_model(kind):
+    return {STUDENT: Student, COURSE: Course, INSTRUCTOR: Instructor}[kind]
+
+
+def index_object(obj):
+    """
+    Inserts or replaces the index row of a student, course or instructor.
+    """
+    kind = kind_for(type(obj))
+    if kind is None or not is_available():
+        return
+    title, body = _document(kind, obj)
+    rowid = doc_rowid(kind, obj.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(DELETE_SQL, [rowid])
+        cursor.execute(INSERT_SQL, [rowid, kind, obj.pk, title, body])
+
+
+def index_many(objects):
+    """
+    Inserts or replaces the index rows of several objects of one model, e.g.
+    bulk-created ones, which never send ``post_save``.
+    """
+    objects = list(objects)
+    if not objects or not is_available():
+        return
+    kind = kind_for(type(objects[0]))
+    rows = [(doc_rowid(kind, obj.pk), kind, obj.pk) + _document(kind, obj) for obj in objects]
+    with connection.cursor() as cursor:
+        cursor.executemany(DELETE_SQL, [(row[0],) for row in rows])
+        cursor.executemany(INSERT_SQL, rows)
+
+
+def remove_object(kind, pk):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(DELETE_SQL, [doc_rowid(kind, pk)])
+
+
+def rebuild(kinds=None, batch_size=1000):
+    """
+    Refills the index from the model tables, creating the virtual table if it
+    is missing. Returns the number of documents written per kind.
+    """
+    kinds = kinds or (STUDENT, COURSE, INSTRUCTOR)
+    querysets = {
+        STUDENT: Student.objects.all(),
+        COURSE: Course.objects.all(),
+        INSTRUCTOR: Instructor.objects.prefetch_related('courses'),
+    }
+    counts = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        for kind in kinds:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE kind = %s", [kind])
+            rows = []
+            counts[kind] = 0
+            for obj in querysets[kind].iterator(chunk_size=batch_size):
+                title, body = _document(kind, obj)
+                rows.append((doc_rowid(kind, obj.pk), kind, obj.pk, title, body))
+                if len(rows) >= batch_size:
+                    cursor.executemany(INSERT_SQL, rows)
+                    counts[kind] += len(rows)
+                    rows = []
+            if rows:
+                cursor.executemany(INSERT_SQL, rows)
+                counts[kind] += len(rows)
+    return counts
+
+
+def search(kind, query, limit=50):
+    """
+    Returns the primary keys matching ``query``, best bm25 rank first.
+    """
+    match = build_match(query)
+    if not match or not is_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s ORDER BY rank LIMIT %s",
+            [match, kind, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def matching_ids(kind, query):
+    """
+    Subquery expression of the primary keys matching ``query`` for use in
+    ``filter(pk__in=...)``.
+    """
+    return RawSQL(
+        f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s",
+        (build_match(query), kind),
+    )
+
+
+def filter_queryset(queryset, kind, query, field='pk'):
+    """
+    Restricts ``queryset`` to the rows whose index document matches ``query``.
+    ``field`` names the column holding the indexed object's key, e.g.
+    ``course`` when filtering enrollments by course.
+    """
+    if not build_match(query):
+        return queryset.none() if query and query.strip() else queryset
+    if not is_available():
+        lookup = Q()
+        for name in FALLBACK_FIELDS[kind]:
+            lookup |= Q(**{f"{name}__icontains": query})
+        if field != 'pk':
+            return queryset.filter(**{f"{field}__in": kind_model(kind).objects.filter(lookup).values('pk')})
+        return queryset.filter(lookup).distinct()
+    return queryset.filter(**{f"{field}__in": matching_ids(kind, query)})
+
+
+async def afilter_queryset(queryset, kind, query, field='pk'):
+    """
+    Async counterpart of :func:`filter_queryset`.
+    """
+    await ais_available()
+    return filter_queryset(queryset, kind, query, field)
@@ -0,0 +1,143 @@
+"""
+Sessions and the signed-in user without database queries on warm requests.
+
+``SMS_SESSION_MODE`` picks the session engine (``cached_db`` by default).
+``CachedAuthenticationMiddleware`` replaces Django's and keeps the ``User``
+behind a session in ``SMS_AUTH_CACHE`` for ``SMS_AUTH_CACHE_TIMEOUT``
+seconds. A cached user is checked against the session's auth hash just as
+Django checks a freshly loaded one, and it is dropped whenever the user is
+saved (e.g. a password change) or logs out; see ``signals.py``. Users are
+always loaded from the primary, never from the read replica.
+
+Dropping the entry only reaches other workers through a shared cache. With
+a per-process cache (``LocMemCache``) each entry also records the ``user``
+stamp, which every User save bumps, and a hit costs one indexed read of it
+so deactivation or a lost ``is_staff`` is seen by every worker at once.
+
+Expired session rows are deleted in batches by ``clear_expired``, which
+``manage.py clear_expired_sessions`` runs on a schedule.
+"""
+import time
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from . import replica, stamps
+from .models import TableStamp
+from .purging import raw_delete
+
+
+KEY_PREFIX = 'sms:user:'
+CLEAR_BATCH_SIZE = 1000
+
+
+def _cache():
+    return caches[settings.SMS_AUTH_CACHE]
+
+
+def _key(user_id):
+    return f"{KEY_PREFIX}{user_id}"
+
+
+def is_shared():
+    """False for a per-process cache, which ``forget_user`` in another worker cannot reach."""
+    return not isinstance(_cache(), LocMemCache)
+
+
+def users_version():
+    """The ``user`` stamp, read from the primary."""
+    return (
+        TableStamp.objects.using(DEFAULT_DB_ALIAS).filter(name=stamps.USER)
+        .values_list('version', flat=True).first()
+    )
+
+
+def forget_user(user_id):
+    """Drops a user's cached copy so the next request reloads it."""
+    if user_id is not None:
+        _cache().delete(_key(user_id))
+
+
+def load_user(request):
+    """
+    ``auth.get_user(request)`` answered from the cache when possible. A miss
+    or a failed hash check takes Django's path, which also handles key
+    rotation and flushes sessions that no longer match.
+    """
+    timeout = settings.SMS_AUTH_CACHE_TIMEOUT
+    user_id = request.session.get(auth.SESSION_KEY)
+    backend = request.session.get(auth.BACKEND_SESSION_KEY)
+    if not timeout or user_id is None or backend not in settings.AUTHENTICATION_BACKENDS:
+        with replica.primary():
+            return auth.get_user(request)
+
+    version = None if is_shared() else users_version()
+    entry = _cache().get(_key(user_id))
+    if entry is not None:
+        user, cached_version = entry
+        session_hash = request.session.get(auth.HASH_SESSION_KEY)
+        if (
+            cached_version == version and session_hash
+            and constant_time_compare(session_hash, user.get_session_auth_hash())
+        ):
+            user.backend = backend
+            return user
+        forget_user(user_id)
+
+    with replica.primary():
+        user = auth.get_user(request)
+    if user.is_authenticated:
+        _cache().set(_key(user_id), (user, version), timeout)
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = load_user(request)
+    return request._cached_user
+
+
+async def aget_user(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await sync_to_async(load_user)(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    ``AuthenticationMiddleware`` whose ``request.user`` and
+    ``request.auser()`` come from the per-user cache.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(aget_user, request)
+
+
+def clear_expired(batch_size=CLEAR_BATCH_SIZE, pause=0.0):
+    """
+    Deletes expired session rows ``batch_size`` at a time, one short
+    transaction per batch on the ``expire_date`` index, and returns the
+    number deleted. ``clearsessions`` deletes them all in one transaction.
+    """
+    expired = Session.objects.filter(expire_date__lt=timezone.now())
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            count = raw_delete(Session.objects.filter(pk__in=expired.values('pk')[:batch_size]))
+        deleted += count
+        if count < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,196 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import catalog, counters, search, sessions, stamps, summaries
+from .models import Course, Enrollment, Instructor, Metadata, Student
+
+
+# --- Search index ---
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Instructor)
+def index_saved(sender, instance, **kwargs):
+    search.index_object(instance)
+
+
+@receiver(post_save, sender=Course)
+def index_saved_course(sender, instance, created, **kwargs):
+    search.index_object(instance)
+    if not created:
+        # Instructor documents embed their course names.
+        search.index_many(instance.instructors.prefetch_related('courses'))
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Instructor)
+def unindex_deleted(sender, instance, **kwargs):
+    search.remove_object(search.kind_for(sender), instance.pk)
+
+
+@receiver(pre_delete, sender=Course)
+def remember_course_instructors(sender, instance, **kwargs):
+    instance._instructor_ids = list(instance.instructors.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Course)
+def unindex_deleted_course(sender, instance, **kwargs):
+    search.remove_object(search.COURSE, instance.pk)
+    search.index_many(Instructor.objects.filter(pk__in=getattr(instance, '_instructor_ids', [])).prefetch_related('courses'))
+
+
+@receiver(m2m_changed, sender=Instructor.courses.through)
+def index_instructor_courses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_object(instance)
+    elif pk_set:
+        search.index_many(Instructor.objects.filter(pk__in=pk_set).prefetch_related('courses'))
+
+
+# --- Dashboard counters ---
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Instructor)
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump({counters.MODEL_COUNTERS[sender]: 1})
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Instructor)
+def count_deleted(sender, instance, **kwargs):
+    counters.bump({counters.MODEL_COUNTERS[sender]: -1})
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_previous_enrollment(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk is None:
+        return
+    stored = getattr(instance, '_stored', None)
+    if stored is not None:
+        instance._previous = stored
+    else:
+        # Built by hand with a pk rather than loaded, so nothing was
+        # captured; save() may still turn out to be an update.
+        instance._previous = Enrollment.all_objects.filter(pk=instance.pk).values('student_id', 'score').first()
+
+
+@receiver(post_save, sender=Enrollment)
+def count_saved_enrollment(sender, instance, created, **kwargs):
+    deltas = dict(counters.enrollment_deltas(instance.score))
+    previous = getattr(instance, '_previous', None)
+    if created:
+        deltas[counters.ENROLLMENTS] = 1
+    elif previous is not None:
+        for name, delta in counters.enrollment_deltas(previous['score'], -1).items():
+            deltas[name] = deltas.get(name, 0) + delta
+    else:
+        return
+    counters.bump(deltas)
+
+
+@receiver(post_delete, sender=Enrollment)
+def count_deleted_enrollment(sender, instance, **kwargs):
+    deltas = counters.enrollment_deltas(instance.score, -1)
+    deltas[counters.ENROLLMENTS] = -1
+    counters.bump(deltas)
+
+
+# --- Student summaries ---
+
+@receiver(post_save, sender=Enrollment)
+def summarize_saved_enrollment(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        summaries.apply_delta(instance.student_id, summaries.enrollment_delta(instance.score))
+        return
+    if previous['student_id'] != instance.student_id:
+        summaries.apply_delta(previous['student_id'], summaries.enrollment_delta(previous['score'], -1))
+        summaries.apply_delta(instance.student_id, summaries.enrollment_delta(instance.score))
+        return
+    removed = summaries.enrollment_delta(previous['score'], -1)
+    added = summaries.enrollment_delta(instance.score)
+    summaries.apply_delta(instance.student_id, tuple(a + b for a, b in zip(removed, added)))
+
+
+@receiver(post_delete, sender=Enrollment)
+def summarize_deleted_enrollment(sender, instance, **kwargs):
+    # Never recreate a summary here: the student may be mid-delete.
+    summaries.apply_delta(instance.student_id, summaries.enrollment_delta(instance.score, -1), create_missing=False)
+
+
+@receiver(post_save, sender=Enrollment)
+def remember_stored_enrollment(sender, instance, **kwargs):
+    # Registered after the handlers above, which still need _previous.
+    instance._stored = {'student_id': instance.student_id, 'score': instance.score}
+
+
+# --- Course catalog cache ---
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_catalog(sender, **kwargs):
+    catalog.bump_on_commit()
+
+
+@receiver(m2m_changed, sender=Instructor.courses.through)
+@receiver(m2m_changed, sender=Course.metadata.through)
+def bump_catalog_links(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        catalog.bump_on_commit()
+
+
+# --- Table change stamps ---
+
+LINK_STAMPS = {
+    Student.metadata.through: stamps.STUDENT,
+    Course.metadata.through: stamps.COURSE,
+    Instructor.metadata.through: stamps.INSTRUCTOR,
+    Instructor.courses.through: stamps.INSTRUCTOR,
+    Enrollment.metadata.through: stamps.ENROLLMENT,
+}
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Instructor)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=Metadata)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Instructor)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=Metadata)
+def stamp_changed(sender, **kwargs):
+    stamps.touch(stamps.MODEL_STAMPS[sender])
+
+
+@receiver(m2m_changed)
+def stamp_links(sender, action, **kwargs):
+    name = LINK_STAMPS.get(sender)
+    if name and action in ('post_add', 'post_remove', 'post_clear'):
+        stamps.touch(name)
+
+
+# --- Cached auth users ---
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_saved_user(sender, instance, **kwargs):
+    # Covers password changes (reset_password), deactivation and logins.
+    # The stamp reaches workers whose per-process cache forget_user cannot.
+    sessions.forget_user(instance.pk)
+    stamps.touch(stamps.USER)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        sessions.forget_user(user.pk)
@@ -0,0 +1,37 @@
+"""
+Per-connection SQLite tuning. The pragmas in ``settings.SMS_SQLITE_PRAGMAS``
+run on every new SQLite connection through the ``connection_created`` signal.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+def apply_pragmas(sender=None, connection=None, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SMS_SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def current_pragmas(connection):
+    """
+    Reads back the tuned pragmas, e.g. to confirm WAL is active.
+    """
+    values = {}
+    with connection.cursor() as cursor:
+        for name in getattr(settings, 'SMS_SQLITE_PRAGMAS', {}):
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            values[name] = row[0] if row else None
+    return values
+
+
+def install():
+    connection_created.connect(apply_pragmas, dispatch_uid='sms_sqlite_pragmas')
+    for connection in connections.all(initialized_only=True):
+        apply_pragmas(connection=connection)
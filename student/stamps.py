@@ -0,0 +1,120 @@
+"""
+Per-table change stamps and conditional GET for the list pages.
+
+Every write bumps the stamp of the table it touches, inside the same
+transaction. A list page's ETag is derived from the stamps it depends on,
+the full path, the user and the CSRF secret, so a repeated request is
+answered with ``304 Not Modified`` after a single read of the stamp table.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib import messages
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Course, Enrollment, Instructor, Metadata, Student, TableStamp
+
+
+STUDENT = 'student'
+COURSE = 'course'
+INSTRUCTOR = 'instructor'
+ENROLLMENT = 'enrollment'
+METADATA = 'metadata'
+
+NAMES = (STUDENT, COURSE, INSTRUCTOR, ENROLLMENT, METADATA)
+# Bumped by every User save; cached auth users are checked against it.
+USER = 'user'
+
+MODEL_STAMPS = {
+    Student: STUDENT,
+    Course: COURSE,
+    Instructor: INSTRUCTOR,
+    Enrollment: ENROLLMENT,
+    Metadata: METADATA,
+}
+
+
+def touch(*names):
+    """
+    Bumps the stamps in ``names`` with a single UPDATE.
+    """
+    names = set(names)
+    if not names:
+        return
+    updated = TableStamp.objects.filter(name__in=names).update(version=F('version') + 1, changed_at=timezone.now())
+    if updated < len(names):
+        TableStamp.objects.bulk_create([TableStamp(name=name, version=1) for name in names], ignore_conflicts=True)
+
+
+def read(names):
+    return {name: (version, changed_at) for name, version, changed_at in
+            TableStamp.objects.filter(name__in=names).values_list('name', 'version', 'changed_at')}
+
+
+async def aread(names):
+    return {name: (version, changed_at) async for name, version, changed_at in
+            TableStamp.objects.filter(name__in=names).values_list('name', 'version', 'changed_at')}
+
+
+def _validators(request, names, stamps):
+    """
+    Returns ``(etag, last_modified)`` for the request, or ``(None, None)``
+    when the page must not be revalidated, e.g. while a flash message is
+    waiting to be shown.
+    """
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+        return None, None
+    parts = [
+        request.get_full_path(),
+        str(request.user.pk),
+        request.META.get('CSRF_COOKIE', ''),
+    ] + [f"{name}:{stamps.get(name, (0, None))[0]}" for name in names]
+    etag = '"%s"' % hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    times = [changed_at for _, changed_at in stamps.values() if changed_at]
+    last_modified = int(max(times).timestamp()) if times else None
+    return etag, last_modified
+
+
+def _finish(request, response, etag, last_modified):
+    if etag is None:
+        return response
+    response.headers.setdefault('ETag', etag)
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(last_modified)
+    # Revalidate on every visit instead of trusting a heuristic freshness.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(*names):
+    """
+    Decorates a list view so it answers 304 when none of the tables in
+    ``names`` changed since the client's copy. Works on sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                etag, last_modified = _validators(request, names, await aread(names))
+                response = None
+                if etag is not None:
+                    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(request, response, etag, last_modified)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                etag, last_modified = _validators(request, names, read(names))
+                response = None
+                if etag is not None:
+                    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _finish(request, response, etag, last_modified)
+        return wrapper
+    return decorator
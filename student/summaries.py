@@ -0,0 +1,126 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Case, Count, DecimalField, F, FloatField, IntegerField, Q, Sum, When
+from django.db.models.functions import Cast, Round
+
+from .models import Enrollment, StudentSummary
+
+
+CENT = Decimal('0.01')
+UPDATE_FIELDS = ['enrollment_count', 'graded_count', 'score_sum', 'mean_score', 'updated_at']
+
+
+def _decimal(score):
+    return Decimal(str(score)) if score is not None else None
+
+
+def mean(score_sum, graded):
+    """
+    The mean score rounded half-up to cents, or None when nothing is graded.
+    """
+    return (score_sum / graded).quantize(CENT, rounding=ROUND_HALF_UP) if graded else None
+
+
+def _mean_expression(score_sum, graded):
+    """
+    :func:`mean` in SQL. The division runs on whole cents, since rounding a
+    REAL would turn e.g. 80.145 into 80.14; scores are never negative.
+    """
+    cents = Cast(Round(score_sum * 100), IntegerField())
+    return Cast((cents * 2 + graded) / (graded * 2), FloatField()) / 100
+
+
+def enrollment_delta(score, sign=1):
+    """
+    ``(enrollments, graded, score_sum)`` change for adding (``sign=1``) or
+    removing (``sign=-1``) one enrollment.
+    """
+    score = _decimal(score)
+    if score is None:
+        return sign, 0, Decimal(0)
+    return sign, sign, sign * score
+
+
+def apply_delta(student_id, delta, create_missing=True):
+    """
+    Adds ``delta`` to a student's summary in one UPDATE, recomputing the mean
+    from the new totals. A missing summary is built from the enrollment table
+    instead, unless ``create_missing`` is off (e.g. while the student itself
+    is being deleted).
+    """
+    enrollments, graded, score_sum = delta
+    if not (enrollments or graded or score_sum):
+        return
+    new_graded = F('graded_count') + graded
+    new_sum = F('score_sum') + score_sum
+    updated = StudentSummary.objects.filter(student_id=student_id).update(
+        enrollment_count=F('enrollment_count') + enrollments,
+        graded_count=new_graded,
+        score_sum=new_sum,
+        mean_score=Case(
+            When(Q(graded_count__gt=-graded), then=_mean_expression(new_sum, new_graded)),
+            default=None,
+            output_field=DecimalField(max_digits=5, decimal_places=2),
+        ),
+    )
+    if not updated and create_missing:
+        refresh([student_id])
+
+
+def compute(student_ids):
+    """
+    Builds unsaved summaries for ``student_ids`` from the enrollment table
+    with one GROUP BY query. Students without enrollments get zero totals.
+    """
+    summaries = {
+        student_id: StudentSummary(student_id=student_id)
+        for student_id in student_ids
+    }
+    rows = (
+        Enrollment.objects.filter(student_id__in=summaries).order_by().values('student_id')
+        .annotate(total=Count('pk'), graded=Count('score'), score_sum=Sum('score'))
+    )
+    for row in rows:
+        summary = summaries[row['student_id']]
+        summary.enrollment_count = row['total']
+        summary.graded_count = row['graded']
+        summary.score_sum = row['score_sum'] or Decimal(0)
+        summary.mean_score = mean(summary.score_sum, row['graded'])
+    return list(summaries.values())
+
+
+def refresh(student_ids):
+    """
+    Recomputes and upserts the summaries of ``student_ids`` in bulk.
+    """
+    summaries = compute(student_ids)
+    StudentSummary.objects.bulk_create(
+        summaries, update_conflicts=True, unique_fields=['student'], update_fields=UPDATE_FIELDS,
+    )
+    return summaries
+
+
+def find_drift(student_ids):
+    """
+    Compares stored summaries with recomputed ones and returns the recomputed
+    summaries that differ (or are missing).
+    """
+    stored = {
+        summary.student_id: summary
+        for summary in StudentSummary.objects.filter(student_id__in=student_ids)
+    }
+    drifted = []
+    for actual in compute(student_ids):
+        current = stored.get(actual.student_id)
+        if current is None:
+            if actual.enrollment_count:
+                drifted.append(actual)
+            continue
+        if (
+            current.enrollment_count != actual.enrollment_count
+            or current.graded_count != actual.graded_count
+            or current.score_sum != actual.score_sum
+            or current.mean_score != actual.mean_score
+        ):
+            drifted.append(actual)
+    return drifted
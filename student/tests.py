@@ -1,3 +1,1442 @@
-from django.test import TestCase
+import csv
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing, redirect_stdout
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import analytics, archiving, async_views, benchmarks, catalog, compaction, counters, datagen, enrolling, exporting, gradebook, metadata, metrics, purging, queryplan, replica, search, sessions, sqlite, stamps, summaries
+from .models import Course, Enrollment, Instructor, Metadata, Student, StudentSummary
+from . import urls as student_urls
+from .pagination import paginate_by_cursor
+
+
+def _writes(queries):
+    return [q['sql'] for q in queries if q['sql'].split(None, 1)[0] in ('INSERT', 'UPDATE', 'DELETE')]
+
+
+class SMSTestCase(TestCase):
+    """
+    A small generated data set and a signed-in staff client. The caches are
+    cleared per test, since they outlive the rolled-back transactions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sizes = datagen.generate(students=40, courses=6, instructors=4, enrollments=120, metadata=12)
+        cls.user = User.objects.create_superuser('staff', 'staff@example.com', 'password')
+
+    def setUp(self):
+        caches['default'].clear()
+        catalog._local.clear()
+        self.client.force_login(self.user)
+
+    def assertCountersMatch(self):
+        """The dashboard counters match a recount of the tables."""
+        stored = dict(counters.Counter.objects.values_list('name', 'value'))
+        actual = counters.compute()
+        self.assertEqual({name: stored.get(name) for name in actual}, actual)
+
+    def assertConsistent(self):
+        """Counters and student summaries match a recount of the tables."""
+        self.assertCountersMatch()
+        self.assertEqual(summaries.find_drift(list(Student.objects.values_list('pk', flat=True))), [])
+
+
+class DataGenerationTests(SMSTestCase):
+
+    def test_sizes(self):
+        self.assertEqual(self.sizes['students'], Student.objects.count())
+        self.assertEqual(self.sizes['enrollments'], Enrollment.objects.count())
+        self.assertEqual((Course.objects.count(), Instructor.objects.count(), Metadata.objects.count()), (6, 4, 12))
+
+    def test_reproducible(self):
+        names = list(Student.objects.order_by('pk').values_list('first_name', 'last_name', 'dob'))
+        Student.objects.all().delete()
+        Course.objects.all().delete()
+        Instructor.objects.all().delete()
+        Metadata.objects.all().delete()
+        datagen.generate(students=40, courses=6, instructors=4, enrollments=120, metadata=12)
+        self.assertEqual(list(Student.objects.order_by('pk').values_list('first_name', 'last_name', 'dob')), names)
+
+
+class BenchmarkTests(SMSTestCase):
+
+    def test_every_url_has_a_plan(self):
+        self.assertEqual(benchmarks.unplanned(), [])
+
+    def test_every_plan_succeeds(self):
+        ctx = benchmarks.Context(self.user)
+        anonymous = Client()
+        for label, _, build in benchmarks.PLANS:
+            with self.subTest(label=label):
+                result = benchmarks.measure(self.client, anonymous, ctx, build, repeat=1, warmup=0)
+                self.assertTrue(all(status < 400 for status in result['statuses']), result['statuses'])
+
+    def test_compare_flags_slower_plans_and_extra_queries(self):
+        old = {'p50_ms': 10.0, 'queries_max': 3}
+        baseline = {'results': {'1k': {'a': old, 'b': old, 'c': old}}}
+        current = {'results': {'1k': {
+            'a': {'p50_ms': 11.0, 'queries_max': 3},
+            'b': {'p50_ms': 13.0, 'queries_max': 3},
+            'c': {'p50_ms': 10.0, 'queries_max': 4},
+        }}}
+        self.assertEqual([label for _, label, _ in benchmarks.compare(baseline, current, 0.2)], ['b', 'c'])
+
+
+class QueryCountTests(SMSTestCase):
+    """
+    Every page costs a fixed number of queries, whatever its size.
+    """
+
+    def get(self, url, queries):
+        # The first request loads the session user; later ones reuse it.
+        # The FTS5 probe runs once per process, whichever test comes first.
+        self.client.get(reverse('dashboard'))
+        search.is_available()
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_views(self):
+        student = Enrollment.objects.values_list('student_id', flat=True).first()
+        pages = [
+            (reverse('dashboard'), 2),
+            (reverse('student_list'), 3),
+            (reverse('course_list'), 3),
+            (reverse('instructor_list'), 5),
+            (reverse('enrollment_list', args=[student]), 6),
+        ]
+        for url, queries in pages:
+            for page_size in (10, 50):
+                with self.subTest(url=url, page_size=page_size):
+                    self.get(f"{url}?page_size={page_size}", queries)
+
+    def test_list_views_with_filters(self):
+        self.get(f"{reverse('student_list')}?q=student1&page_size=10", 3)
+        self.get(f"{reverse('student_list')}?meta.program=v0", 3)
+
+    def test_api_pages(self):
+        pages = [
+            ('students', 2), ('courses', 2), ('instructors', 3), ('enrollments', 2),
+        ]
+        for resource, queries in pages:
+            with self.subTest(resource=resource):
+                url = reverse('api_list', args=[resource])
+                self.get(f"{url}?page_size=10", queries)
+                self.get(f"{url}?page_size=50&include=metadata", queries + 1)
+
+
+class CursorPaginationTests(SMSTestCase):
+
+    def page(self, **params):
+        request = RequestFactory().get('/', {'page_size': 10, **params})
+        return paginate_by_cursor(request, Student.objects.all())
+
+    def pks(self, page):
+        return [student.pk for student in page]
+
+    def test_walks_forward_and_back(self):
+        all_pks = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+        first = self.page()
+        self.assertEqual(self.pks(first), all_pks[:10])
+        self.assertIsNone(first.prev_cursor)
+        second = self.page(after=first.next_cursor)
+        self.assertEqual(self.pks(second), all_pks[10:20])
+        self.assertEqual(second.prev_cursor, all_pks[10])
+        back = self.page(before=second.prev_cursor)
+        self.assertEqual(self.pks(back), all_pks[:10])
+        self.assertIsNone(back.prev_cursor)
+        self.assertEqual(back.next_cursor, all_pks[9])
+
+    def test_last_page_has_no_next(self):
+        all_pks = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+        last = self.page(after=all_pks[-4])
+        self.assertEqual(self.pks(last), all_pks[-3:])
+        self.assertIsNone(last.next_cursor)
+        self.assertFalse(self.page(after=all_pks[-1]))
+
+    def test_exactly_one_page(self):
+        request = RequestFactory().get('/', {'page_size': 10})
+        page = paginate_by_cursor(request, Student.objects.order_by('pk').filter(pk__in=Student.objects.values('pk')[:10]))
+        self.assertEqual(len(page), 10)
+        self.assertIsNone(page.next_cursor)
+
+    def test_no_previous_page_when_earlier_rows_are_gone(self):
+        all_pks = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+        Student.objects.filter(pk__lte=all_pks[10]).delete()
+        page = self.page(after=all_pks[5])
+        self.assertEqual(self.pks(page)[0], all_pks[11])
+        self.assertIsNone(page.prev_cursor)
+
+    def test_bad_parameters_fall_back(self):
+        page = self.page(after='abc', page_size=7)
+        self.assertEqual(page.page_size, 25)
+        self.assertIsNone(page.prev_cursor)
+
+    def test_links_keep_other_parameters(self):
+        request = RequestFactory().get('/', {'page_size': 10, 'q': 'x', 'before': 99})
+        page = paginate_by_cursor(request, Student.objects.all())
+        self.assertIn('q=x', page.next_query)
+        self.assertNotIn('before=99', page.next_query)
+
+
+class SearchTests(SMSTestCase):
+    """
+    List searches go through the FTS5 index, which every write keeps current.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.student = Student.objects.create(first_name='Johanna', last_name='Smithers', email='js@example.com', dob='2000-01-01')
+
+    def students(self, query):
+        return [s.pk for s in self.client.get(reverse('student_list'), {'q': query}).context['page']]
+
+    def test_prefix_words_match_in_any_order(self):
+        self.assertEqual(self.students('smi joh'), [self.student.pk])
+        self.assertEqual(self.students('js@example'), [self.student.pk])
+        self.assertEqual(self.students('johanna nobody'), [])
+
+    def test_edits_and_deletes_update_the_index(self):
+        self.student.last_name = 'Carter'
+        self.student.save()
+        self.assertEqual(self.students('smithers'), [])
+        self.assertEqual(self.students('carter'), [self.student.pk])
+        self.student.delete()
+        self.assertEqual(self.students('carter'), [])
+
+    def test_operators_are_plain_text(self):
+        self.assertEqual(self.students('johanna OR'), [])
+        self.assertEqual(self.students('"smi*'), [self.student.pk])
+        self.assertEqual(self.students('*** ---'), [])
+
+    def test_instructors_match_their_course_names(self):
+        course = Course.objects.create(name='Xylophone Studies', course_code='XYL1')
+        instructor = Instructor.objects.first()
+        instructor.courses.add(course)
+        page = self.client.get(reverse('instructor_list'), {'q': 'xylophone'}).context['page']
+        self.assertEqual([i.pk for i in page], [instructor.pk])
+        course.name = 'Marimba Studies'
+        course.save()
+        page = self.client.get(reverse('instructor_list'), {'q': 'marimba'}).context['page']
+        self.assertEqual([i.pk for i in page], [instructor.pk])
+
+    def test_search_ranks_and_limits(self):
+        self.assertEqual(search.search(search.STUDENT, 'smithers'), [self.student.pk])
+        self.assertEqual(len(search.search(search.STUDENT, 'student', limit=5)), 5)
+
+    def test_rebuild_matches_incremental_updates(self):
+        before = sorted(search.search(search.STUDENT, 'example', limit=1000))
+        counts = search.rebuild()
+        self.assertEqual(counts[search.STUDENT], Student.objects.count())
+        self.assertEqual(sorted(search.search(search.STUDENT, 'example', limit=1000)), before)
+
+    def test_like_fallback_without_fts5(self):
+        available = search.is_available()
+        search._fts5['default'] = False
+        try:
+            self.assertEqual(self.students('Smithers'), [self.student.pk])
+            self.assertEqual(self.students('smithers johanna'), [])
+        finally:
+            search._fts5['default'] = available
+
+
+class ImportTests(SMSTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        self.errors = os.path.join(self.dir, 'errors.csv')
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def run_import(self, **files):
+        out = StringIO()
+        call_command('import_sms', errors=self.errors, batch_size=2, stdout=out, **files)
+        with open(self.errors, newline='', encoding='utf-8') as f:
+            return out.getvalue(), list(csv.DictReader(f))
+
+    def test_students_and_enrollments(self):
+        students = self.write('students.csv', (
+            "first_name,last_name,email,dob,metadata\n"
+            "Imre,Kovacs,imre@example.com,2001-02-03,cohort:a\n"
+            "Bad,Date,bad@example.com,not-a-date,\n"
+            "Dup,Email,student1@example.com,2001-02-03,\n"
+            "Nora,Kovacs,nora@example.com,2002-03-04,cohort:a\n"
+        ))
+        course = Course.objects.first()
+        enrollments = self.write('enrollments.jsonl', '\n'.join([
+            json.dumps({'student_email': 'imre@example.com', 'course_code': course.course_code, 'score': '81.5'}),
+            json.dumps({'student_email': 'imre@example.com', 'course_code': course.course_code, 'score': '70'}),
+            json.dumps({'student_email': 'nobody@example.com', 'course_code': 'NOPE'}),
+            json.dumps({'student_email': 'nora@example.com', 'course_code': course.course_code.lower()}),
+        ]))
+        out, rejected = self.run_import(students=students, enrollments=enrollments)
+        self.assertIn('students: 2 imported, 2 rejected', out)
+        self.assertIn('enrollments: 2 imported, 2 rejected', out)
+        self.assertEqual([(r['model'], r['line']) for r in rejected], [
+            ('student', '3'), ('student', '4'), ('enrollment', '2'), ('enrollment', '3'),
+        ])
+        imre = Student.objects.get(email='imre@example.com')
+        self.assertEqual(imre.enrollments.get().score, Decimal('81.5'))
+        self.assertEqual(list(imre.metadata.values_list('key', 'value')), [('cohort', 'a')])
+        self.assertEqual(Metadata.objects.filter(key='cohort', value='a').count(), 1)
+        self.assertEqual(len(search.search(search.STUDENT, 'kovacs')), 2)
+
+    def test_rows_that_are_not_objects_are_reported(self):
+        students = self.write('students.jsonl', '\n'.join([
+            '"x"', '[1]', '3', '{not json',
+            json.dumps({'first_name': 'Ola', 'last_name': 'Berg', 'email': 'ola@example.com', 'dob': '2000-05-06'}),
+        ]))
+        out, rejected = self.run_import(students=students)
+        self.assertIn('students: 1 imported, 4 rejected', out)
+        self.assertEqual([r['line'] for r in rejected], ['1', '2', '3', '4'])
+        self.assertIn('Expected a JSON object, got str', rejected[0]['error'])
+        self.assertIn('Invalid JSON', rejected[3]['error'])
+        self.assertTrue(Student.objects.filter(email='ola@example.com').exists())
+
+    def test_instructors_link_courses(self):
+        codes = list(Course.objects.order_by('pk').values_list('course_code', flat=True)[:2])
+        instructors = self.write('instructors.csv', (
+            "first_name,last_name,email,courses\n"
+            f"Tove,Lind,tove@example.com,{codes[0]};{codes[1]}\n"
+            "Unknown,Course,uc@example.com,ZZZ999\n"
+        ))
+        out, rejected = self.run_import(instructors=instructors)
+        self.assertIn('instructors: 1 imported, 1 rejected', out)
+        self.assertIn('ZZZ999', rejected[0]['error'])
+        tove = Instructor.objects.get(email='tove@example.com')
+        self.assertEqual(sorted(tove.courses.values_list('course_code', flat=True)), sorted(codes))
+
+
+class ExportTests(SMSTestCase):
+
+    def export(self, kind, **params):
+        response = self.client.get(reverse('export_data', args=[kind]), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_every_row_and_metadata_column(self):
+        rows = list(csv.DictReader(StringIO(self.export('students'))))
+        self.assertEqual(len(rows), Student.objects.count())
+        student = Student.objects.order_by('pk').prefetch_related('metadata').first()
+        first = rows[0]
+        self.assertEqual((int(first['id']), first['email']), (student.pk, student.email))
+        for meta in student.metadata.all():
+            self.assertIn(meta.value, first[f"meta.{meta.key}"])
+
+    def test_jsonl_and_filters(self):
+        student = Enrollment.objects.values_list('student_id', flat=True).first()
+        lines = self.export('enrollments', format='jsonl', student=student).splitlines()
+        self.assertEqual(len(lines), Enrollment.objects.filter(student_id=student).count())
+        self.assertEqual({json.loads(line)['student_email'] for line in lines}, {Student.objects.get(pk=student).email})
+        rows = list(csv.DictReader(StringIO(self.export('students', q='student1'))))
+        self.assertEqual(
+            {row['email'] for row in rows},
+            set(Student.objects.filter(email__startswith='student1').values_list('email', flat=True)),
+        )
+
+    def test_instructor_courses(self):
+        rows = list(csv.DictReader(StringIO(self.export('instructors'))))
+        instructor = Instructor.objects.order_by('pk').first()
+        self.assertEqual(rows[0]['courses'], ';'.join(sorted(instructor.courses.values_list('course_code', flat=True))))
+
+    def test_unknown_kind(self):
+        self.assertEqual(self.client.get(reverse('export_data', args=['grades'])).status_code, 404)
+
+    def test_command_writes_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'courses.jsonl')
+            call_command('export_sms', 'courses', format='jsonl', output=path)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), Course.objects.count())
+
+    def test_query_count_per_chunk(self):
+        # One query for the rows, then one metadata query per chunk (and one
+        # for the courses when exporting instructors).
+        for kind, per_chunk in (('students', 1), ('courses', 1), ('instructors', 2), ('enrollments', 1)):
+            with self.subTest(kind=kind):
+                queryset = exporting.export_queryset(kind)
+                chunks = -(-queryset.count() // 10)
+                with self.assertNumQueries(1 + per_chunk * chunks):
+                    rows = list(exporting.export_rows(kind, queryset, chunk_size=10))
+                self.assertEqual(len(rows), queryset.count())
+
+
+class SetMetadataTests(SMSTestCase):
+
+    def test_unchanged_pairs_write_nothing(self):
+        student = Student.objects.first()
+        metadata.set_metadata(student, 'a:1, b:2')
+        with CaptureQueriesContext(connection) as ctx:
+            metadata.set_metadata(student, 'b:2, a:1')
+        self.assertEqual(_writes(ctx.captured_queries), [])
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_only_the_difference_is_written(self):
+        student = Student.objects.first()
+        metadata.set_metadata(student, 'a:1, b:2')
+        metadata.set_metadata(student, 'b:2, c:3')
+        self.assertEqual(metadata.format_metadata(student), 'b:2, c:3')
+        self.assertEqual(Metadata.objects.filter(key='c', value='3').count(), 1)
+        metadata.set_metadata(student, '')
+        self.assertFalse(student.metadata.exists())
+
+    def test_query_count_does_not_grow_with_pairs(self):
+        student, other = Student.objects.all()[:2]
+        with CaptureQueriesContext(connection) as few:
+            metadata.set_metadata(student, 'a:1')
+        with CaptureQueriesContext(connection) as many:
+            metadata.set_metadata(other, ', '.join(f"k{i}:{i}" for i in range(30)))
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_typed_values(self):
+        course = Course.objects.first()
+        metadata.set_metadata(course, 'credits:4, starts:2025-09-01, room:B12')
+        meta = {m.key: m for m in course.metadata.all()}
+        self.assertEqual(meta['credits'].value_number, 4.0)
+        self.assertEqual(str(meta['starts'].value_date), '2025-09-01')
+        self.assertIsNone(meta['room'].value_number)
+
+    def test_edit_view_uses_the_shared_path(self):
+        instructor = Instructor.objects.first()
+        response = self.client.post(reverse('edit_instructor', args=[instructor.pk]), {
+            'first_name': instructor.first_name, 'last_name': instructor.last_name, 'email': instructor.email,
+            'courses': list(instructor.courses.values_list('pk', flat=True)), 'metadata': 'office:B2, office:B2',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(metadata.format_metadata(instructor), 'office:B2')
+
+
+class CounterTests(SMSTestCase):
+    """
+    The dashboard counters follow every write path without a recount.
+    """
+
+    def test_generated_data(self):
+        self.assertCountersMatch()
+
+    def test_model_saves_and_deletes(self):
+        student = Student.objects.create(first_name='A', last_name='B', email='ab@example.com', dob='2000-01-01')
+        course = Course.objects.create(name='Counting', course_code='CNT1')
+        enrollment = Enrollment.objects.create(student=student, course=course)
+        self.assertCountersMatch()
+        enrollment.score = Decimal('64.25')
+        enrollment.save()
+        self.assertCountersMatch()
+        enrollment.delete()
+        course.delete()
+        Instructor.objects.first().delete()
+        self.assertCountersMatch()
+
+    def test_views(self):
+        self.client.post(reverse('add_course'), {'name': 'Viewed', 'course_code': 'VW1', 'description': '', 'metadata': ''})
+        student = Student.objects.first()
+        course = Course.objects.get(course_code='VW1')
+        self.client.post(reverse('add_enrollment', args=[student.pk]), {'course': course.pk, 'score': '90', 'metadata': ''})
+        self.assertCountersMatch()
+        self.client.post(reverse('delete_student', args=[student.pk]))
+        self.assertCountersMatch()
+
+    def test_dashboard_reads_the_counters(self):
+        context = self.client.get(reverse('dashboard')).context
+        self.assertEqual(context['total_students'], Student.objects.count())
+        self.assertEqual(context['total_enrollments'], Enrollment.objects.count())
+        graded = Enrollment.objects.exclude(score=None)
+        average = sum(e.score for e in graded) / graded.count()
+        self.assertEqual(context['average_score'], round(float(average), 2))
+
+    def test_reconcile_repairs_drift(self):
+        counters.Counter.objects.filter(name=counters.STUDENTS).update(value=0)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn(f"students: 0 -> {Student.objects.count()}", out.getvalue())
+        self.assertCountersMatch()
+        self.assertEqual(counters.reconcile(), {})
+
+
+class AnalyticsTests(SMSTestCase):
+    """
+    The vectorized statistics agree with a plain per-course computation.
+    """
+
+    def expected(self, course):
+        scores = sorted(float(s) for s in course.enrollments.exclude(score=None).values_list('score', flat=True))
+        cuts = statistics.quantiles(scores, n=100, method='inclusive')
+        histogram = [0] * 10
+        for score in scores:
+            histogram[min(int(score // 10), 9)] += 1
+        return {
+            'enrolled': course.enrollments.count(),
+            'graded': len(scores),
+            'mean': round(statistics.fmean(scores), 2),
+            'std': round(statistics.pstdev(scores), 2),
+            'median': round(statistics.median(scores), 2),
+            'min': scores[0],
+            'max': scores[-1],
+            'p10': round(cuts[9], 2),
+            'p90': round(cuts[89], 2),
+            'histogram': histogram,
+        }
+
+    def test_matches_a_plain_computation(self):
+        report = {entry['id']: entry for entry in analytics.course_report()}
+        self.assertEqual(len(report), Course.objects.count())
+        for course in Course.objects.all():
+            with self.subTest(course=course.pk):
+                entry = report[course.pk]
+                expected = self.expected(course)
+                self.assertEqual(list(entry['histogram'].values()), expected.pop('histogram'))
+                for name, value in expected.items():
+                    self.assertAlmostEqual(entry[name], value, places=2, msg=name)
+
+    def test_edge_scores_and_empty_courses(self):
+        course = Course.objects.create(name='Edges', course_code='EDGE1')
+        empty = Course.objects.create(name='Empty', course_code='EDGE2')
+        students = list(Student.objects.all()[:3])
+        for student, score in zip(students, (Decimal('0'), Decimal('100'), None)):
+            Enrollment.objects.create(student=student, course=course, score=score)
+        report = {entry['id']: entry for entry in analytics.course_report([course.pk, empty.pk])}
+        self.assertEqual(
+            (report[course.pk]['enrolled'], report[course.pk]['ungraded'], report[course.pk]['mean']), (3, 1, 50.0),
+        )
+        self.assertEqual(report[course.pk]['histogram'], {**dict.fromkeys(report[course.pk]['histogram'], 0), '0-10': 1, '90-100': 1})
+        self.assertEqual((report[empty.pk]['enrolled'], report[empty.pk]['mean']), (0, None))
+
+    def test_views_filter_by_search(self):
+        course = Course.objects.order_by('pk').first()
+        response = self.client.get(reverse('course_analytics_json'), {'q': course.course_code})
+        self.assertEqual([entry['id'] for entry in response.json()['courses']], [course.pk])
+        response = self.client.get(reverse('course_analytics'))
+        self.assertEqual(len(response.context['report']), Course.objects.count())
+
+
+class SummaryTests(SMSTestCase):
+    """
+    Student summaries follow every enrollment write with a single UPDATE.
+    """
+
+    def test_generated_data(self):
+        self.assertConsistent()
+
+    def test_model_saves_and_deletes(self):
+        student = Student.objects.create(first_name='A', last_name='B', email='ab@example.com', dob='2000-01-01')
+        course = Course.objects.exclude(enrollments__student=student).first()
+        enrollment = Enrollment.objects.create(student=student, course=course, score=Decimal('50'))
+        self.assertConsistent()
+        enrollment.score = Decimal('75.5')
+        enrollment.save()
+        self.assertConsistent()
+        enrollment.student = Student.objects.exclude(enrollments__course=course).exclude(pk=student.pk).first()
+        enrollment.save()
+        self.assertConsistent()
+        enrollment.delete()
+        self.assertConsistent()
+
+    def test_edit_reuses_the_loaded_row(self):
+        enrollment = Enrollment.objects.first()
+        enrollment.score = Decimal('12.34')
+        with CaptureQueriesContext(connection) as ctx:
+            enrollment.save()
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'student_enrollment' in q['sql']])
+        self.assertConsistent()
+
+    def test_half_cent_means_round_up_on_both_paths(self):
+        student = Student.objects.create(first_name='A', last_name='B', email='ab@example.com', dob='2000-01-01')
+        courses = list(Course.objects.all()[:2])
+        Enrollment.objects.create(student=student, course=courses[0], score=Decimal('80.14'))
+        Enrollment.objects.create(student=student, course=courses[1], score=Decimal('80.15'))
+        self.assertEqual(StudentSummary.objects.get(student=student).mean_score, Decimal('80.15'))
+        self.assertEqual(summaries.find_drift([student.pk]), [])
+
+    def test_enrollment_views(self):
+        student = Student.objects.first()
+        course = Course.objects.exclude(enrollments__student=student).first()
+        response = self.client.post(reverse('add_enrollment', args=[student.pk]), {
+            'course': course.pk, 'score': '88', 'metadata': 'term:2024',
+        })
+        self.assertEqual(response.status_code, 302)
+        enrollment = Enrollment.objects.get(student=student, course=course)
+        self.assertConsistent()
+        self.client.post(reverse('edit_enrollment', args=[student.pk, enrollment.pk]), {
+            'course': course.pk, 'score': '', 'metadata': '',
+        })
+        self.assertConsistent()
+        self.client.post(reverse('delete_enrollment', args=[student.pk, enrollment.pk]))
+        self.assertFalse(Enrollment.objects.filter(pk=enrollment.pk).exists())
+        self.assertConsistent()
+
+    def test_verify_command_repairs_drift(self):
+        student = Enrollment.objects.values_list('student_id', flat=True).first()
+        StudentSummary.objects.filter(student_id=student).update(enrollment_count=0, mean_score=None)
+        out = StringIO()
+        call_command('verify_student_summaries', repair=True, stdout=out)
+        self.assertIn('repaired 1 drifted', out.getvalue())
+        self.assertConsistent()
+
+
+class ApiTests(SMSTestCase):
+
+    def get(self, resource, **params):
+        return self.client.get(reverse('api_list', args=[resource]), params)
+
+    def test_follows_next_links_over_every_row(self):
+        seen = []
+        url = f"{reverse('api_list', args=['enrollments'])}?page_size=25"
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(item['id'] for item in data['results'])
+            url = data['next']
+        self.assertEqual(seen, list(Enrollment.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_sparse_fields_and_metadata(self):
+        data = self.get('instructors', fields='email,courses', include='metadata', page_size=10).json()
+        instructor = Instructor.objects.order_by('pk').first()
+        self.assertEqual(data['results'][0], {
+            'id': instructor.pk,
+            'email': instructor.email,
+            'courses': [course.pk for course in instructor.courses.all()],
+            'metadata': [{'key': m.key, 'value': m.value} for m in instructor.metadata.all()],
+        })
+
+    def test_foreign_key_filter(self):
+        enrollment = Enrollment.objects.first()
+        data = self.get('enrollments', student=enrollment.student_id, fields='student,score').json()
+        self.assertEqual({item['student'] for item in data['results']}, {enrollment.student_id})
+        self.assertEqual(len(data['results']), Enrollment.objects.filter(student_id=enrollment.student_id).count())
+
+    def test_errors(self):
+        self.assertEqual(self.get('grades').status_code, 404)
+        self.assertEqual(self.get('students', fields='password').status_code, 400)
+        self.assertEqual(self.get('enrollments', student='x').status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.get('students').status_code, 401)
+
+
+class AsyncViewTests(SMSTestCase):
+    """
+    The ASGI twins of the read views, routed in with ``SMS_ASYNC_VIEWS``.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with override_settings(SMS_ASYNC_VIEWS=True):
+            importlib.reload(student_urls)
+        # Cleanups run last first: the URLconf is swapped back, then rebuilt sync.
+        cls.addClassCleanup(importlib.reload, student_urls)
+        cls.enterClassContext(override_settings(ROOT_URLCONF='student.urls'))
+
+    def setUp(self):
+        super().setUp()
+        # A fresh worker has not probed for FTS5 yet.
+        self.addCleanup(search._fts5.update, dict(search._fts5))
+        search._fts5.clear()
+
+    async def get(self, name, params, *args):
+        await self.async_client.aforce_login(self.user)
+        url = reverse(name, args=args)
+        self.assertIs(resolve(url).func.__module__, async_views.__name__)
+        response = await self.async_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def ids(self, response):
+        return [obj.pk for obj in response.context['page']]
+
+    async def test_dashboard(self):
+        response = await self.get('dashboard', {})
+        self.assertEqual(response.context['total_students'], await Student.objects.acount())
+
+    async def test_student_list_with_search_and_meta_filters(self):
+        meta = await Metadata.objects.filter(students__isnull=False).afirst()
+        student = await Student.objects.filter(metadata=meta).afirst()
+        response = await self.get('student_list', {'q': student.email, f"meta.{meta.key}": meta.value})
+        self.assertEqual(self.ids(response), [student.pk])
+        response = await self.get('student_list', {'q': student.email, f"meta.{meta.key}": 'none'})
+        self.assertEqual(self.ids(response), [])
+
+    async def test_course_list_with_search_and_meta_filters(self):
+        meta = await Metadata.objects.filter(courses__isnull=False).afirst()
+        course = await Course.objects.filter(metadata=meta).afirst()
+        response = await self.get('course_list', {'q': course.course_code, f"meta.{meta.key}": meta.value})
+        self.assertEqual(self.ids(response), [course.pk])
+
+    async def test_instructor_list_with_search_and_meta_filters(self):
+        meta = await Metadata.objects.filter(instructors__isnull=False).afirst()
+        instructor = await Instructor.objects.filter(metadata=meta).afirst()
+        response = await self.get('instructor_list', {'q': instructor.email, f"meta.{meta.key}": meta.value})
+        self.assertEqual(self.ids(response), [instructor.pk])
+
+    async def test_enrollment_list_with_search_and_meta_filters(self):
+        enrollment = await Enrollment.objects.select_related('course').afirst()
+        await Enrollment.metadata.through.objects.acreate(
+            enrollment=enrollment, metadata=await Metadata.objects.acreate(key='term', value='async'),
+        )
+        response = await self.get(
+            'enrollment_list', {'q': enrollment.course.course_code, 'meta.term': 'async'}, enrollment.student_id,
+        )
+        self.assertEqual(self.ids(response), [enrollment.pk])
+
+    async def test_signed_out_redirects(self):
+        response = await self.async_client.get(reverse('student_list'))
+        self.assertEqual(response.status_code, 302)
+
+
+class MetricsTests(SMSTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.get(reverse('dashboard'))
+        metrics.registry.reset()
+
+    def histogram(self, name, view):
+        return metrics.registry.histograms[(name, view)]
+
+    def test_records_queries_templates_and_size(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('student_list'))
+        self.assertEqual(self.histogram('request_queries', 'student_list').total, len(ctx.captured_queries))
+        self.assertGreater(self.histogram('request_sql_seconds', 'student_list').total, 0)
+        self.assertGreater(self.histogram('request_template_seconds', 'student_list').total, 0)
+        self.assertEqual(self.histogram('response_bytes', 'student_list').total, len(response.content))
+
+    def test_json_views_spend_no_template_time(self):
+        self.client.get(reverse('api_list', args=['courses']))
+        self.assertEqual(self.histogram('request_template_seconds', 'api_list').total, 0)
+
+    def test_streaming_responses_have_no_size(self):
+        self.client.get(reverse('export_data', args=['courses']))
+        self.assertNotIn(('response_bytes', 'export_data'), metrics.registry.histograms)
+        self.assertEqual(sum(self.histogram('request_duration_seconds', 'export_data').counts), 1)
+
+    def test_queries_outside_requests_are_ignored(self):
+        Student.objects.count()
+        self.assertEqual(metrics.registry.histograms, {})
+
+    def test_prometheus_text(self):
+        for _ in range(3):
+            self.client.get(reverse('course_list'))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE sms_request_queries histogram', text)
+        self.assertIn('sms_request_queries_count{view="course_list"} 3', text)
+        buckets = [
+            int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+            if line.startswith('sms_request_duration_seconds_bucket{view="course_list"')
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 3)
+
+    def test_histogram_buckets(self):
+        histogram = metrics.Histogram((1, 5))
+        for value in (0, 1, 2, 5, 9):
+            histogram.observe(value)
+        self.assertEqual((histogram.counts, histogram.total), ([2, 2, 1], 17))
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user('plain', password='password'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+
+class QueryPlanTests(SMSTestCase):
+    """
+    The plan guard, run over every benchmark plan as part of the suite.
+    """
+
+    def check(self, plans=None):
+        ctx = benchmarks.Context(self.user)
+        with override_settings(SMS_SOFT_DELETE=False):
+            return queryplan.check(self.client, Client(), ctx, plans or benchmarks.PLANS)
+
+    def test_no_unexpected_scans(self):
+        failures = [f"{f.label}: {f.issue} on {f.table} ({f.detail})" for f in self.check() if not f.allowed]
+        self.assertEqual(failures, [])
+
+    def test_suggestions_name_real_columns(self):
+        for sql in queryplan.suggestions(self.check()):
+            with self.subTest(sql=sql):
+                table, columns = sql.split(' ON "', 1)[1].split('" (')
+                existing = {column.name for column in connection.introspection.get_table_description(connection.cursor(), table)}
+                self.assertLessEqual(set(columns.rstrip(');').split(', ')), existing)
+
+    def test_aliases_are_scoped_per_subquery(self):
+        sql = (
+            'SELECT "student_student"."id" FROM "student_student" WHERE ("student_student"."id" IN '
+            '(SELECT U0."student_id" FROM "student_student_metadata" U0 WHERE U0."metadata_id" IN '
+            '(SELECT U0."id" FROM "student_metadata" U0 WHERE U0."key" = %s)) AND '
+            '"student_student"."id" IN (SELECT U0."id" FROM "student_student" U0 WHERE U0."deleted_at" > %s))'
+        )
+        self.assertEqual(len(queryplan.scopes(sql)), 4)
+        self.assertEqual(queryplan.filtered_columns(sql, ['a', 'b'], 'student_metadata'), (['key'], False))
+        self.assertEqual(queryplan.filtered_columns(sql, ['a', 'b'], 'student_student'), (['id', 'deleted_at'], False))
+        names = queryplan.PlanNames(sql, {})
+        self.assertEqual(names.table('U0', ' USING INDEX student_meta_key_value (key=?)'), 'student_metadata')
+
+    def test_rowid_is_not_an_index_column(self):
+        plans = [plan for plan in benchmarks.PLANS if plan[0] == 'enrollment_list?meta']
+        for finding in self.check(plans):
+            self.assertNotIn('rowid', finding.suggestion or '')
+
+    def test_flags_a_full_scan(self):
+        statement = queryplan.Statement('SELECT * FROM "student_enrollment" WHERE "student_enrollment"."score" > %s', [50])
+        findings = queryplan.analyze('adhoc', statement, queryplan.large_tables(), queryplan.advised_tables(), {})
+        self.assertEqual([(f.table, f.issue, f.allowed) for f in findings], [('student_enrollment', 'SCAN', None)])
+        self.assertIn('(score)', findings[0].suggestion)
+
+
+class SQLiteProfileTests(TestCase):
+
+    # Pragmas such as journal_mode and temp_store cannot change inside the
+    # test transaction.
+    @override_settings(SMS_SQLITE_PRAGMAS={'cache_size': -4096, 'busy_timeout': 1234})
+    def test_pragmas_apply_to_the_connection(self):
+        before = sqlite.current_pragmas(connection)
+        sqlite.apply_pragmas(connection=connection)
+        try:
+            self.assertEqual(sqlite.current_pragmas(connection), {'cache_size': -4096, 'busy_timeout': 1234})
+        finally:
+            with connection.cursor() as cursor:
+                for name, value in before.items():
+                    cursor.execute(f'PRAGMA {name} = {value}')
+
+    @override_settings(SMS_SQLITE_PRAGMAS={})
+    def test_development_profile_changes_nothing(self):
+        with CaptureQueriesContext(connection) as ctx:
+            sqlite.apply_pragmas(connection=connection)
+        self.assertEqual(ctx.captured_queries, [])
+
+
+# Declared like settings.py does with SMS_REPLICA_PATH, so the runner lets the
+# tests use the alias. Until a test points it at a file it is not fresh, and
+# every other test reads the primary.
+settings.DATABASES.setdefault(replica.REPLICA, dict(settings.DATABASES['default'], TEST={'MIRROR': 'default'}))
+
+
+class ReplicaTests(TransactionTestCase):
+    """
+    Which connection each read goes to. The backup API cannot copy a
+    database while a write transaction is open, hence committed test data.
+    """
+    databases = {'default', replica.REPLICA}
+
+    def setUp(self):
+        datagen.generate(students=20, courses=4, instructors=2, enrollments=40, metadata=6)
+        caches['default'].clear()
+        catalog._local.clear()
+        self.client.force_login(User.objects.create_superuser('staff', 'staff@example.com', 'password'))
+        # The runner made the alias a mirror of the test database; give it a
+        # file of its own, as in production.
+        replica_settings = settings.DATABASES[replica.REPLICA]
+        mirror_name = replica_settings['NAME']
+        self.path = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        replica_settings['NAME'] = self.path
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.path))
+        self.addCleanup(replica_settings.__setitem__, 'NAME', mirror_name)
+        self.addCleanup(connections[replica.REPLICA].close)
+        replica.refresh()
+        self.student = Student.objects.order_by('pk').first()
+        Student.objects.filter(pk=self.student.pk).update(first_name='Primary')
+
+    def reads(self, method, url, data=None):
+        """
+        The student-table queries sent to the primary and to the replica,
+        leaving out the user stamp the session cache reads from the primary.
+        """
+        with CaptureQueriesContext(connection) as primary, CaptureQueriesContext(connections[replica.REPLICA]) as copy:
+            response = getattr(self.client, method)(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+
+        def student_tables(queries):
+            return [q['sql'] for q in queries if q['sql'].startswith('SELECT') and '"student_' in q['sql'] and 'tablestamp' not in q['sql']]
+        return response, student_tables(primary.captured_queries), student_tables(copy.captured_queries)
+
+    def test_refresh_copies_the_primary(self):
+        with closing(sqlite3.connect(self.path)) as copy:
+            self.assertEqual(copy.execute('SELECT COUNT(*) FROM student_student').fetchone()[0], Student.objects.count())
+        self.assertTrue(replica.is_fresh())
+
+    def test_listed_views_read_the_replica(self):
+        urls = [
+            reverse('student_list'), reverse('instructor_list'), reverse('api_list', args=['students']),
+            reverse('enrollment_list', args=[self.student.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                _, primary, copy = self.reads('get', url)
+                self.assertTrue(copy)
+                self.assertFalse([sql for sql in primary if 'student_course' not in sql])
+
+    def test_lists_show_the_replica_copy(self):
+        response, _, _ = self.reads('get', reverse('student_list'))
+        self.assertContains(response, self.student.first_name)
+        self.assertNotContains(response, 'Primary')
+
+    def test_other_views_read_the_primary(self):
+        _, primary, copy = self.reads('get', reverse('edit_student', args=[self.student.pk]))
+        self.assertTrue(primary)
+        self.assertEqual(copy, [])
+
+    def test_writes_pin_the_browser_to_the_primary(self):
+        student = Student.objects.get(pk=Student.objects.exclude(pk=self.student.pk).values('pk')[:1])
+        response, _, _ = self.reads('post', reverse('edit_student', args=[student.pk]), {
+            'first_name': student.first_name, 'last_name': student.last_name, 'email': student.email, 'dob': student.dob, 'metadata': '',
+        })
+        self.assertIn(replica.STICKY_COOKIE, response.cookies)
+        response, primary, copy = self.reads('get', reverse('student_list'))
+        self.assertTrue(primary)
+        self.assertEqual(copy, [])
+        self.assertContains(response, 'Primary')
+
+    def test_stale_replica_is_skipped(self):
+        stale = time.time() - settings.SMS_REPLICA_MAX_LAG - 1
+        os.utime(self.path, (stale, stale))
+        _, primary, copy = self.reads('get', reverse('student_list'))
+        self.assertTrue(primary)
+        self.assertEqual(copy, [])
+
+    def test_streamed_exports_read_the_replica_to_the_end(self):
+        _, primary, copy = self.reads('get', reverse('export_data', args=['students']))
+        self.assertEqual(primary, [])
+        self.assertTrue([sql for sql in copy if 'FROM "student_student"' in sql])
+
+    def test_primary_block(self):
+        state = replica.RoutingState()
+        state.replica = True
+        token = replica._state.set(state)
+        try:
+            self.assertEqual(Student.objects.all().db, replica.REPLICA)
+            with replica.primary():
+                self.assertEqual(Student.objects.all().db, 'default')
+            self.assertEqual(Student.objects.all().db, replica.REPLICA)
+        finally:
+            replica._state.reset(token)
+
+
+class CatalogTests(SMSTestCase):
+
+    def names(self, **params):
+        return [course.name for course in self.client.get(reverse('course_list'), params).context['page']]
+
+    def test_save_invalidates(self):
+        course = Course.objects.order_by('pk').first()
+        self.assertIn(course.name, self.names())
+        course.name = 'Renamed Course'
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+        self.assertIn('Renamed Course', self.names())
+
+    def test_second_request_is_cached(self):
+        self.names()
+        with CaptureQueriesContext(connection) as ctx:
+            self.names()
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "student_course"' in q['sql']])
+
+    def test_delete_invalidates(self):
+        course = Course.objects.order_by('pk').first()
+        self.names()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete_course', args=[course.pk]))
+        self.assertNotIn(course.name, self.names())
+
+    def test_bulk_writes_invalidate(self):
+        course = Course.objects.order_by('pk').first()
+        self.names()
+        Course.objects.filter(pk=course.pk).update(name='Bulk Renamed')
+        catalog.bump()
+        self.assertIn('Bulk Renamed', self.names())
+
+    @override_settings(SMS_CATALOG_LOCAL_TIMEOUT=7)
+    def test_per_process_cache_expires_quickly(self):
+        self.assertFalse(catalog.is_shared())
+        self.assertEqual(catalog._timeout(), 7)
+
+
+class ConditionalGetTests(SMSTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # The ETag covers the CSRF secret, which the first response sets.
+        self.client.get(reverse('student_list'))
+
+    def test_not_modified_until_a_write(self):
+        url = reverse('student_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        student = Student.objects.first()
+        student.first_name = 'Changed'
+        student.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        url = reverse('student_list')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_unrelated_writes_keep_the_etag(self):
+        url = reverse('student_list')
+        etag = self.client.get(url)['ETag']
+        Instructor.objects.create(first_name='I', last_name='N', email='in@example.com')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_bulk_writes_bump_the_stamp(self):
+        url = reverse('student_list')
+        etag = self.client.get(url)['ETag']
+        Student.objects.update(first_name='Bulk')
+        stamps.touch(stamps.STUDENT)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_is_per_user(self):
+        url = reverse('course_list')
+        etag = self.client.get(url)['ETag']
+        other = User.objects.create_user('other', password='password')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_stamps_touch_creates_missing_rows(self):
+        stamps.TableStamp.objects.filter(name=stamps.STUDENT).delete()
+        stamps.touch(stamps.STUDENT)
+        self.assertEqual(stamps.read([stamps.STUDENT])[stamps.STUDENT][0], 1)
+
+
+class TypeaheadTests(SMSTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.by_code = Course.objects.create(name='Zoology', course_code='BIOX101')
+            self.by_name = Course.objects.create(name='Biox Lab', course_code='ZZ900')
+            self.by_word = Course.objects.create(name='Intro to Biox', course_code='ZZ901')
+
+    def suggest(self, **params):
+        return self.client.get(reverse('course_typeahead'), params).json()['courses']
+
+    def test_code_then_name_then_word(self):
+        ids = [course['id'] for course in self.suggest(q='biox')]
+        self.assertEqual(ids, [self.by_code.pk, self.by_name.pk, self.by_word.pk])
+
+    def test_limit(self):
+        self.assertEqual(len(self.suggest(q='biox', limit=1)), 1)
+        self.assertEqual(len(self.suggest(q='biox', limit='many')), 3)
+
+    def test_empty_query(self):
+        self.assertEqual(self.suggest(q=' '), [])
+
+    def test_delete_invalidates(self):
+        self.suggest(q='biox')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete_course', args=[self.by_code.pk]))
+        self.assertNotIn(self.by_code.pk, [course['id'] for course in self.suggest(q='biox')])
+
+    def test_selected_courses(self):
+        courses, unknown = catalog.selected_courses([str(self.by_name.pk), 'x', '999999', self.by_code.pk])
+        self.assertEqual(courses, [self.by_name, self.by_code])
+        self.assertEqual(unknown, ['x', '999999'])
+
+
+class BulkEnrollTests(SMSTestCase):
+
+    def test_enroll_counts_new_and_existing(self):
+        course = Course.objects.first()
+        students = list(Student.objects.values_list('pk', flat=True))
+        already = course.enrollments.count()
+        result = enrolling.enroll(course, students + students[:3], batch_size=7)
+        self.assertEqual((result.created, result.existing), (len(students) - already, already))
+        self.assertEqual(course.enrollments.count(), len(students))
+        self.assertConsistent()
+
+    def test_parse_references(self):
+        ids, emails, invalid = enrolling.parse_references('id,email\n1, "a@example.com"\n2;bogus\n')
+        self.assertEqual((ids, emails, invalid), ([1, 2], ['a@example.com'], ['bogus']))
+
+    def test_resolve_students(self):
+        student = Student.objects.first()
+        found, unknown = enrolling.resolve_students([student.pk, 999999], [student.email, 'nobody@example.com'])
+        self.assertEqual(found, [student.pk])
+        self.assertEqual(unknown, ['999999', 'nobody@example.com'])
+
+    def test_view(self):
+        course = Course.objects.first()
+        student = Student.objects.exclude(enrollments__course=course).first()
+        response = self.client.post(reverse('bulk_enroll'), {
+            'course': course.pk, 'students': f"{student.pk}\nnobody@example.com",
+        })
+        self.assertRedirects(response, f"{reverse('bulk_enroll')}?course={course.pk}", fetch_redirect_response=False)
+        self.assertTrue(course.enrollments.filter(student=student).exists())
+        self.assertConsistent()
+
+    def test_view_with_upload(self):
+        course = Course.objects.first()
+        student = Student.objects.exclude(enrollments__course=course).first()
+        upload = SimpleUploadedFile('cohort.csv', f"email\n{student.email}\n".encode())
+        self.client.post(reverse('bulk_enroll'), {'course': course.pk, 'file': upload})
+        self.assertTrue(course.enrollments.filter(student=student).exists())
+
+    def test_view_requires_a_course(self):
+        response = self.client.post(reverse('bulk_enroll'), {'students': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'A course is required.')
+
+
+class GradebookTests(SMSTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.course = Enrollment.objects.values_list('course_id', flat=True).first()
+        self.enrollments = list(Enrollment.objects.filter(course_id=self.course).order_by('pk'))
+        self.url = reverse('course_gradebook', args=[self.course])
+
+    def test_roster_is_one_query(self):
+        with self.assertNumQueries(1):
+            enrollments = gradebook.roster(self.course)
+            [e.student.last_name for e in enrollments]
+        self.assertEqual(len(enrollments), len(self.enrollments))
+
+    def test_save_scores(self):
+        data = {f"score_{e.pk}": str(i * 7 % 101) for i, e in enumerate(self.enrollments)}
+        data[f"score_{self.enrollments[0].pk}"] = ''
+        response = self.client.post(self.url, data)
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertIsNone(Enrollment.objects.get(pk=self.enrollments[0].pk).score)
+        self.assertEqual(Enrollment.objects.get(pk=self.enrollments[-1].pk).score, (len(self.enrollments) - 1) * 7 % 101)
+        self.assertConsistent()
+
+    def test_scores_json(self):
+        enrollment = self.enrollments[0]
+        self.client.post(self.url, {'scores': json.dumps({str(enrollment.pk): '42.5', 'x': '1'})})
+        self.assertEqual(Enrollment.objects.get(pk=enrollment.pk).score, Decimal('42.5'))
+        self.assertConsistent()
+
+    def test_unreadable_scores_json(self):
+        before = Enrollment.objects.get(pk=self.enrollments[0].pk).score
+        response = self.client.post(self.url, {'scores': '[1, 2]'})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(Enrollment.objects.get(pk=self.enrollments[0].pk).score, before)
+
+    def test_one_bad_score_saves_nothing(self):
+        first, second = self.enrollments[:2]
+        response = self.client.post(self.url, {f"score_{first.pk}": '101', f"score_{second.pk}": '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Enrollment.objects.get(pk=first.pk).score, first.score)
+        self.assertEqual(Enrollment.objects.get(pk=second.pk).score, second.score)
+        self.assertConsistent()
+
+    def test_unchanged_scores_write_nothing(self):
+        data = {f"score_{e.pk}": '' if e.score is None else str(e.score) for e in self.enrollments}
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(self.url, data)
+        self.assertEqual([sql for sql in _writes(ctx.captured_queries) if 'student_' in sql], [])
+
+
+class MetadataFilterTests(SMSTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.physics, self.physiology, self.history = Student.objects.order_by('pk')[:3]
+        metadata.set_metadata(self.physics, 'program:physics, gpa:3.9, enrolled:2021-09-01')
+        metadata.set_metadata(self.physiology, 'program:physiology, gpa:10.5, enrolled:2023-09-01')
+        metadata.set_metadata(self.history, 'program:history, gpa:3.1')
+        self.ours = [self.physics.pk, self.physiology.pk, self.history.pk]
+
+    def matching(self, *conditions):
+        filters = metadata.parse_conditions(conditions)
+        return set(metadata.filter_queryset(Student.objects.filter(pk__in=self.ours), filters).values_list('pk', flat=True))
+
+    def test_parse_conditions(self):
+        filters = metadata.parse_conditions(['meta.gpa__gte=3.5', 'program=phys*', 'meta.x__bogus=1'])
+        self.assertEqual(
+            [(f.key, f.lookup, f.value) for f in filters],
+            [('gpa', 'gte', '3.5'), ('program', 'prefix', 'phys'), ('x__bogus', 'exact', '1')],
+        )
+
+    def test_exact_and_prefix(self):
+        self.assertEqual(self.matching('program=history'), {self.history.pk})
+        self.assertEqual(self.matching('program=phys*'), {self.physics.pk, self.physiology.pk})
+
+    def test_ranges_compare_typed_values(self):
+        # As text, '10.5' < '3.5'.
+        self.assertEqual(self.matching('gpa__gte=3.5'), {self.physics.pk, self.physiology.pk})
+        self.assertEqual(self.matching('enrolled__lt=2022-01-01'), {self.physics.pk})
+
+    def test_conditions_are_anded(self):
+        self.assertEqual(self.matching('program=phys*', 'gpa__lt=5'), {self.physics.pk})
+
+    def test_list_page(self):
+        response = self.client.get(reverse('student_list'), {'meta.program': 'phys*', 'meta.gpa__gte': '5'})
+        self.assertEqual([s.pk for s in response.context['page']], [self.physiology.pk])
+
+    def test_export_command(self):
+        out = StringIO()
+        with redirect_stdout(out):
+            call_command('export_sms', 'students', '--format', 'jsonl', '--meta', 'meta.program=phys*')
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual({row['id'] for row in rows}, {self.physics.pk, self.physiology.pk})
+
+
+class CompactionTests(SMSTestCase):
+
+    def setUp(self):
+        super().setUp()
+        students = list(Student.objects.order_by('pk')[:3])
+        duplicates = Metadata.objects.bulk_create([Metadata(key='dup', value='same') for _ in range(5)])
+        for student, meta in zip(students, duplicates):
+            student.metadata.add(meta)
+        # The first student is linked to two copies of the same pair.
+        students[0].metadata.add(duplicates[3])
+        self.students = students
+        Metadata.objects.bulk_create([Metadata(key='orphan', value=str(i)) for i in range(4)])
+
+    def run_compaction(self, **kwargs):
+        return compaction.compact(min_age=timedelta(0), **kwargs)
+
+    def test_merges_duplicates_and_deletes_orphans(self):
+        report = self.run_compaction()
+        self.assertTrue(report.finished)
+        self.assertEqual(Metadata.objects.filter(key='dup').count(), 1)
+        self.assertFalse(Metadata.objects.filter(key='orphan').exists())
+        for student in self.students:
+            self.assertEqual([(m.key, m.value) for m in student.metadata.filter(key='dup')], [('dup', 'same')])
+
+    def test_resumes_from_the_checkpoint(self):
+        first = self.run_compaction(batch_size=1, scan_size=2, max_batches=1)
+        self.assertFalse(first.finished)
+        position = compaction.load_checkpoint().position
+        self.assertNotEqual(position.get('phase'), compaction.DONE)
+        rest = self.run_compaction(batch_size=1, scan_size=2)
+        self.assertTrue(rest.finished)
+        self.assertEqual(Metadata.objects.filter(key='dup').count(), 1)
+        self.assertEqual(Metadata.objects.filter(key='dup').get().students.count(), 3)
+        # A finished run starts over next time and finds nothing to do.
+        again = self.run_compaction()
+        self.assertEqual(again.rows_deleted, 0)
+
+    def test_young_orphans_are_kept(self):
+        compaction.compact(min_age=timedelta(hours=1))
+        self.assertEqual(Metadata.objects.filter(key='orphan').count(), 4)
+
+    def test_command(self):
+        call_command('compact_metadata', '--min-age', '0', '--dry-run', stdout=StringIO())
+        self.assertEqual(Metadata.objects.filter(key='dup').count(), 5)
+        out = StringIO()
+        call_command('compact_metadata', '--min-age', '0', stdout=out)
+        self.assertIn('Compaction finished.', out.getvalue())
+        self.assertEqual(Metadata.objects.filter(key='dup').count(), 1)
+
+
+class DeleteTests(SMSTestCase):
+
+    def test_hard_delete(self):
+        student = Enrollment.objects.values_list('student_id', flat=True).first()
+        course = Enrollment.objects.values_list('course_id', flat=True).last()
+        self.client.post(reverse('delete_student', args=[student]))
+        self.client.post(reverse('delete_course', args=[course]))
+        self.assertFalse(Student.all_objects.filter(pk=student).exists())
+        self.assertFalse(Enrollment.all_objects.filter(course_id=course).exists())
+        self.assertConsistent()
+
+    def test_no_soft_delete_filters_by_default(self):
+        for model in (Student, Course, Enrollment):
+            self.assertFalse(model.objects.all().query.where)
+        student = Student.objects.first()
+        # Only the email check of validate_unique itself.
+        with self.assertNumQueries(1):
+            student.validate_unique()
+
+    @override_settings(SMS_SOFT_DELETE=True)
+    def test_soft_delete_filters(self):
+        for model in (Student, Course, Enrollment):
+            self.assertTrue(model.objects.all().query.where)
+
+    @override_settings(SMS_SOFT_DELETE=True)
+    def test_soft_delete_and_purge(self):
+        enrollment = Enrollment.objects.exclude(score=None).first()
+        student, course = enrollment.student, enrollment.course
+        self.client.post(reverse('delete_student', args=[student.pk]))
+        self.assertTrue(Student.all_objects.filter(pk=student.pk).exists())
+        self.assertFalse(Student.objects.filter(pk=student.pk).exists())
+        self.assertFalse(Enrollment.objects.filter(student=student).exists())
+        self.assertConsistent()
+        # A hard delete of the other owner must not count the hidden rows twice.
+        purging.purge(Course, course.pk)
+        self.assertConsistent()
+        purging.purge_pending()
+        self.assertFalse(Student.all_objects.filter(pk=student.pk).exists())
+        self.assertConsistent()
+
+    @override_settings(SMS_SOFT_DELETE=True)
+    def test_soft_deleted_course_leaves_gradebooks_and_summaries(self):
+        course = Enrollment.objects.values_list('course_id', flat=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete_course', args=[course]))
+        self.assertEqual(self.client.get(reverse('course_gradebook', args=[course])).status_code, 404)
+        self.assertFalse(Enrollment.objects.filter(course_id=course).exists())
+        self.assertConsistent()
+
+    @override_settings(SMS_SOFT_DELETE=True)
+    def test_soft_deleted_values_stay_taken(self):
+        student = Student.objects.first()
+        purging.delete(student)
+        response = self.client.post(reverse('add_student'), {
+            'first_name': 'New', 'last_name': 'Student', 'email': student.email, 'dob': '2001-01-01', 'metadata': '',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'already exists')
+        with self.assertRaises(ValidationError):
+            Student(first_name='New', last_name='Student', email=student.email, dob='2001-01-01').full_clean()
+        purging.purge_pending()
+        Student(first_name='New', last_name='Student', email=student.email, dob='2001-01-01').full_clean()
+
+
+class ArchiveTests(SMSTestCase):
+    """
+    Archiving moves enrollments to an attached SQLite file.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.archive_dir = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(SMS_ARCHIVE_PATH=os.path.join(cls.archive_dir, 'archive.sqlite3')))
+        # ATTACH is not allowed inside the transaction each test class runs in.
+        connection.ensure_connection()
+        if not archiving.is_attached(connection):
+            archiving.attach(connection=connection)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DETACH DATABASE {archiving.SCHEMA}')
+        shutil.rmtree(cls.archive_dir, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        self.course = Course.objects.get(pk=Enrollment.objects.values_list('course_id', flat=True).first())
+        metadata.set_metadata(self.course, 'term:2021-fall')
+
+    def closed_term(self):
+        return archiving.candidates(course_filters=metadata.parse_conditions(['meta.term=2021-fall']))
+
+    def test_archive_and_purge(self):
+        enrollments = self.closed_term()
+        expected = enrollments.count()
+        self.assertEqual(archiving.archive(enrollments, batch_size=3), expected)
+        self.assertFalse(Enrollment.objects.filter(course=self.course).exists())
+        self.assertEqual(archiving.ArchivedEnrollment.objects.filter(course=self.course).count(), expected)
+        self.assertConsistent()
+        purging.purge(Course, self.course.pk)
+        self.assertFalse(archiving.ArchivedEnrollment.objects.filter(course=self.course).exists())
+        self.assertConsistent()
+
+    def test_keeps_scores_and_metadata(self):
+        enrollment = Enrollment.objects.filter(course=self.course).first()
+        metadata.set_metadata(enrollment, 'grade:A')
+        archiving.archive(self.closed_term())
+        archived = archiving.ArchivedEnrollment.objects.get(pk=enrollment.pk)
+        self.assertEqual((archived.student_id, archived.score, archived.metadata), (enrollment.student_id, enrollment.score, 'grade:A'))
+
+    def test_enrollment_list_shows_archived_rows_on_request(self):
+        student = Enrollment.objects.filter(course=self.course).first().student
+        archiving.archive(self.closed_term())
+        url = reverse('enrollment_list', args=[student.pk])
+        self.assertIsNone(self.client.get(url).context['archived'])
+        archived = self.client.get(url, {'archived': '1'}).context['archived']
+        self.assertIn(self.course.pk, [enrollment.course_id for enrollment in archived])
+
+    def test_command(self):
+        expected = self.closed_term().count()
+        out = StringIO()
+        call_command('archive_enrollments', '--course', 'meta.term=2021-fall', '--dry-run', stdout=out)
+        self.assertIn(f"{expected} enrollment(s) would be archived.", out.getvalue())
+        call_command('archive_enrollments', '--course', 'meta.term=2021-fall', '--batch-size', '2', stdout=StringIO())
+        self.assertFalse(self.closed_term().exists())
+        self.assertConsistent()
+        with self.assertRaises(CommandError):
+            call_command('archive_enrollments', stdout=StringIO())
+
+
+class SessionCacheTests(SMSTestCase):
+
+    def user_queries(self):
+        """The ``auth_user`` queries of one signed-in request, and its response."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('course_typeahead'), {'q': 'x'})
+        return response, [q['sql'] for q in ctx.captured_queries if '"auth_user"' in q['sql']]
+
+    def test_warm_request_does_not_load_the_user(self):
+        self.assertTrue(self.user_queries()[1])
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_user_save_reloads(self):
+        self.user_queries()
+        self.user.first_name = 'Changed'
+        self.user.save()
+        self.assertTrue(self.user_queries()[1])
+
+    def test_password_change_ends_the_session(self):
+        self.user_queries()
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(self.user_queries()[0].status_code, 302)
+
+    def test_per_process_cache_checks_the_user_stamp(self):
+        self.assertFalse(sessions.is_shared())
+        self.user_queries()
+        # Another worker deactivated the user: its forget_user never reached
+        # this cache, but the stamp it bumped did.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        stamps.touch(stamps.USER)
+        self.assertEqual(self.user_queries()[0].status_code, 302)
+
+    def test_logout_forgets_the_user(self):
+        self.user_queries()
+        self.client.get(reverse('signout'))
+        self.assertIsNone(caches[settings.SMS_AUTH_CACHE].get(sessions._key(self.user.pk)))
+        self.assertEqual(self.user_queries()[0].status_code, 302)
+
+    @override_settings(SMS_AUTH_CACHE_TIMEOUT=0)
+    def test_timeout_zero_turns_the_cache_off(self):
+        self.user_queries()
+        self.assertTrue(self.user_queries()[1])
+
+    def test_clear_expired(self):
+        Session.objects.all().delete()
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f"old{i}", session_data='', expire_date=now - timedelta(days=1)) for i in range(5)]
+            + [Session(session_key='live', session_data='', expire_date=now + timedelta(days=1))]
+        )
+        self.assertEqual(sessions.clear_expired(batch_size=2), 5)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
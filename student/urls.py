@@ -1,31 +1,44 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, metrics, views
 from django.contrib.auth import views as auth_views
 
+# Read-heavy views have async twins for ASGI deployments.
+read_views = async_views if settings.SMS_ASYNC_VIEWS else views
+
 urlpatterns = [
     path('', views.index, name='index'),
-    path('dashboard/', views.dashboard, name='dashboard'),
-    path('student/', views.student_list, name='student_list'),
+    path('dashboard/', read_views.dashboard, name='dashboard'),
+    path('student/', read_views.student_list, name='student_list'),
     path('add-student/', views.add_students, name='add_student'),
     path('edit-student/<int:pk>/', views.edit_student, name='edit_student'),
     path('delete-student/<int:pk>/', views.delete_student, name='delete_student'),
 
-    path('course/', views.course_list, name='course_list'),
+    path('course/', read_views.course_list, name='course_list'),
     path('add-course/', views.add_course, name='add_course'),
     path('edit-course/<int:pk>/', views.edit_course, name='edit_course'),
     path('delete-course/<int:pk>/', views.delete_course, name='delete_course'),
+    path('course/analytics/', views.course_analytics, name='course_analytics'),
+    path('course/analytics.json', views.course_analytics_json, name='course_analytics_json'),
+    path('course/typeahead.json', views.course_typeahead, name='course_typeahead'),
+    path('course/<int:pk>/gradebook/', views.course_gradebook, name='course_gradebook'),
 
-    path('instructor/', views.instructor_list, name='instructor_list'),
+    path('instructor/', read_views.instructor_list, name='instructor_list'),
     path('add-instructor/', views.add_instructor, name='add_instructor'),
     path('edit-instructor/<int:pk>/', views.edit_instructor, name='edit_instructor'),
     path('delete-instructor/<int:pk>/', views.delete_instructor, name='delete_instructor'),
 
 
-    path('student/<int:student_pk>/enrollment/', views.enrollment_list, name='enrollment_list'),
+    path('student/<int:student_pk>/enrollment/', read_views.enrollment_list, name='enrollment_list'),
     path('student/<int:student_pk>/add-enrollment/', views.add_enrollment, name='add_enrollment'),
     path('student/<int:student_pk>/edit-enrollment/<int:pk>/', views.edit_enrollment, name='edit_enrollment'),
     path('student/<int:student_pk>/delete-enrollment/<int:pk>/', views.delete_enrollment, name='delete_enrollment'),
+    path('enrollment/bulk/', views.bulk_enroll, name='bulk_enroll'),
     
+    path('export/<str:kind>/', views.export_data, name='export_data'),
+    path('api/<str:resource>/', api.resource_list, name='api_list'),
+    path('metrics/', metrics.metrics_view, name='metrics'),
+
     path('register/', views.register, name='register'),
     path('login/', views.sign_in, name='signin'),
     path('signout/', views.sign_out, name='signout'),
@@ -1,10 +1,16 @@
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
 from django.db.models import Q
 from django.contrib import messages
+from django.urls import reverse
+from django.views.decorators.gzip import gzip_page
 from .models import *
+from . import analytics, archiving, catalog, counters, enrolling, exporting, gradebook, metadata, purging, search, stamps
+from .metadata import format_metadata, set_metadata
+from .pagination import PAGE_SIZE_CHOICES, paginate_by_cursor
 from django.contrib.auth.models import User
 
 
@@ -15,22 +21,25 @@ def index(request):
 @login_required
 def dashboard(request):
     """
-    Renders the dashboard with dynamic counts of students, courses, and instructors.
+    Renders the dashboard from the precomputed counters of students, courses,
+    instructors and enrollments.
     """
-    total_students = Student.objects.count()
-    total_courses = Course.objects.count()
-    total_instructors = Instructor.objects.count()
+    totals = counters.snapshot()
 
     context = {
-        'total_students': total_students,
-        'total_courses': total_courses,
-        'total_instructors': total_instructors,
+        'total_students': totals[counters.STUDENTS],
+        'total_courses': totals[counters.COURSES],
+        'total_instructors': totals[counters.INSTRUCTORS],
+        'total_enrollments': totals[counters.ENROLLMENTS],
+        'average_score': totals['average_score'],
     }
 
     return render(request, 'core/dashboard.html',context)
 
 
 @login_required
+@gzip_page
+@stamps.conditional(stamps.STUDENT, stamps.METADATA)
 def student_list(request):
     """
     Displays a list of all students with search and metadata filtering.
@@ -38,13 +47,15 @@ def student_list(request):
     students = Student.objects.all()
     query = request.GET.get('q')
     if query:
-        students = students.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query)
-        ).distinct()
-
-    return render(request, 'student_app/list_students.html', {'students': students, 'query': query})
+        students = search.filter_queryset(students, search.STUDENT, query)
+    meta_filters = metadata.parse_filters(request.GET)
+    if meta_filters:
+        students = metadata.filter_queryset(students, meta_filters)
+
+    page = paginate_by_cursor(request, students)
+    return render(request, 'student_app/list_students.html', {
+        'students': page, 'page': page, 'page_size_choices': PAGE_SIZE_CHOICES, 'query': query, 'meta_filters': meta_filters
+    })
 
 
 @login_required
@@ -54,7 +65,7 @@ def add_students(request):
     """
     if request.method == 'POST':
         email = request.POST.get('email')
-        if Student.objects.filter(email=email).exists():
+        if Student.all_objects.filter(email=email).exists():
             messages.error(request, "A student with this email already exists.")
             return render(request, "student_app/add_student.html", {'form_data': request.POST})
 
@@ -70,15 +81,7 @@ def add_students(request):
             student.save()
 
             metadata_str = request.POST.get('metadata', '')
-            if metadata_str:
-                pairs = [pair.strip() for pair in metadata_str.split(',')]
-                for pair in pairs:
-                    if ':' in pair:
-                        key, value = pair.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        meta, created = Metadata.objects.get_or_create(key=key, value=value)
-                        student.metadata.add(meta)
+            set_metadata(student, metadata_str)
             
             messages.success(request, f"Student {student.first_name} added successfully.")
             return redirect("student_list")
@@ -103,9 +106,9 @@ def edit_student(request, pk):
     
     if request.method == 'POST':
         new_email = request.POST.get('email')
-        if Student.objects.exclude(pk=pk).filter(email=new_email).exists():
+        if Student.all_objects.exclude(pk=pk).filter(email=new_email).exists():
             messages.error(request, 'A student with this email already exists.')
-            return render(request, 'student_app/edit_student.html', {'student': student})
+            return render(request, 'student_app/edit_student.html', {'student': student, 'metadata_str': request.POST.get('metadata', '')})
         
         student.first_name = request.POST.get('first_name')
         student.last_name = request.POST.get('last_name')
@@ -115,28 +118,29 @@ def edit_student(request, pk):
         try:
             student.full_clean()
             student.save()
+            set_metadata(student, request.POST.get('metadata', ''))
             messages.success(request, 'Student information has been updated successfully!')
             return redirect('student_list')
         except ValidationError as e:
             for field, errors in e.message_dict.items():
                 for error in errors:
                     messages.error(request, f"{field.replace('_', ' ').capitalize()}: {error}")
-            return render(request, 'student_app/edit_student.html', {'student': student})
+            return render(request, 'student_app/edit_student.html', {'student': student, 'metadata_str': request.POST.get('metadata', '')})
         except Exception as e:
             messages.error(request, f'An unexpected error occurred: {e}')
-            return render(request, 'student_app/edit_student.html', {'student': student})
+            return render(request, 'student_app/edit_student.html', {'student': student, 'metadata_str': request.POST.get('metadata', '')})
     
-    return render(request, 'student_app/edit_student.html', {'student': student})
+    return render(request, 'student_app/edit_student.html', {'student': student, 'metadata_str': format_metadata(student)})
 
 
 @login_required
 def delete_student(request, pk):
     """
-    Deletes a student.
+    Deletes a student and their enrollments (see ``purging.delete``).
     """
     student = get_object_or_404(Student, pk=pk)
     if request.method == 'POST':
-        student.delete()
+        purging.delete(student)
         messages.success(request, 'Student has been deleted successfully.')
     return redirect('student_list')
 
@@ -144,6 +148,8 @@ def delete_student(request, pk):
 # --- Instructor Views ---
 
 @login_required
+@gzip_page
+@stamps.conditional(stamps.INSTRUCTOR, stamps.COURSE, stamps.METADATA)
 def instructor_list(request):
     """
     Displays a list of all instructors with search functionality.
@@ -152,14 +158,15 @@ def instructor_list(request):
     query = request.GET.get('q')
 
     if query:
-        instructors = instructors.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query) |
-            Q(courses__name__icontains=query)
-        ).distinct()
-
-    return render(request, 'instructor_app/list_instructor.html', {'instructors': instructors, 'query': query})
+        instructors = search.filter_queryset(instructors, search.INSTRUCTOR, query)
+    meta_filters = metadata.parse_filters(request.GET)
+    if meta_filters:
+        instructors = metadata.filter_queryset(instructors, meta_filters)
+
+    page = paginate_by_cursor(request, instructors)
+    return render(request, 'instructor_app/list_instructor.html', {
+        'instructors': page, 'page': page, 'page_size_choices': PAGE_SIZE_CHOICES, 'query': query, 'meta_filters': meta_filters
+    })
 
 
 @login_required
@@ -167,12 +174,17 @@ def add_instructor(request):
     """
     Handles adding a new instructor.
     """
-    courses = Course.objects.all()
     if request.method == 'POST':
+        selected, unknown = catalog.selected_courses(request.POST.getlist('courses'))
+        context = {'form_data': request.POST, 'selected_courses': selected}
+        if unknown:
+            messages.error(request, f"Courses: Unknown course id(s): {', '.join(unknown)}")
+            return render(request, 'instructor_app/add_instructor.html', context)
+
         email = request.POST.get('email')
         if Instructor.objects.filter(email=email).exists():
             messages.error(request, "An instructor with this email already exists.")
-            return render(request, 'instructor_app/add_instructor.html', {'form_data': request.POST, 'courses': courses})
+            return render(request, 'instructor_app/add_instructor.html', context)
 
         instructor = Instructor(
             first_name=request.POST.get('first_name'),
@@ -184,19 +196,10 @@ def add_instructor(request):
             instructor.full_clean()
             instructor.save()
 
-            courses_list = request.POST.getlist('courses')
             metadata_str = request.POST.get('metadata', '')
-            instructor.courses.set(courses_list)
+            instructor.courses.set(selected)
             
-            if metadata_str:
-                pairs = [pair.strip() for pair in metadata_str.split(',')]
-                for pair in pairs:
-                    if ':' in pair:
-                        key, value = pair.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        meta, created = Metadata.objects.get_or_create(key=key, value=value)
-                        instructor.metadata.add(meta)
+            set_metadata(instructor, metadata_str)
             
             messages.success(request, f"Instructor {instructor.first_name} added successfully.")
             return redirect('instructor_list')
@@ -204,12 +207,12 @@ def add_instructor(request):
             for field, errors in e.message_dict.items():
                 for error in errors:
                     messages.error(request, f"{field.replace('_', ' ').capitalize()}: {error}")
-            return render(request, 'instructor_app/add_instructor.html', {'form_data': request.POST, 'courses': courses})
+            return render(request, 'instructor_app/add_instructor.html', context)
         except Exception as e:
             messages.error(request, f"An unexpected error occurred: {e}")
-            return render(request, 'instructor_app/add_instructor.html', {'form_data': request.POST, 'courses': courses})
+            return render(request, 'instructor_app/add_instructor.html', context)
     
-    return render(request, 'instructor_app/add_instructor.html', {'courses': courses})
+    return render(request, 'instructor_app/add_instructor.html')
 
 
 @login_required
@@ -218,13 +221,18 @@ def edit_instructor(request, pk):
     Handles editing an existing instructor.
     """
     instructor = get_object_or_404(Instructor, pk=pk)
-    courses = Course.objects.all()
     
     if request.method == 'POST':
+        selected, unknown = catalog.selected_courses(request.POST.getlist('courses'))
+        context = {'instructor': instructor, 'selected_courses': selected, 'metadata_str': request.POST.get('metadata', '')}
+        if unknown:
+            messages.error(request, f"Courses: Unknown course id(s): {', '.join(unknown)}")
+            return render(request, 'instructor_app/edit_instructor.html', context)
+
         new_email = request.POST.get('email')
         if Instructor.objects.exclude(pk=pk).filter(email=new_email).exists():
             messages.error(request, "An instructor with this email already exists.")
-            return render(request, 'instructor_app/edit_instructor.html', {'instructor': instructor, 'courses': courses})
+            return render(request, 'instructor_app/edit_instructor.html', context)
 
         instructor.first_name = request.POST.get('first_name')
         instructor.last_name = request.POST.get('last_name')
@@ -234,20 +242,10 @@ def edit_instructor(request, pk):
             instructor.full_clean()
             instructor.save()
             
-            courses_list = request.POST.getlist('courses')
-            instructor.courses.set(courses_list)
+            instructor.courses.set(selected)
             
             metadata_str = request.POST.get('metadata', '')
-            instructor.metadata.clear()
-            if metadata_str:
-                pairs = [pair.strip() for pair in metadata_str.split(',')]
-                for pair in pairs:
-                    if ':' in pair:
-                        key, value = pair.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        meta, created = Metadata.objects.get_or_create(key=key, value=value)
-                        instructor.metadata.add(meta)
+            set_metadata(instructor, metadata_str)
 
             messages.success(request, 'Instructor information has been updated successfully!')
             return redirect('instructor_list')
@@ -255,12 +253,13 @@ def edit_instructor(request, pk):
             for field, errors in e.message_dict.items():
                 for error in errors:
                     messages.error(request, f"{field.replace('_', ' ').capitalize()}: {error}")
-            return render(request, 'instructor_app/edit_instructor.html', {'instructor': instructor, 'courses': courses})
+            return render(request, 'instructor_app/edit_instructor.html', context)
         except Exception as e:
             messages.error(request, f'An unexpected error occurred: {e}')
-            return render(request, 'instructor_app/edit_instructor.html', {'instructor': instructor, 'courses': courses})
+            return render(request, 'instructor_app/edit_instructor.html', context)
     
-    return render(request, 'instructor_app/edit_instructor.html', {'instructor': instructor, 'courses': courses})
+    selected = instructor.courses.only('pk', 'name', 'course_code')
+    return render(request, 'instructor_app/edit_instructor.html', {'instructor': instructor, 'selected_courses': selected, 'metadata_str': format_metadata(instructor)})
 
 
 @login_required
@@ -278,20 +277,18 @@ def delete_instructor(request, pk):
 # --- Course Views ---
 
 @login_required
+@gzip_page
+@stamps.conditional(stamps.COURSE, stamps.METADATA)
 def course_list(request):
     """
     Displays a list of all courses with search functionality.
     """
-    courses = Course.objects.all()
     query = request.GET.get('q')
-
-    if query:
-        courses = courses.filter(
-            Q(name__icontains=query) |
-            Q(course_code__icontains=query)
-        ).distinct()
-
-    return render(request, "course_app/list_course.html", {"courses": courses, 'query': query})
+    meta_filters = metadata.parse_filters(request.GET)
+    page = catalog.course_page(request)
+    return render(request, "course_app/list_course.html", {
+        "courses": page, 'page': page, 'page_size_choices': PAGE_SIZE_CHOICES, 'query': query, 'meta_filters': meta_filters
+    })
 
 
 @login_required
@@ -307,15 +304,7 @@ def add_course(request):
             course.save()
 
             metadata_str = request.POST.get('metadata', '')
-            if metadata_str:
-                pairs = [pair.strip() for pair in metadata_str.split(',')]
-                for pair in pairs:
-                    if ':' in pair:
-                        key, value = pair.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        meta, created = Metadata.objects.get_or_create(key=key, value=value)
-                        course.metadata.add(meta)
+            set_metadata(course, metadata_str)
             messages.success(request, f"Course '{course.name}' has been added successfully.")
             return redirect('course_list')
         except ValidationError as e:
@@ -341,9 +330,9 @@ def edit_course(request, pk):
     
     if request.method == 'POST':
         new_course_code = request.POST.get('course_code')
-        if Course.objects.exclude(pk=pk).filter(course_code=new_course_code).exists():
+        if Course.all_objects.exclude(pk=pk).filter(course_code=new_course_code).exists():
             messages.error(request, "A course with this code already exists.")
-            return render(request, 'course_app/edit_course.html', {'course': course})
+            return render(request, 'course_app/edit_course.html', {'course': course, 'metadata_str': request.POST.get('metadata', '')})
             
         course.name = request.POST.get('name')
         course.course_code = new_course_code
@@ -353,44 +342,111 @@ def edit_course(request, pk):
             course.full_clean()
             course.save()
             metadata_str = request.POST.get('metadata', '')
-            course.metadata.clear()
-            if metadata_str:
-                pairs = [pair.strip() for pair in metadata_str.split(',')]
-                for pair in pairs:
-                    if ':' in pair:
-                        key, value = pair.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        meta, created = Metadata.objects.get_or_create(key=key, value=value)
-                        course.metadata.add(meta)
+            set_metadata(course, metadata_str)
             messages.success(request, 'Course information has been updated successfully!')
             return redirect('course_list')
         except ValidationError as e:
             for field, errors in e.message_dict.items():
                 for error in errors:
                     messages.error(request, f"{field.replace('_', ' ').capitalize()}: {error}")
-            return render(request, 'course_app/edit_course.html', {'course': course})
+            return render(request, 'course_app/edit_course.html', {'course': course, 'metadata_str': request.POST.get('metadata', '')})
         except Exception as e:
             messages.error(request, f'An unexpected error occurred: {e}')
-            return render(request, 'course_app/edit_course.html', {'course': course})
+            return render(request, 'course_app/edit_course.html', {'course': course, 'metadata_str': request.POST.get('metadata', '')})
             
-    return render(request, 'course_app/edit_course.html', {'course': course})
+    return render(request, 'course_app/edit_course.html', {'course': course, 'metadata_str': format_metadata(course)})
 
 
 @login_required
 def delete_course(request, pk):
     """
-    Handles deleting a Course.
+    Handles deleting a Course and its enrollments (see ``purging.delete``).
     """
     course = get_object_or_404(Course, pk=pk)
     
     if request.method == 'POST':
-        course.delete()
+        purging.delete(course)
         messages.success(request, f"Course '{course.name}' has been deleted successfully.")
     return redirect('course_list')
 
 
+def _analytics_course_ids(request):
+    """
+    Course ids selected by ``?course=<id>`` and/or ``?q=``, or None for all.
+    """
+    course_ids = [int(pk) for pk in request.GET.getlist('course') if pk.isdigit()]
+    query = request.GET.get('q')
+    if query:
+        courses = search.filter_queryset(Course.objects.all(), search.COURSE, query)
+        if course_ids:
+            courses = courses.filter(pk__in=course_ids)
+        return list(courses.values_list('pk', flat=True))
+    return course_ids or None
+
+
+@login_required
+def course_analytics(request):
+    """
+    Shows score statistics and a grade histogram for each course.
+    """
+    report = analytics.course_report(_analytics_course_ids(request))
+    return render(request, 'course_app/course_analytics.html', {'report': report, 'query': request.GET.get('q')})
+
+
+@login_required
+def course_analytics_json(request):
+    """
+    Returns the course score statistics as JSON.
+    """
+    return JsonResponse({'courses': analytics.course_report(_analytics_course_ids(request))})
+
+
+@login_required
+def course_gradebook(request, pk):
+    """
+    Shows every enrolled student's score for a course in one editable grid
+    and saves all changed scores at once.
+    """
+    course = get_object_or_404(Course.objects.only('pk', 'name', 'course_code'), pk=pk)
+    enrollments = gradebook.roster(course)
+    errors = {}
+
+    if request.method == 'POST':
+        try:
+            raw = gradebook.submitted_scores(request.POST)
+        except ValidationError as e:
+            messages.error(request, '; '.join(e.messages))
+            return redirect('course_gradebook', pk=course.pk)
+        changes, errors = gradebook.validate(enrollments, raw)
+        if errors:
+            messages.error(request, f"{len(errors)} score(s) are invalid; nothing was saved.")
+            for enrollment in enrollments:
+                enrollment.submitted = raw.get(enrollment.pk, enrollment.score)
+                enrollment.error = errors.get(enrollment.pk)
+        else:
+            gradebook.save(changes)
+            messages.success(request, f"Saved {len(changes)} score(s) for {course.name}.")
+            return redirect('course_gradebook', pk=course.pk)
+
+    return render(request, 'course_app/gradebook.html', {'course': course, 'enrollments': enrollments, 'errors': errors})
+
+
 @login_required
+def course_typeahead(request):
+    """
+    Returns the courses matching ``q`` by code or name prefix as JSON, for
+    the course pickers on the instructor and enrollment forms.
+    """
+    try:
+        limit = int(request.GET.get('limit', catalog.TYPEAHEAD_LIMIT))
+    except ValueError:
+        limit = catalog.TYPEAHEAD_LIMIT
+    return JsonResponse({'courses': catalog.suggest(request.GET.get('q'), limit)})
+
+
+@login_required
+@gzip_page
+@stamps.conditional(stamps.ENROLLMENT, stamps.STUDENT, stamps.COURSE, stamps.METADATA)
 def enrollment_list(request, student_pk):
     """
     Lists all enrollments for a given student.
@@ -400,14 +456,19 @@ def enrollment_list(request, student_pk):
     query = request.GET.get('q')
 
     if query:
-        enrollments = enrollments.filter(
-            Q(course__course_code__icontains=query)|
-            Q(course__name__icontains=query) 
-        ).distinct()
-
+        enrollments = search.filter_queryset(enrollments, search.COURSE, query, field='course')
+    meta_filters = metadata.parse_filters(request.GET)
+    if meta_filters:
+        enrollments = metadata.filter_queryset(enrollments, meta_filters)
+
+    page = paginate_by_cursor(request, enrollments)
+    summary = StudentSummary.objects.filter(student=student).first()
+    include_archived = archiving.is_configured() and request.GET.get('archived') == '1'
+    archived = list(archiving.archived_for(student, query)) if include_archived else None
     return render(request, 'enrollment_app/list_enrollment.html', {
-        'student': student,
-        'enrollments': enrollments,'query': query
+        'student': student, 'summary': summary,
+        'enrollments': page, 'page': page, 'page_size_choices': PAGE_SIZE_CHOICES, 'query': query, 'meta_filters': meta_filters,
+        'archive_available': archiving.is_configured(), 'include_archived': include_archived, 'archived': archived,
     })
 
 @login_required
@@ -416,7 +477,6 @@ def add_enrollment(request, student_pk):
     Handles adding a new enrollment for a specific student.
     """
     student = get_object_or_404(Student, pk=student_pk)
-    courses = Course.objects.all()
   
     if request.method == 'POST':
         course_id = request.POST.get('course')
@@ -425,31 +485,30 @@ def add_enrollment(request, student_pk):
 
         if not course_id:
             messages.error(request, "A course is required.")
-            return render(request, 'enrollment_app/add_enrollment.html', {'student': student,'courses': courses})
+            return render(request, 'enrollment_app/add_enrollment.html', {'student': student, 'form_data': request.POST})
+
+        selected, unknown = catalog.selected_courses([course_id])
+        context = {'student': student, 'form_data': request.POST, 'selected_courses': selected}
+        if unknown:
+            messages.error(request, "The selected course does not exist.")
+            return render(request, 'enrollment_app/add_enrollment.html', context)
 
         try:
-            course = get_object_or_404(Course, pk=course_id)
+            course = selected[0]
             if Enrollment.objects.filter(student=student, course=course).exists():
                 messages.error(request, "This student is already enrolled in the selected course.")
-                return render(request, 'enrollment_app/add_enrollment.html', {'student': student,'courses': courses})
+                return render(request, 'enrollment_app/add_enrollment.html', context)
 
             enrollment = Enrollment(
                 student=student,
                 course=course,
                 score=score if score else None,
             )
-            enrollment.full_clean()
+            # Both keys were just looked up, so skip the per-field FK queries.
+            enrollment.full_clean(exclude=['student', 'course'])
             enrollment.save()
 
-            if metadata_str:
-                pairs = [pair.strip() for pair in metadata_str.split(',')]
-                for pair in pairs:
-                    if ':' in pair:
-                        key, value = pair.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        meta, created = Metadata.objects.get_or_create(key=key, value=value)
-                        enrollment.metadata.add(meta)
+            set_metadata(enrollment, metadata_str)
 
             messages.success(request, f"Enrollment for {student.first_name}{student.last_name} in {course.name} added successfully.")
             return redirect('enrollment_list', student_pk=student.pk)
@@ -462,9 +521,9 @@ def add_enrollment(request, student_pk):
             else:
                 messages.error(request, f"An unexpected error occurred: {e}")
             
-            return render(request, 'enrollment_app/add_enrollment.html', {'student': student,'courses': courses})
+            return render(request, 'enrollment_app/add_enrollment.html', context)
 
-    return render(request, 'enrollment_app/add_enrollment.html', {'student': student,'courses': courses})
+    return render(request, 'enrollment_app/add_enrollment.html', {'student': student})
 
 
 @login_required
@@ -473,31 +532,27 @@ def edit_enrollment(request, student_pk, pk):
     Handles editing an existing enrollment for a specific student.
 
     """
-    enrollment = get_object_or_404(Enrollment, pk=pk, student__pk=student_pk)
-    courses = Course.objects.all()
+    enrollment = get_object_or_404(Enrollment.objects.select_related('student', 'course'), pk=pk, student__pk=student_pk)
 
     if request.method == 'POST':
-        selected_course_pk = request.POST.get('course')
-        selected_course = Course.objects.get(pk=selected_course_pk)
-        enrollment.course = selected_course
+        selected, unknown = catalog.selected_courses([request.POST.get('course')])
+        context = {'enrollment': enrollment, 'student': enrollment.student, 'selected_courses': selected, 'metadata_str': request.POST.get('metadata', '')}
+        if unknown:
+            messages.error(request, "The selected course does not exist.")
+            return render(request, 'enrollment_app/edit_enrollment.html', context)
+
+        enrollment.course = selected[0]
         new_score = request.POST.get('score')
         new_metadata_str = request.POST.get('metadata', '')
 
         try:
+            if Enrollment.objects.filter(student_id=enrollment.student_id, course=enrollment.course).exclude(pk=enrollment.pk).exists():
+                raise ValidationError({'course': ["This student is already enrolled in the selected course."]})
             enrollment.score = new_score if new_score else None
-            enrollment.full_clean()
+            enrollment.full_clean(exclude=['student', 'course'])
             enrollment.save()
 
-            enrollment.metadata.clear()
-            if new_metadata_str:
-                pairs = [pair.strip() for pair in new_metadata_str.split(',')]
-                for pair in pairs:
-                    if ':' in pair:
-                        key, value = pair.split(':', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        meta, created = Metadata.objects.get_or_create(key=key, value=value)
-                        enrollment.metadata.add(meta)
+            set_metadata(enrollment, new_metadata_str)
 
             messages.success(request, f"Enrollment for {enrollment.student.first_name} {enrollment.student.last_name} in {enrollment.course.name} updated successfully.")
             return redirect('enrollment_list', student_pk=enrollment.student.pk)
@@ -511,10 +566,10 @@ def edit_enrollment(request, student_pk, pk):
                 messages.error(request, f"An unexpected error occurred: {e}")
             
 
-            return render(request, 'enrollment_app/edit_enrollment.html', {'enrollment': enrollment,'student': enrollment.student, 'courses': courses})
+            return render(request, 'enrollment_app/edit_enrollment.html', context)
 
     # For a GET request, render the form with the existing enrollment data
-    return render(request, 'enrollment_app/edit_enrollment.html', {'enrollment': enrollment, 'student': enrollment.student, 'courses': courses})
+    return render(request, 'enrollment_app/edit_enrollment.html', {'enrollment': enrollment, 'student': enrollment.student, 'selected_courses': [enrollment.course], 'metadata_str': format_metadata(enrollment)})
 
 
 @login_required
@@ -533,6 +588,82 @@ def delete_enrollment(request, student_pk, pk):
     return redirect('enrollment_list', student_pk=student_pk)
 
 
+@login_required
+def bulk_enroll(request):
+    """
+    Enrolls a cohort of students in one course. Students are chosen by a
+    search query, pasted ids or emails, or an uploaded file of them.
+    """
+    course_id = request.POST.get('course') if request.method == 'POST' else request.GET.get('course')
+    selected = catalog.selected_courses([course_id])[0] if course_id else []
+    context = {'selected_courses': selected, 'form_data': request.POST}
+
+    if request.method == 'POST':
+        if not selected:
+            messages.error(request, "The selected course does not exist." if course_id else "A course is required.")
+            return render(request, 'enrollment_app/bulk_enroll.html', context)
+        course = selected[0]
+
+        ids, emails, invalid = enrolling.parse_references(request.POST.get('students', ''))
+        upload = request.FILES.get('file')
+        if upload:
+            try:
+                file_ids, file_emails, file_invalid = enrolling.parse_references(upload.read().decode('utf-8-sig'))
+            except UnicodeDecodeError:
+                messages.error(request, "The uploaded file must be UTF-8 text.")
+                return render(request, 'enrollment_app/bulk_enroll.html', context)
+            ids += file_ids
+            emails += file_emails
+            invalid += file_invalid
+
+        query = request.POST.get('q', '').strip()
+        if not (query or ids or emails):
+            messages.error(request, "Choose students with a search, a list of ids or emails, or a file.")
+            return render(request, 'enrollment_app/bulk_enroll.html', context)
+
+        student_ids, unknown = enrolling.resolve_students(ids, emails, query)
+        unknown = invalid + unknown
+        if len(student_ids) > enrolling.MAX_STUDENTS:
+            messages.error(request, f"At most {enrolling.MAX_STUDENTS} students can be enrolled at once.")
+            return render(request, 'enrollment_app/bulk_enroll.html', context)
+        if not student_ids:
+            messages.error(request, "No students matched.")
+            return render(request, 'enrollment_app/bulk_enroll.html', context)
+
+        result = enrolling.enroll(course, student_ids)
+        messages.success(request, f"Enrolled {result.created} student(s) in {course.name}; {result.existing} were already enrolled.")
+        if unknown:
+            shown = ', '.join(unknown[:10]) + (', ...' if len(unknown) > 10 else '')
+            messages.warning(request, f"{len(unknown)} entries matched no student: {shown}")
+        return redirect(f"{reverse('bulk_enroll')}?course={course.pk}")
+
+    return render(request, 'enrollment_app/bulk_enroll.html', context)
+
+
+# --- Export Views ---
+
+@login_required
+def export_data(request, kind):
+    """
+    Streams students, courses, instructors or enrollments as CSV or JSONL,
+    honouring the same ``q`` search and ``meta.*`` filters as the list pages.
+    """
+    if kind not in exporting.EXPORTS:
+        raise Http404("Unknown export.")
+    fmt = 'jsonl' if request.GET.get('format') == 'jsonl' else 'csv'
+    student_pk = request.GET.get('student')
+    if student_pk is not None and not student_pk.isdigit():
+        raise Http404("Unknown student.")
+
+    lines = exporting.iter_export(
+        kind, fmt, query=request.GET.get('q'), student_pk=student_pk, meta_filters=metadata.parse_filters(request.GET),
+    )
+    content_type = 'application/x-ndjson' if fmt == 'jsonl' else 'text/csv'
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
 # --- User Authentication Views ---
 
 def register(request):